@@ -130,6 +130,15 @@ step_position_input = dcc.Input(
     style={"width": "20%", "margin-left": "10%"},
 )
 
+fly_scan_check = dcc.Checklist(
+    id="fly_scan",
+    options=[{"label": "Fly scan (continuous move)", "value": "fly"}],
+    value=[],
+    persistence=True,
+    persistence_type="local",
+    style={"display": "inline-block", "margin-left": "10%"},
+)
+
 measurement_start_button = html.Button(
     "Measurement start",
     id="measurement_start_button",
@@ -187,6 +196,7 @@ app.layout = html.Div(
         start_position_input,
         end_position_input,
         step_position_input,
+        fly_scan_check,
         left_col,
         right_col,
         dcc.Interval(id="interval", interval=500),
@@ -226,6 +236,7 @@ def download_file(dl_filename: str, n_clicks: int):
     State("end_position", "value"),
     State("step_position", "value"),
     State("filename", "value"),
+    State("fly_scan", "value"),
     Input("measurement_start_button", "n_clicks"),
 )
 def start_measuring(
@@ -233,25 +244,45 @@ def start_measuring(
     end_position: float,
     step_position: float,
     filename: str,
+    fly_scan: list[str],
     n_clicks: int,
 ) -> str:
     if semaphore.is_locked():
         raise Exception("Resource is locked")
+    if n_clicks and (
+        start_position is None
+        or end_position is None
+        or not step_position
+        or step_position <= 0
+        or end_position - start_position < 2 * step_position / 1000
+    ):
+        return "Cross correlation measurement (check the start/end/step)"
     semaphore.lock()
-
-    if n_clicks:
-        sc104.move_abs(pos=start_position)
-        position = start_position
-        with open(filename, "w", buffering=1) as f:
-            while position < end_position:
-                power_measures = np.array([power_meter.read for _ in range(10)])
-                # print(f"{position}\t{power_measures.mean()}\t{power_measures.std()}")
-                f.write(
-                    f"{position:.4f}\t{power_measures.mean()}\t{power_measures.std()}\n"
-                )
-                sc104.move_rel(move=step_position, micron=True)
-                position = sc104.position()
-    semaphore.unlock()
+    try:
+        if n_clicks and "fly" in fly_scan:
+            grid = np.arange(start_position, end_position, step_position / 1000)
+            result = sc104.fly_scan(
+                start_position,
+                end_position,
+                detector=lambda: power_meter.read,
+                grid=grid,
+            )
+            with open(filename, "w") as f:
+                for position, mean, std in zip(result.grid, result.mean, result.std):
+                    f.write(f"{position:.4f}\t{mean}\t{std}\n")
+        elif n_clicks:
+            sc104.move_abs(pos=start_position)
+            position = start_position
+            with open(filename, "w", buffering=1) as f:
+                while position < end_position:
+                    power_measures = np.array([power_meter.read for _ in range(10)])
+                    # print(f"{position}\t{power_measures.mean()}\t{power_measures.std()}")
+                    mean, std = power_measures.mean(), power_measures.std()
+                    f.write(f"{position:.4f}\t{mean}\t{std}\n")
+                    sc104.move_rel(move=step_position, micron=True)
+                    position = sc104.position()
+    finally:
+        semaphore.unlock()
     return "Cross correlation measurement"
 
 
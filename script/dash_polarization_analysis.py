@@ -107,6 +107,15 @@ angle_step_input = html.Div(
     ]
 )
 
+fly_scan_check = dcc.Checklist(
+    id="fly_scan",
+    options=[{"label": "Fly scan (continuous rotation)", "value": "fly"}],
+    value=[],
+    persistence=True,
+    persistence_type="local",
+    style={"display": "inline-block", "margin-left": "11%"},
+)
+
 
 measurment_start_button = html.Button(
     "Measurement start",
@@ -174,6 +183,7 @@ left_col = html.Div(
     [
         file_name_input,
         angle_step_input,
+        fly_scan_check,
         buttons,
         html.Div(
             [current_angle, current_power],
@@ -241,37 +251,50 @@ def download_file(dl_filename: str, n_clicks: int):
     Output("status", "children"),
     State("angle_step_input", "value"),
     State("filename", "value"),
+    State("fly_scan", "value"),
     Input("measurement_start_button", "n_clicks"),
 )
-def start_measurement(angle_increment: int, filename: str, n_clicks: int) -> str:
+def start_measurement(
+    angle_increment: int, filename: str, fly_scan: list[str], n_clicks: int
+) -> str:
     if semaphore.is_locked():
         raise Exception("Resource is locked")
+    if n_clicks > 0 and not filename:
+        return "Status: No file name"
+    if n_clicks > 0 and not (angle_increment and 0 < angle_increment < 360):
+        return "Status: Check the angle step"
     semaphore.lock()
-    #
-    if n_clicks > 0:
-        polarizer.home()
-        #
-        if filename:
-            with open(filename, "w", buffering=1) as f:
-                for angle in range(0, 360, angle_increment):
-                    polarizer.moverel(angle_increment)
-                    polarizer.rd(20)
-                    sleep(0.01)
-                    power_measures = np.array([power_meter.read for _ in range(10)])
-                    print(
-                        "{}\t{}±{}".format(
-                            angle, power_measures.mean(), power_measures.std()
+    try:
+        if n_clicks > 0:
+            polarizer.home()
+            #
+            if "fly" in fly_scan:
+                result = polarizer.fly_scan(
+                    lambda: power_meter.read,
+                    grid=np.arange(0, 360, angle_increment),
+                )
+                with open(filename, "w") as f:
+                    for angle, mean, std in zip(result.grid, result.mean, result.std):
+                        f.write(f"{angle}\t{mean}\t{std}\n")
+            else:
+                with open(filename, "w", buffering=1) as f:
+                    for angle in range(0, 360, angle_increment):
+                        polarizer.move_rel(angle_increment)  # waits for the stop
+                        power_measures = np.array(
+                            [power_meter.read for _ in range(10)]
                         )
-                    )
-                    f.write(
-                        "{}\t{}\t{}\n".format(
-                            angle, power_measures.mean(), power_measures.std()
+                        print(
+                            "{}\t{}±{}".format(
+                                angle, power_measures.mean(), power_measures.std()
+                            )
                         )
-                    )
-        else:
-            semaphore.unlock()
-            return "Status: No file name"
-    semaphore.unlock()
+                        f.write(
+                            "{}\t{}\t{}\n".format(
+                                angle, power_measures.mean(), power_measures.std()
+                            )
+                        )
+    finally:
+        semaphore.unlock()
     return "Status: Done"
 
 
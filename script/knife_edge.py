@@ -5,8 +5,7 @@ import argparse
 import yaml
 import numpy as np
 
-from time import sleep
-from spd_controller.sigma.omec4bf import OMEC4BF
+from spd_controller.sigma.omec4bf import OMEC4BF, RasterLine
 from ThorlabsPM100 import USBTMC, ThorlabsPM100
 from numpy.typing import NDArray
 
@@ -54,25 +53,31 @@ if __name__ == "__main__":
     #
     omec = OMEC4BF(port=config["setting"]["omec_port"])
     #
+    verbose = bool(config["setting"].get("verbose", False))
     with open(config["output_file"], "w") as f:
         f.write(header + "\n")
-        for z in range(config["start_z"], config["end_z"], config["step_z"]):
-            omec.move_abs(group=1, axis="x", position=z)
-            data_at_z: list[float] = []
-            for height in range(
-                config["start_height"], config["end_height"], config["step_height"]
-            ):
-                omec.move_abs(group=1, axis="y", position=height)
-                power_measures: NDArray[np.float64] = np.array(
-                    [power_meter.read for _ in range(10)]
-                )
-                intensity = power_measures.mean()
-                if "verbose" in config["setting"] and config["setting"]["verbose"]:
-                    print(f"z: {z}, height: {height}, {intensity}")
-                if intensity < threshold:
-                    break
-                data_at_z.append(intensity)
-            line = "\t".join(f"{x:.8e}" for x in data_at_z)
-            f.write(line + "\n")
+
+        def measure() -> float:
+            power_measures: NDArray[np.float64] = np.array(
+                [power_meter.read for _ in range(10)]
+            )
+            return float(power_measures.mean())
+
+        def report(z: int, height: int, intensity: float) -> None:
+            print(f"z: {z}, height: {height}, {intensity}")
+
+        def write_line(line: RasterLine) -> None:
+            f.write("\t".join(f"{x:.8e}" for x in line.values) + "\n")
             f.flush()
             os.fsync(f.fileno())
+
+        omec.raster_scan(
+            range(config["start_z"], config["end_z"], config["step_z"]),
+            range(config["start_height"], config["end_height"], config["step_height"]),
+            measure,
+            stop=lambda intensity: intensity < threshold,
+            group=1,
+            serpentine=config.get("serpentine", True),
+            on_point=report if verbose else None,
+            on_line=write_line,
+        )
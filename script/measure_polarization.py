@@ -5,14 +5,14 @@ The cycle of measuring the laser power and then rotating the polalizer.
 """
 import argparse
 from pathlib import Path
-from time import sleep
 
 import matplotlib.pyplot as plt
 import numpy as np
-from K10CR1.k10cr1 import K10CR1
 from numpy.typing import NDArray
 from ThorlabsPM100 import USBTMC, ThorlabsPM100
 
+from spd_controller.thorlabs.k10cr1 import K10CR1
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -24,6 +24,11 @@ if __name__ == "__main__":
         default=1,
     )
     parser.add_argument("--no_graph", type=bool, default=False)
+    parser.add_argument(
+        "--fly",
+        action="store_true",
+        help="measure during one continuous rotation (fly scan)",
+    )
     parser.add_argument("file_name", help="filename for data")
     args = parser.parse_args()
     #
@@ -38,22 +43,31 @@ if __name__ == "__main__":
     polarizer.home()
     if args.file_name:
         f = open(args.file_name, mode="w")
-    for angle in range(0, 360, args.step):
-        polarizer.move_rel(args.step)
-        polarizer.rd(20)
-        sleep(0.01)  # 0.01 s is sufficient waiting time.
-        # BUT: by inserting rd(20), sleep can be removed.
-        power_measures: NDArray[float] = np.array([power_meter.read for _ in range(10)])
-        result = "angle: {}, power: {} ±: {}".format(
-            angle,
-            power_measures.mean(),
-            power_measures.std(),
+    if args.fly:
+        fly = polarizer.fly_scan(
+            lambda: power_meter.read,
+            grid=np.arange(0, 360, args.step),
         )
-        print(result)
-        if args.file_name:
-            f.write(
-                f"{angle}\t{power_measures.mean()}\t{power_measures.std()}\n",
+        for angle, mean, std in zip(fly.grid, fly.mean, fly.std):
+            print(f"angle: {angle}, power: {mean} ±: {std}")
+            if args.file_name:
+                f.write(f"{angle}\t{mean}\t{std}\n")
+    else:
+        for angle in range(0, 360, args.step):
+            polarizer.move_rel(args.step)  # returns at MGMSG_MOT_MOVE_COMPLETED
+            power_measures: NDArray[float] = np.array(
+                [power_meter.read for _ in range(10)]
+            )
+            result = "angle: {}, power: {} ±: {}".format(
+                angle,
+                power_measures.mean(),
+                power_measures.std(),
             )
+            print(result)
+            if args.file_name:
+                f.write(
+                    f"{angle}\t{power_measures.mean()}\t{power_measures.std()}\n",
+                )
     if args.file_name:
         f.close()
     if not args.no_graph:
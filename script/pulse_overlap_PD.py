@@ -5,10 +5,11 @@
 import argparse
 import time
 import numpy as np
-from numpy.typing import NDArray
 from pathlib import Path
 from spd_controller.sigma import sc104
 from spd_controller.texio import gds3502
+from spd_controller.texio.features import FeatureExtractor
+from spd_controller.texio.waveform_stack import WaveformStack
 from spd_controller.thorlabs import mff101
 from logging import DEBUG, INFO, Formatter, StreamHandler, getLogger
 
@@ -76,9 +77,10 @@ if __name__ == "__main__":
     parser.add_argument(
         "--channel",
         type=int,
-        default=1,
+        nargs="+",
+        default=[1],
         required=True,
-        help="The number of the oscilloscope channel (1 or 2).",
+        help="The number of the oscilloscope channel (1 or 2, or 1 2 for both).",
     )
     parser.add_argument(
         "--ET",
@@ -114,8 +116,34 @@ if __name__ == "__main__":
         default=False,
         help="if set, record the measured frequency instead of trigger frequency.  (Not the measured freqency is sometimes far from expected value...).",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="if set, continue the interrupted scan stored in the waveform stacks.",
+    )
+    parser.add_argument(
+        "--features_only",
+        action="store_true",
+        default=False,
+        help="if set, store only the features (amplitude, area, centroid, FWHM), not the waveforms.",
+    )
+    parser.add_argument(
+        "--decimate",
+        type=int,
+        default=1,
+        help="Number of the points averaged in the stored waveforms.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=int,
+        default=0,
+        help="Number of the leading points used as the baseline of the features. if 0, not subtracted.",
+    )
     args = parser.parse_args()
-    assert args.channel in (1, 2)
+    if args.resume and args.features_only:
+        parser.error("--resume needs the waveform stacks (not --features_only).")
+    assert set(args.channel) <= {1, 2}
     assert args.average in (0, 2, 4, 8, 16, 32, 64, 128, 256)
     if args.flip:
         if args.flipper_port:
@@ -129,11 +157,22 @@ if __name__ == "__main__":
         flipper.move_backward()
     else:
         flipper = DummyFlipper()  # type: ignore
+    channels = tuple(args.channel)
+    output = Path(args.output)
+    n_positions = int(np.ceil((args.end - args.start) * 1000 / args.step)) + 1
+    kinds = [""] + (["_with_flip"] if args.flip else [])
+
+    def stack_path(channel: int, kind: str) -> Path:
+        return output.with_name(f"{output.stem}_CH{channel}{kind}.stack")
+
+    def text_path(channel: int, kind: str) -> Path:
+        channel_label = f"_CH{channel}" if len(channels) > 1 else ""
+        return output.with_name(output.stem + channel_label + kind + output.suffix)
+
     s = sc104.SC104()
     if args.reset:
         s.move_to_origin()
         logger.debug("Move to mechanical origin.")
-    s.move_abs(args.start, wait=True)
     if args.socket:
         o = gds3502.GDS3502(connection="socket")
     else:
@@ -144,52 +183,89 @@ if __name__ == "__main__":
         o.set_realtime_sampling()
     if args.average == 0:
         o.set_sample_mode()
-        waiting_time = 1.0
     else:
-        waiting_time = o.set_average_mode(n_average=args.average)
-    time.sleep(waiting_time)
-    o.acquire_memory(args.channel)
-    time.sleep(1)
-    header = ["timescale"]
-    data: list[NDArray[np.float_]] = [o.timescale]
-    data_with_flip: list[NDArray[np.float_]] = [o.timescale]
+        o.set_average_mode(n_average=args.average)
+    measurements = ["FREQuency"] if args.use_measured_freq else []
+    o.wait_acquisition(channels[0])
+    record = o.acquire(channels, measurements=measurements)
+    extractors = {
+        (channel, kind): FeatureExtractor(
+            record.timescale,
+            baseline=args.baseline,
+            decimate=args.decimate,
+        )
+        for channel in channels
+        for kind in kinds
+    }
+    metadata = {
+        "start": args.start,
+        "step": args.step,
+        "end": args.end,
+        "average": args.average,
+        "ET": args.ET,
+        "decimate": args.decimate,
+    }
+    n_done = 0
+    for (channel, kind), extractor in extractors.items():
+        if args.features_only:
+            continue
+        if args.resume:
+            extractor.stack = WaveformStack.open(stack_path(channel, kind))
+            extractor.extend(extractor.stack)
+        else:
+            extractor.stack = WaveformStack.create(
+                stack_path(channel, kind),
+                n_positions,
+                extractor.stored_timescale,
+                metadata={**metadata, "channel": channel, "flip": bool(kind)},
+            )
+    if args.resume:
+        n_done = min(len(extractor) for extractor in extractors.values())
+        logger.debug(f"resume from the {n_done}th position")
+    s.move_abs(args.start + n_done * args.step / 1000, wait=True)
+    o.wait_acquisition(channels[0])
     pos = s.position()
     logger.debug(f"current position:{pos}")
     while pos < args.end:
+        record = o.acquire(
+            channels,
+            measurements=measurements,
+            trigger_frequency=not args.use_measured_freq,
+        )
         if args.use_measured_freq:
-            frequency = o.measure_frequency(args.channel)
+            frequency = record.measurements[f"CH{channels[0]}:FREQuency"]
         else:
-            frequency = o.triger_frequency
+            frequency = record.trigger_frequency
         logger.debug(f"frequency: {frequency}")
-        header.append(f"position_{np.round(pos, 3):.3f}@{frequency}")
-        data.append(o.acquire_memory(args.channel))
+        for channel in channels:
+            features = extractors[channel, ""].add(record.memory[channel], pos, frequency)
+            logger.debug(
+                f"CH{channel} amplitude: {features['amplitude']:.4g}, "
+                f"FWHM: {features['fwhm']:.4g}, "
+                f"overlap: {extractors[channel, ''].overlap()}",
+            )
         s.move_rel(args.step, micron=True, wait=True)
-        time.sleep(waiting_time)
+        o.wait_acquisition(channels[0])
         if args.flip:
             flipper.flip()
-            time.sleep(waiting_time)
-            data_with_flip.append(o.acquire_memory(args.channel))
+            o.wait_acquisition(channels[0])
+            record = o.acquire(channels, trigger_frequency=False)
+            for channel in channels:
+                extractors[channel, "_with_flip"].add(
+                    record.memory[channel],
+                    pos,
+                    frequency,
+                )
             flipper.flip()
-            time.sleep(waiting_time)
+            o.wait_acquisition(channels[0])
         pos = s.position()
         if args.with_fig:
-            o.sendtext(":TIM:SCAL?")
-            time_division = float(o.recvtext())
-            o.sendtext(":TIM:SCAL 1.0E-9")
-            o.save_image(f'"Disk:/{args.output}_pos_{np.round(pos, 3):.3f}.png"')
-            o.sendtext(f":TIM:SCAL {time_division:.2E}")
+            o.save_image(f"{args.output}_pos_{np.round(pos, 3):.3f}.png", 1.0e-9)
             time.sleep(2)
-    np.savetxt(
-        args.output,
-        np.array(data).T,
-        delimiter="\t",
-        header="\t".join(header),
-    )
-    if args.flip:
-        output_name, output_suffix = Path(args.output).stem, Path(args.output).suffix
-        np.savetxt(
-            output_name + "_with_flip" + output_suffix,
-            np.array(data_with_flip).T,
-            delimiter="\t",
-            header="\t".join(header),
-        )
+    for (channel, kind), extractor in extractors.items():
+        path = text_path(channel, kind)
+        extractor.export_text(path.with_name(path.stem + "_features" + path.suffix))
+        logger.info(f"CH{channel}{kind} overlap: {extractor.overlap()}")
+        if extractor.stack is not None:
+            extractor.stack.export_text(path)
+            extractor.stack.close()
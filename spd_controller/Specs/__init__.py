@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import UTC
 import datetime
 from pathlib import Path
 import json
+import threading
 import urllib.request
 from urllib.error import HTTPError
-from typing import TypedDict, Required
+from typing import TYPE_CHECKING, TypedDict, Required
 from IPython.core.getipython import get_ipython
 from ipykernel.zmqshell import ZMQInteractiveShell
 from traitlets.config import MultipleInstanceError
@@ -18,8 +21,16 @@ from typing import Callable
 from tqdm import tqdm as cli_tqdm
 from tqdm.notebook import tqdm as notebook_tqdm
 
+if TYPE_CHECKING:
+    from IPython.core.interactiveshell import InteractiveShell
+
 module_name = __name__
 
+#: Timeout (s) for a single request to the Jupyter server REST API.
+SERVER_QUERY_TIMEOUT: float = 2.0
+#: Default longest time (s) ``get_notebook_name`` waits for the notebook name.
+NOTEBOOK_NAME_TIMEOUT: float = 0.5
+
 
 class ServerInfo(TypedDict, total=False):
     base_url: str
@@ -80,58 +91,115 @@ def start_logging() -> None:
     This function checks if the current IPython instance is an InteractiveShell.
     If it is, it generates a log file path, creates the necessary directories,
     and starts logging the session to the generated log file.
+
+    The notebook name used in the file name is resolved in the background by
+    ``notebook_context``, and this function never waits for it.  If it is not
+    resolved yet, the log file is named "unnamed" and renamed before the first
+    cell executed after the name becomes available.
     """
     from IPython.core.getipython import get_ipython
     from IPython.core.interactiveshell import InteractiveShell
 
     ipython = get_ipython()
     if isinstance(ipython, InteractiveShell):
+        future = notebook_context.resolve()
         log_path: Path = generate_logfile_path()
         log_path.parent.mkdir(exist_ok=True)
         _ = ipython.run_line_magic("logstart", f"-o -t {str(log_path)}")
+        if not future.done():
+            _rename_log_when_resolved(ipython, log_path)
+
+
+def _rename_log_when_resolved(ipython: InteractiveShell, log_path: Path) -> None:
+    """Rename the "unnamed" log file once the notebook name is resolved.
+
+    The check runs on the ``pre_run_cell`` event, i.e. in the main thread between
+    the cells, so that the logger is never switched while it is writing.
+    """
+
+    def rename(*args: object) -> None:
+        if not notebook_context.resolve().done():
+            return
+        ipython.events.unregister("pre_run_cell", rename)
+        name = get_notebook_name(timeout=0)
+        if name == "unnamed" or ipython.logger.logfname != str(log_path):
+            return
+        new_path = log_path.with_name(name + log_path.name.removeprefix("unnamed"))
+        ipython.logger.logstop()
+        log_path.rename(new_path)
+        _ = ipython.run_line_magic("logstart", f"-o -t {str(new_path)} append")
+
+    ipython.events.register("pre_run_cell", rename)
 
 
 def generate_logfile_path() -> Path:
-    """Generates a time and date qualified path for the notebook log file."""
+    """Generates a time and date qualified path for the notebook log file.
+
+    The notebook name is not waited for ("unnamed" if not resolved yet).
+    """
     full_name = "{}_{}_{}.log".format(
-        get_notebook_name(),
+        get_notebook_name(timeout=0),
         datetime.datetime.now(tz=datetime.UTC).date().isoformat(),
         datetime.datetime.now(UTC).time().isoformat().split(".")[0].replace(":", "-"),
     )
     return Path("logs") / full_name
 
 
-def get_notebook_name() -> str:
+def get_notebook_name(timeout: float | None = NOTEBOOK_NAME_TIMEOUT) -> str:
     """Gets the unqualified name of the running Jupyter notebook if not password protected.
 
     As an example, if you were running a notebook called "Doping-Analysis.ipynb"
     this would return "Doping-Analysis".
 
-    If no notebook is running for this kernel or the Jupyter session is password protected, we
-    can only return None.
+    If no notebook is running for this kernel, the Jupyter session is password protected,
+    or the information is not resolved within ``timeout`` seconds, return "unnamed".
+    A timed-out lookup is not final: the resolution continues in the background and
+    a later call returns the name once it is available.
+
+    Parameters
+    ----------
+    timeout: float | None
+        Maximum waiting time in seconds. None means wait until resolved.
     """
-    jupyter_info = get_full_notebook_information()
+    jupyter_info = notebook_context.get(timeout=timeout)
     if jupyter_info:
         return Path(jupyter_info["session"]["notebook"]["name"]).stem
     return "unnamed"
 
 
-def get_full_notebook_information() -> NoteBookInfomation | None:
+def get_kernel_id() -> str | None:
+    """Return the id of the running kernel, or None if not running in a kernel."""
+    try:
+        connection_file = Path(ipykernel.get_connection_file()).stem
+    except (MultipleInstanceError, RuntimeError):
+        return None
+    return (
+        connection_file.split("-", 1)[1] if "-" in connection_file else connection_file
+    )
+
+
+def get_full_notebook_information(
+    timeout: float = SERVER_QUERY_TIMEOUT,
+) -> NoteBookInfomation | None:
     """Javascriptless method to fetch current notebook sessions and the one matching this kernel.
 
+    This function queries every running Jupyter server and blocks until all of them
+    answer (or ``timeout`` expires).  Use ``notebook_context`` for the cached and
+    non-blocking version.
+
+    Parameters
+    ----------
+    timeout: float
+        Timeout in seconds for each request to the Jupyter server.
+
     Returns:
         NoteBookInfomation | None : The full information of the notebook if available. If the
         notebook information is not available, return None.
     """
-    try:
-        connection_file = Path(ipykernel.get_connection_file()).stem
-    except (MultipleInstanceError, RuntimeError):
+    kernel_id = get_kernel_id()
+    if kernel_id is None:
         return None
 
-    kernel_id = (
-        connection_file.split("-", 1)[1] if "-" in connection_file else connection_file
-    )
-
     servers = serverapp.list_running_servers()
     for server in servers:
         try:
@@ -144,7 +212,7 @@ def get_full_notebook_information() -> NoteBookInfomation | None:
             if not url.startswith(("http:", "https:")):
                 msg = "URL must start with 'http:' or 'https:'"
                 raise ValueError(msg)
-            sessions = json.load(urllib.request.urlopen(url))
+            sessions = json.load(urllib.request.urlopen(url, timeout=timeout))
             for sess in sessions:
                 if sess["kernel"]["id"] == kernel_id:
                     return {
@@ -153,6 +221,76 @@ def get_full_notebook_information() -> NoteBookInfomation | None:
                     }
         except (KeyError, TypeError, ValueError):
             pass
-        except HTTPError:
+        except (HTTPError, OSError):
             pass
     return None
+
+
+class NotebookContext:
+    """Resolve the notebook session of this kernel once, in the background.
+
+    The first call of ``resolve`` starts a daemon thread that runs
+    ``get_full_notebook_information``.  The result is cached per kernel id, so that
+    the Jupyter servers are queried only once per kernel, and a hung server never
+    blocks the caller longer than the timeout passed to ``get``.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._lock = threading.Lock()
+        self._futures: dict[str | None, Future[NoteBookInfomation | None]] = {}
+
+    def resolve(self) -> Future[NoteBookInfomation | None]:
+        """Start the resolution for the current kernel (if not yet) and return the future.
+
+        Returns
+        -------
+        Future[NoteBookInfomation | None]
+            Future of the notebook information.
+        """
+        kernel_id = get_kernel_id()
+        with self._lock:
+            future = self._futures.get(kernel_id)
+            if future is None:
+                future = Future()
+                self._futures[kernel_id] = future
+                threading.Thread(
+                    target=self._run,
+                    args=(future,),
+                    name="notebook-context",
+                    daemon=True,
+                ).start()
+        return future
+
+    def get(self, timeout: float | None = None) -> NoteBookInfomation | None:
+        """Return the notebook information, waiting at most ``timeout`` seconds.
+
+        Parameters
+        ----------
+        timeout: float | None
+            Maximum waiting time in seconds. None means wait until resolved.
+
+        Returns
+        -------
+        NoteBookInfomation | None
+            The notebook information, None if unavailable or not resolved in time.
+        """
+        try:
+            return self.resolve().result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+
+    def clear(self) -> None:
+        """Forget the cached results."""
+        with self._lock:
+            self._futures.clear()
+
+    @staticmethod
+    def _run(future: Future[NoteBookInfomation | None]) -> None:
+        try:
+            future.set_result(get_full_notebook_information())
+        except Exception:  # noqa: BLE001
+            future.set_result(None)
+
+
+notebook_context = NotebookContext()
@@ -173,6 +173,77 @@ class Comm:
         """
         return self.recvbytes().decode("utf-8")
 
+    def read_until(self, expected: bytes | None = None) -> bytes:
+        r"""Read until the expected bytes (included) arrive.
+
+        Different from ``readlines``, the read ends as soon as the expected bytes
+        arrive.  The timeout of the port is applied to each idle gap, not to
+        the whole transfer.
+
+        Parameters
+        ----------
+        expected : bytes | None
+            Terminator, by default TERM
+
+        Returns
+        -------
+        bytes
+            The byte string including the terminator.
+
+        Raises
+        ------
+        TimeoutError
+            If nothing arrives within the timeout of the port.
+        """
+        expected = expected or self.TERM.encode("utf-8")
+        received = bytearray()
+        while not received.endswith(expected):
+            chunk = self.comm.read_until(expected)
+            if not chunk:
+                msg = f"Timeout before {expected!r} ({len(received)} bytes read)"
+                raise TimeoutError(msg)
+            received.extend(chunk)
+        return bytes(received)
+
+    def read_exactly(self, size: int) -> bytearray:
+        """Read exactly size bytes.
+
+        The timeout of the port is applied to each idle gap, not to the
+        whole transfer.
+
+        Raises
+        ------
+        TimeoutError
+            If the data stops before size bytes.
+        """
+        received = bytearray()
+        while len(received) < size:
+            chunk = self.comm.read(size - len(received))
+            if not chunk:
+                msg = f"Timeout ({len(received)} / {size} bytes read)"
+                raise TimeoutError(msg)
+            received.extend(chunk)
+        return received
+
+    def read_block(self) -> tuple[bytes, bytearray]:
+        """Read the response with the IEEE-488.2 definite length block.
+
+        The response is "<prefix>#N<length><payload><TERM>".  Exactly
+        length bytes of the payload are read, and the terminator is
+        consumed.
+
+        Returns
+        -------
+        tuple[bytes, bytearray]
+            The prefix before "#" (the header of the data, or b"") and the payload.
+        """
+        prefix = self.read_until(b"#")[:-1]
+        n_digits = int(self.read_exactly(1))
+        length = int(self.read_exactly(n_digits))
+        payload = self.read_exactly(length)
+        self.read_until()
+        return prefix, payload
+
     def stop(self) -> None:
         """Stop the data transfer."""
         self.event.set()
@@ -0,0 +1,221 @@
+"""Continuous-motion ("fly") scan.
+
+Instead of step-and-settle (move, wait, read the position, measure), the stage
+moves once through the whole range while the position and the detector are
+sampled at a fixed cadence.  Each sample has the monotonic timestamps of the
+position read and the detector read; the position at the detector read is
+interpolated, and the samples are averaged onto a regular grid::
+
+    result = sample_motion(stage.moving, detector, interval=0.05)
+    result.bin(np.linspace(start, end, 401))
+    result.grid, result.mean, result.std
+
+The speed of the stage is chosen from the sampling period, which is the longer
+of the interval and the time a detector read takes (``sampling_period``), so
+that a slow detector (e.g. a power meter averaging 100 reads) still gives
+several samples per grid point.
+
+The stage specific part (setting the speed, starting the move) is in the stage
+class (``SC104.fly_scan``, ``K10CR1.fly_scan``).
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+def bin_onto_grid(
+    positions: NDArray[np.float64],
+    values: NDArray[np.float64],
+    grid: NDArray[np.float64],
+) -> tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.int64]]:
+    """Average the values onto the grid.
+
+    Each sample goes to the nearest grid point (the bin edges are the midpoints
+    of the grid points).  The samples outside the half step beyond the both ends
+    are dropped.
+
+    Parameters
+    ----------
+    positions: NDArray[np.float64]
+        Position of each sample
+    values: NDArray[np.float64]
+        Value of each sample
+    grid: NDArray[np.float64]
+        Regular and monotonic grid (increasing or decreasing)
+
+    Returns
+    -------
+    tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.int64]]
+        Mean, standard deviation and number of the samples at each grid point.
+        The mean and std are nan at the grid point without samples.
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if grid.size < 2:
+        msg = "The grid needs two points at least"
+        raise ValueError(msg)
+    step = (grid[-1] - grid[0]) / (grid.size - 1)
+    index = np.rint((positions - grid[0]) / step).astype(np.int64)
+    inside = (index >= 0) & (index < grid.size)
+    index, values = index[inside], values[inside]
+    counts = np.bincount(index, minlength=grid.size)
+    total = np.bincount(index, weights=values, minlength=grid.size)
+    square = np.bincount(index, weights=values**2, minlength=grid.size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(counts > 0, total / counts, np.nan)
+        variance = np.where(counts > 0, square / counts - mean**2, np.nan)
+    return mean, np.sqrt(np.clip(variance, 0, None)), counts
+
+
+@dataclass
+class FlyScanResult:
+    """Position-tagged samples of a fly scan.
+
+    Attributes
+    ----------
+    timestamps: NDArray[np.float64]
+        Monotonic time (s from the start) of each detector read
+    positions: NDArray[np.float64]
+        Position of the stage at each detector read (interpolated)
+    values: NDArray[np.float64]
+        Detector reads
+    grid: NDArray[np.float64]
+        Grid of ``bin`` (empty before binning)
+    mean: NDArray[np.float64]
+        Mean value at each grid point
+    std: NDArray[np.float64]
+        Standard deviation at each grid point
+    counts: NDArray[np.int64]
+        Number of the samples at each grid point
+    """
+
+    timestamps: NDArray[np.float64]
+    positions: NDArray[np.float64]
+    values: NDArray[np.float64]
+    grid: NDArray[np.float64] = field(default_factory=lambda: np.empty(0))
+    mean: NDArray[np.float64] = field(default_factory=lambda: np.empty(0))
+    std: NDArray[np.float64] = field(default_factory=lambda: np.empty(0))
+    counts: NDArray[np.int64] = field(
+        default_factory=lambda: np.empty(0, dtype=np.int64),
+    )
+
+    def bin(self, grid: NDArray[np.float64]) -> FlyScanResult:
+        """Average the samples onto the grid (see ``bin_onto_grid``)."""
+        self.grid = np.asarray(grid, dtype=np.float64)
+        self.mean, self.std, self.counts = bin_onto_grid(
+            self.positions,
+            self.values,
+            self.grid,
+        )
+        return self
+
+    def savetxt(self, path: str) -> None:
+        """Write the binned data (grid, mean, std, counts) as a text file."""
+        np.savetxt(
+            path,
+            np.column_stack([self.grid, self.mean, self.std, self.counts]),
+            delimiter="\t",
+            header="position\tmean\tstd\tcounts",
+        )
+
+
+def sampling_period(
+    read_detector: Callable[[], float],
+    interval: float = 0.05,
+    n_reads: int = 2,
+) -> float:
+    """Return the period (s) a sample of ``sample_motion`` actually takes.
+
+    The detector is read n_reads times (the values are discarded), and the
+    longest read time is compared with the interval.
+
+    Parameters
+    ----------
+    read_detector: Callable[[], float]
+        Returns the detector value.
+    interval: float
+        Requested sampling period (s)
+    n_reads: int
+        Number of the timed reads
+
+    Returns
+    -------
+    float
+        max(interval, the longest read time)
+    """
+    period = interval
+    for _ in range(n_reads):
+        start = time.monotonic()
+        read_detector()
+        period = max(period, time.monotonic() - start)
+    return period
+
+
+def sample_motion(
+    read_position: Callable[[], float | None],
+    read_detector: Callable[[], float],
+    interval: float = 0.05,
+    timeout: float | None = None,
+) -> FlyScanResult:
+    """Sample the position and the detector at a fixed cadence until the motion ends.
+
+    Parameters
+    ----------
+    read_position: Callable[[], float | None]
+        Returns the current position, or None when the stage stops.
+    read_detector: Callable[[], float]
+        Returns the detector value.
+    interval: float
+        Sampling period (s).  If a cycle takes longer, the next one starts
+        immediately (the cadence is not caught up).
+    timeout: float | None
+        Maximum duration (s)
+
+    Returns
+    -------
+    FlyScanResult
+        Samples (not binned)
+
+    Raises
+    ------
+    TimeoutError
+        If the motion does not end within timeout.
+    """
+    position_times: list[float] = []
+    positions: list[float] = []
+    detector_times: list[float] = []
+    values: list[float] = []
+    start = time.monotonic()
+    next_tick = start
+    while True:
+        position_time = time.monotonic()
+        position = read_position()
+        if position is None:
+            break
+        detector_time = time.monotonic()
+        value = read_detector()
+        position_times.append((position_time + detector_time) / 2 - start)
+        positions.append(position)
+        detector_times.append((detector_time + time.monotonic()) / 2 - start)
+        values.append(value)
+        now = time.monotonic()
+        if timeout is not None and now - start > timeout:
+            msg = f"The motion does not end in {timeout} s"
+            raise TimeoutError(msg)
+        next_tick = max(next_tick + interval, now)
+        time.sleep(next_tick - now)
+    timestamps = np.array(detector_times)
+    return FlyScanResult(
+        timestamps=timestamps,
+        positions=np.interp(timestamps, position_times, positions)
+        if positions
+        else np.empty(0),
+        values=np.array(values, dtype=np.float64),
+    )
@@ -10,10 +10,22 @@ from time import sleep
 
 from serial.tools import list_ports
 
-from .. import Comm
+from ..scpi import SCPIInstrument
 
+VOLTAGE_PROFILE: dict[str, object] = {
+    ":SENS:VOLT:NPLC": 5,  # "slow" に対応
+    ":SENS:VOLT:RANG": 10,
+    ":SENS:VOLT:RANG:AUTO": "OFF",
+    ":SENS:VOLT:AVER:TCON": "MOV",
+    ":SENS:VOLT:AVER:COUN": 20,  ## 平均は2ぐらいが適当？ しなくてもよい？
+    ":SENS:VOLT:AVER": "ON",
+    ":SENS:VOLT:AVER:WIND": 10,
+    ":FORM": "ASC",
+    ":FORM:ELEM": "READ",
+}
 
-class DMM2700(Comm):
+
+class DMM2700(SCPIInstrument):
     def __init__(self, port: str = "") -> None:
         super().__init__()
         ttys = [port.devie for port in list_ports.comports()]
@@ -27,6 +39,7 @@ class DMM2700(Comm):
                 self.open(tty=tty, baud=19200, xonxoff=True)
                 self.sendtext("*RST")
                 self.sendtext("*CLS")
+                self.settings.clear()
                 return None
             else:
                 self.close()
@@ -48,16 +61,13 @@ class DMM2700(Comm):
         return True
 
     def conf_voltage(self) -> None:
-        """Configure voltage measurement."""
+        """Configure voltage measurement.
+
+        Only the settings not in effect are sent (``VOLTAGE_PROFILE``).  The 2700
+        has no "*LRN?"; ``refresh`` queries the cached settings one by one.
+        """
         # self.wait_for_srq("*SRE 1;:STAT:MEAS:ENAB 32;*CLS;")
-        self.sendtext(":SENS:VOLT:NPLC 5")  # "slow" に対応
-        self.sendtext(":SENS:VOLT:RANG 10")
-        self.sendtext(":SENS:VOLT:RANG:AUTO OFF")
-        self.sendtext(
-            "VOLT:AVER:TCON MOV;:VOLT:AVER:COUN 20;:VOLT:AVER ON"
-        )  ## 平均は2ぐらいが適当？ しなくてもよい？
-        self.sendtext("VOL:DC:AVER:WIND 10")
-        self.sendtext(":FORM ASC;:FORM:ELEM READ")
+        self.apply(VOLTAGE_PROFILE)
 
     def measure(self) -> float | None:
         """Return the voltage:
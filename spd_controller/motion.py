@@ -0,0 +1,306 @@
+"""Handle of a stage move (future).
+
+The ``move_*`` methods of the stages return ``MotionFuture``, which polls the
+controller only when asked (``done``, ``wait``, ``result``), so that the caller
+can do other work (e.g. detector readout) during the travel::
+
+    move = stage.move_abs(10, wait=False)
+    while not move.done():
+        values.append(detector.read())
+    position = move.result(timeout=30)
+
+The polling interval adapts to the remaining travel time when the target and
+the speed are known (half of the remaining time, within ``POLL_INTERVAL``), and
+otherwise grows geometrically, so that the serial link is not saturated.
+
+Controllers which report the end of a move by themselves (e.g. the APT
+devices of Thorlabs) return ``NotifiedMotionFuture``, which is completed from
+the reader thread and wakes the waiter without polling.
+
+``PositionCache`` answers the position queries without the round-trip while the
+stage is known to be idle: the value is read again only during a move (through
+the pending future), after a move, or when the value is older than ``max_age``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+POLL_INTERVAL = (0.005, 0.2)  # s (min, max)
+POSITION_MAX_AGE = 30.0  # s
+
+T = TypeVar("T")
+
+
+class MotionFuture(Generic[T]):
+    """Completion of a move.
+
+    The position is a number (e.g. mm, degree), or a tuple for the stages
+    moving several axes together (e.g. ``MotionFuture[tuple[int, int]]``).
+
+    Parameters
+    ----------
+    poll : Callable[[], T | None]
+        Returns the current position during the move, or None when stopped
+        (e.g. ``SC104.moving``).
+    final : Callable[[], T] | None
+        Returns the position after the stop.  Default: the target (or the
+        last polled position).
+    target : T | None
+        Target position (the same unit as the poll)
+    speed : float | None
+        Speed (unit/s).  Used only for the numeric positions.
+    progress : Callable[[T], object] | None
+        Called with each polled position.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[], T | None],
+        final: Callable[[], T] | None = None,
+        target: T | None = None,
+        speed: float | None = None,
+        progress: Callable[[T], object] | None = None,
+    ) -> None:
+        """Initialize."""
+        self._poll = poll
+        self._final = final
+        self.target = target
+        self.speed = speed
+        self._progress = progress
+        self.started = time.monotonic()
+        self.last_position: T | None = None
+        self._finished = False
+        self._result: T | None = None
+        self._interval = POLL_INTERVAL[0]
+
+    @classmethod
+    def completed(cls, position: T | None = None) -> MotionFuture[T]:
+        """Return the future of a move which has already finished."""
+        future = cls(lambda: None, target=position)
+        future._finished = True
+        future._result = position
+        return future
+
+    def done(self) -> bool:
+        """Poll the controller once (unless finished). Return True if stopped."""
+        if self._finished:
+            return True
+        position = self._poll()
+        if position is None:
+            self._finish()
+            return True
+        self.last_position = position
+        if self._progress is not None:
+            self._progress(position)
+        return False
+
+    def _finish(self) -> None:
+        self._finished = True
+        if self._final is not None:
+            self._result = self._final()
+        elif self.target is not None:
+            self._result = self.target
+        else:
+            self._result = self.last_position
+
+    def _next_interval(self) -> float:
+        target, position = self.target, self.last_position
+        if (
+            isinstance(target, int | float)
+            and isinstance(position, int | float)
+            and self.speed
+        ):
+            remaining = abs(target - position) / self.speed
+            interval = remaining / 2
+        else:
+            interval = self._interval
+            self._interval = min(2 * self._interval, POLL_INTERVAL[1])
+        return min(max(interval, POLL_INTERVAL[0]), POLL_INTERVAL[1])
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the move finishes.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Maximum waiting time (s). None waits forever.
+
+        Returns
+        -------
+        bool
+            True if the move has finished, False at the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done():
+            interval = self._next_interval()
+            if deadline is not None:
+                interval = min(interval, deadline - time.monotonic())
+                if interval <= 0:
+                    return False
+            time.sleep(interval)
+        return True
+
+    def result(self, timeout: float | None = None) -> T | None:
+        """Wait and return the position after the move.
+
+        Raises
+        ------
+        TimeoutError
+            If the move does not finish within timeout.
+        """
+        if not self.wait(timeout):
+            msg = f"The move does not finish within {timeout} s"
+            raise TimeoutError(msg)
+        return self._result
+
+    @property
+    def elapsed(self) -> float:
+        """Time (s) since the move started."""
+        return time.monotonic() - self.started
+
+
+class NotifiedMotionFuture(MotionFuture[float]):
+    """Completion of a move reported by the controller (no polling).
+
+    The reader of the controller messages calls ``update`` with the positions
+    during the move and ``set_result`` at the stop.
+
+    Parameters
+    ----------
+    target : float | None
+        Target position
+    progress : Callable[[float], object] | None
+        Called with each updated position (in the reader thread).
+    """
+
+    def __init__(
+        self,
+        target: float | None = None,
+        progress: Callable[[float], object] | None = None,
+    ) -> None:
+        """Initialize."""
+        super().__init__(lambda: None, target=target, progress=progress)
+        self._event = threading.Event()
+
+    @classmethod
+    def completed(cls, position: float | None = None) -> NotifiedMotionFuture:
+        """Return the future of a move which has already finished."""
+        future = cls(target=position)
+        future.set_result(position)
+        return future
+
+    def update(self, position: float) -> None:
+        """Record the position during the move."""
+        self.last_position = position
+        if self._progress is not None:
+            self._progress(position)
+
+    def set_result(self, position: float | None = None) -> None:
+        """Complete the move. None: the target (or the last position)."""
+        if position is None:
+            position = self.target if self.target is not None else self.last_position
+        self._result = position
+        self._finished = True
+        self._event.set()
+
+    def done(self) -> bool:
+        """Return True if the move has finished."""
+        return self._event.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the move finishes (False at the timeout)."""
+        return self._event.wait(timeout)
+
+
+class PositionCache(Generic[T]):
+    """Last known position of an idle stage.
+
+    Parameters
+    ----------
+    read : Callable[[], T]
+        Reads the position from the controller.
+    max_age : float | None
+        The cached value older than this (s) is read again (e.g. the stage may
+        be moved by the front panel). None: never expires.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[], T],
+        max_age: float | None = POSITION_MAX_AGE,
+    ) -> None:
+        """Initialize."""
+        self._read = read
+        self.max_age = max_age
+        self.value: T | None = None
+        self.timestamp = 0.0
+        self.target: T | None = None
+        self.future: MotionFuture[T] | None = None
+        self._use_result = False
+
+    def track(
+        self,
+        future: MotionFuture[T],
+        use_result: bool = True,
+    ) -> MotionFuture[T]:
+        """Mark the stage moving until the future finishes.
+
+        Parameters
+        ----------
+        future : MotionFuture[T]
+            Completion of the move
+        use_result : bool
+            If True, the result of the future is cached as the position after
+            the move.  Otherwise, the position is read again.
+        """
+        self.future = future
+        self.target = future.target
+        self._use_result = use_result
+        return future
+
+    @property
+    def moving(self) -> bool:
+        """True if a tracked move has not been seen finished."""
+        return self.future is not None
+
+    def __call__(self, refresh: bool = False) -> T:
+        """Return the position.
+
+        During a move, the controller is polled once (through the future) and
+        the polled position is returned (read from the controller if the future
+        has no position yet).  While idle, the cached value is returned unless it
+        is stale or refresh is True.
+        """
+        if self.future is not None:
+            future, self.future = self.future, None
+            if not future.done():
+                self.future = future
+                if future.last_position is not None:
+                    return future.last_position
+                return self._read()
+            result = future.result()
+            if self._use_result and result is not None:
+                return self.store(result)
+            self.value = None
+        stale = (
+            self.max_age is not None
+            and time.monotonic() - self.timestamp > self.max_age
+        )
+        if refresh or self.value is None or stale:
+            return self.store(self._read())
+        return self.value
+
+    def store(self, value: T) -> T:
+        """Cache the value read from the controller."""
+        self.value = value
+        self.timestamp = time.monotonic()
+        return value
+
+    def invalidate(self) -> None:
+        """Forget the value (the next query reads the controller)."""
+        self.value = None
+        self.future = None
@@ -0,0 +1,439 @@
+"""Continuous data acquisition of Q-mass.
+
+The acquisition is split into three stages so that a slow consumer never stalls
+the analyzer:
+
+* reader: a dedicated thread drains the serial port into a fixed-size ring buffer.
+* decoder: a thread cuts the byte stream into complete scans (``Scan``), and
+  starts the next scan as soon as the end marker arrives.  After an overflow of
+  the ring buffer, the broken scan is discarded and the decoder resynchronizes
+  on the next marker.
+* subscribers: each consumer (file writer, plot, alarm ...) has its own queue
+  and thread.  When a consumer cannot keep up, its oldest scans are dropped.
+"""
+
+from __future__ import annotations
+
+import datetime
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from logging import DEBUG, Formatter, StreamHandler, getLogger
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .qmass import (
+    END_MARKERS,
+    FAILURE_MARKERS,
+    LEAK_CHECK_POINTS,
+    MULTIPLE_ION_MODE,
+    SCAN_START,
+    find_marker,
+)
+
+if TYPE_CHECKING:
+    from .qmass import Qmass
+
+# logger
+LOGLEVEL = DEBUG
+logger = getLogger(__name__)
+fmt = "%(asctime)s %(levelname)s %(name)s :%(message)s"
+formatter = Formatter(fmt)
+handler = StreamHandler()
+handler.setLevel(LOGLEVEL)
+logger.setLevel(LOGLEVEL)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+RING_SIZE = 1 << 20  # bytes
+READ_TIMEOUT = 0.1  # s
+
+
+@dataclass(frozen=True)
+class Scan:
+    """A complete scan.
+
+    Attributes
+    ----------
+    timestamp_ns: int
+        Start time of the scan (ns since the epoch)
+    duration_ns: int
+        Time from the start to the end of the scan (ns)
+    mode: int
+        0: Analog mode, 1: Digital mode, 2: Leak check mode, 3: Multiple ion mode
+    pressure_range: int
+        Pressure range (0 - 6)
+    mass: NDArray[np.float64]
+        Mass number of each point
+    pressure: NDArray[np.float64]
+        Pressure (mbar) of each point
+    """
+
+    timestamp_ns: int
+    duration_ns: int
+    mode: int
+    pressure_range: int
+    mass: NDArray[np.float64]
+    pressure: NDArray[np.float64]
+
+    def times_ns(self) -> NDArray[np.int64]:
+        """Return the time of each point, interpolated within the scan (ns)."""
+        n_points = self.pressure.size
+        return self.timestamp_ns + (
+            np.arange(1, n_points + 1) * self.duration_ns // max(n_points, 1)
+        )
+
+
+def format_scan(scan: Scan) -> list[str]:
+    """Format the scan as the text lines written by ``Qmass.record``.
+
+    Parameters
+    ----------
+    scan: Scan
+        Scan data
+
+    Returns
+    -------
+    list[str]
+        "mass<TAB>pressure" lines (analog/digital mode),
+        "date<TAB>pressure" lines (leak check mode), or
+        "date<TAB>mass<TAB>pressure" lines (multiple ion mode)
+    """
+    if scan.mode < 2:
+        return [
+            f"{mass:5.3f}\t{pressure:.5e}\n"
+            for mass, pressure in zip(
+                scan.mass.tolist(),
+                scan.pressure.tolist(),
+                strict=True,
+            )
+        ]
+    dates = [
+        datetime.datetime.fromtimestamp(t / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")
+        for t in scan.times_ns().tolist()
+    ]
+    if scan.mode == MULTIPLE_ION_MODE:
+        return [
+            f"{date}\t{mass:5.3f}\t{pressure:.3e}\n"
+            for date, mass, pressure in zip(
+                dates,
+                scan.mass.tolist(),
+                scan.pressure.tolist(),
+                strict=True,
+            )
+        ]
+    return [
+        f"{date}\t{pressure:.3e}\n"
+        for date, pressure in zip(dates, scan.pressure.tolist(), strict=True)
+    ]
+
+
+class RingBuffer:
+    """Fixed-size byte ring buffer shared by one writer and one reader.
+
+    When the writer overruns the reader, the oldest bytes are discarded and
+    counted in ``overflow``.  ``gap`` is the number of the bytes discarded just
+    before the data returned by the last ``read``.
+    """
+
+    def __init__(self, size: int = RING_SIZE) -> None:
+        """Initialize.
+
+        Parameters
+        ----------
+        size: int
+            Capacity in bytes.
+        """
+        self._buffer = np.zeros(size, dtype=np.uint8)
+        self._size = size
+        self._head = 0  # total bytes written
+        self._tail = 0  # total bytes read
+        self._cond = threading.Condition()
+        self._discarded = 0  # bytes discarded since the last read
+        self.overflow = 0
+        self.gap = 0
+
+    def __len__(self) -> int:
+        """Return the number of the unread bytes."""
+        with self._cond:
+            return self._head - self._tail
+
+    def write(self, data: bytes) -> None:
+        """Append the data."""
+        if not data:
+            return
+        chunk = np.frombuffer(data, dtype=np.uint8)[-self._size :]
+        with self._cond:
+            self._head += len(data) - chunk.size  # bytes which never fit
+            start = self._head % self._size
+            first = min(chunk.size, self._size - start)
+            self._buffer[start : start + first] = chunk[:first]
+            self._buffer[: chunk.size - first] = chunk[first:]
+            self._head += chunk.size
+            if self._head - self._tail > self._size:
+                self._discarded += self._head - self._tail - self._size
+                self.overflow += self._head - self._tail - self._size
+                self._tail = self._head - self._size
+            self._cond.notify_all()
+
+    def read(self, timeout: float | None = None) -> bytes:
+        """Read all the unread bytes, waiting at most timeout for data.
+
+        Returns
+        -------
+        bytes
+            Unread bytes (b"" if timeout)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._head > self._tail, timeout):
+                return b""
+            start = self._tail % self._size
+            stop = start + (self._head - self._tail)
+            if stop <= self._size:
+                data = self._buffer[start:stop].tobytes()
+            else:
+                data = (
+                    self._buffer[start:].tobytes()
+                    + self._buffer[: stop - self._size].tobytes()
+                )
+            self._tail = self._head
+            self.gap, self._discarded = self._discarded, 0
+            return data
+
+
+class Subscriber:
+    """A consumer of scans running in its own thread.
+
+    Parameters
+    ----------
+    callback: Callable[[Scan], object]
+        Function called with each scan.
+    maxsize: int
+        Number of the scans kept while the callback is busy.
+    name: str
+        Name of the thread.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Scan], object],
+        maxsize: int = 16,
+        name: str = "subscriber",
+    ) -> None:
+        """Initialize."""
+        self.callback = callback
+        self.name = name
+        self.dropped = 0
+        self._queue: queue.Queue[Scan | None] = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, scan: Scan) -> None:
+        """Queue the scan without blocking. The oldest one is dropped if full."""
+        while True:
+            try:
+                self._queue.put_nowait(scan)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self, timeout: float | None = None) -> None:
+        """Process the queued scans and stop the thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while (scan := self._queue.get()) is not None:
+            try:
+                self.callback(scan)
+            except Exception:
+                logger.exception(f"{self.name} failed")
+
+
+class QmassAcquisition:
+    """Continuous acquisition engine of Q-mass.
+
+    The analyzer must be booted and the measurement mode must be set before
+    ``start``.
+
+    Parameters
+    ----------
+    q_mass: Qmass
+        Q-mass controller
+    ring_size: int
+        Capacity of the ring buffer in bytes.
+
+    Examples
+    --------
+    >>> acquisition = QmassAcquisition(q_mass)
+    >>> acquisition.subscribe(lambda scan: q_mass.record(format_scan(scan)))
+    >>> acquisition.start()
+    >>> ...
+    >>> acquisition.stop()
+    """
+
+    def __init__(self, q_mass: Qmass, ring_size: int = RING_SIZE) -> None:
+        """Initialize."""
+        self.q_mass = q_mass
+        self.ring = RingBuffer(ring_size)
+        self.subscribers: list[Subscriber] = []
+        self.latest: Scan | None = None
+        self.n_scans = 0
+        self.n_failures = 0
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._timeout: float | None = None
+
+    def subscribe(
+        self,
+        callback: Callable[[Scan], object],
+        maxsize: int = 16,
+        name: str = "subscriber",
+    ) -> Subscriber:
+        """Register a consumer of the scans.
+
+        Parameters
+        ----------
+        callback: Callable[[Scan], object]
+            Function called with each scan in the subscriber thread.
+        maxsize: int
+            Number of the scans kept while the callback is busy.
+        name: str
+            Name of the thread.
+
+        Returns
+        -------
+        Subscriber
+        """
+        subscriber = Subscriber(callback, maxsize=maxsize, name=name)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    @property
+    def running(self) -> bool:
+        """True if the acquisition is running."""
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self) -> None:
+        """Start the reader/decoder threads and the first scan."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._timeout = self.q_mass.com.timeout
+        self.q_mass.com.timeout = READ_TIMEOUT
+        self._threads = [
+            threading.Thread(target=self._read, name="qmass-reader", daemon=True),
+            threading.Thread(target=self._decode, name="qmass-decoder", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Terminate the scan and stop all the threads."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.q_mass.terminate_scan()
+        self.q_mass.com.reset_input_buffer()
+        self.q_mass.com.timeout = self._timeout
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self.subscribers = []
+
+    def _read(self) -> None:
+        com = self.q_mass.com
+        while not self._stop.is_set():
+            self.ring.write(com.read(max(1, com.in_waiting)))
+
+    def _decode(self) -> None:
+        pending = bytearray()
+        checked = 0
+        resync = False
+        self.q_mass.is_scanning = True
+        started = time.time_ns()
+        self.q_mass.com.write(SCAN_START)
+        while not self._stop.is_set():
+            chunk = self.ring.read(timeout=READ_TIMEOUT)
+            if not chunk:
+                continue
+            if self.ring.gap:
+                logger.warning(
+                    f"Ring buffer overflow: {self.ring.gap} bytes lost. Scan fails."
+                )
+                if self.q_mass.mode == 2:
+                    # No marker in leak check mode: realign by the lost bytes.
+                    chunk = chunk[-(len(pending) + self.ring.gap) % 3 :]
+                else:
+                    resync = True
+                pending.clear()
+                checked = 0
+            pending.extend(chunk)
+            if resync:
+                # The points are aligned again just after the next marker.
+                found = np.flatnonzero(
+                    np.isin(
+                        np.frombuffer(pending, dtype=np.uint8),
+                        END_MARKERS + FAILURE_MARKERS,
+                    ),
+                )
+                if found.size == 0:
+                    pending.clear()
+                    continue
+                del pending[: int(found[0]) + 1]
+                resync = False
+                started = time.time_ns()
+                self.q_mass.com.write(SCAN_START)
+            while True:
+                checked, marker = find_marker(pending, offset=checked)
+                if self.q_mass.mode == 2 and checked >= LEAK_CHECK_POINTS:
+                    # Leak check mode: every 128 points make a scan.
+                    n_points, marker, restart = LEAK_CHECK_POINTS, -1, False
+                    consumed = LEAK_CHECK_POINTS * 3
+                elif marker >= 0:
+                    n_points, restart = checked, True
+                    consumed = (checked + 1) * 3
+                else:
+                    break
+                now = time.time_ns()
+                if marker in FAILURE_MARKERS:
+                    self.n_failures += 1
+                    logger.debug(f"Failure marker 0x{marker:02x} detected. Scan fails.")
+                else:
+                    self._publish(pending, n_points, started, now)
+                del pending[:consumed]
+                checked = 0
+                started = now
+                if restart:
+                    self.q_mass.com.write(SCAN_START)
+        self.q_mass.is_scanning = False
+
+    def _publish(
+        self,
+        pending: bytearray,
+        n_points: int,
+        started: int,
+        now: int,
+    ) -> None:
+        mass, pressure = self.q_mass.decode(pending, n_points)
+        scan = Scan(
+            timestamp_ns=started,
+            duration_ns=now - started,
+            mode=self.q_mass.mode,
+            pressure_range=self.q_mass.pressure_range,
+            mass=mass,
+            pressure=pressure,
+        )
+        self.latest = scan
+        self.n_scans += 1
+        for subscriber in self.subscribers:
+            subscriber.put(scan)
@@ -0,0 +1,262 @@
+"""Online statistics of Q-mass scans.
+
+``SpectrumStatistics`` follows the peak height of selected masses from scan to
+scan, keeping exponentially weighted mean/variance, the maximum and a short
+history (fixed size) for each mass.  It is a callable, so that it can be
+subscribed to the acquisition directly::
+
+    statistics = SpectrumStatistics()
+    statistics.add_alarm("H2O", 1e-9, callback=print)
+    acquisition.subscribe(statistics)
+    ...
+    statistics.summary()["CO"]["mean"]
+    statistics.trend("H2O", span=3600)  # mbar/s over the last hour
+
+The queries never read the recorded files.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from logging import DEBUG, Formatter, StreamHandler, getLogger
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .acquisition import Scan
+
+# logger
+LOGLEVEL = DEBUG
+logger = getLogger(__name__)
+fmt = "%(asctime)s %(levelname)s %(name)s :%(message)s"
+formatter = Formatter(fmt)
+handler = StreamHandler()
+handler.setLevel(LOGLEVEL)
+logger.setLevel(LOGLEVEL)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+DEFAULT_MASSES: dict[str, float] = {"H2": 2, "H2O": 18, "CO": 28, "CO2": 44}
+HISTORY_LENGTH = 1024  # scans kept for trend
+
+
+@dataclass
+class Alarm:
+    """Threshold of the peak height of a mass.
+
+    Attributes
+    ----------
+    name: str
+        Name of the mass
+    threshold: float
+        Pressure (mbar)
+    above: bool
+        True: fires when the peak exceeds the threshold.
+        False: fires when the peak falls below the threshold.
+    callback: Callable[[Alarm, float], object] | None
+        Called with the alarm and the peak height when it fires.
+    active: bool
+        True while the condition holds. The alarm fires only at the transition.
+    """
+
+    name: str
+    threshold: float
+    above: bool = True
+    callback: Callable[[Alarm, float], object] | None = None
+    active: bool = False
+
+    def check(self, value: float) -> bool:
+        """Update the state by the peak height. Return True when it fires."""
+        hit = value > self.threshold if self.above else value < self.threshold
+        fired = hit and not self.active
+        self.active = hit
+        return fired
+
+
+class SpectrumStatistics:
+    """Exponentially weighted statistics of the peak heights of masses.
+
+    Parameters
+    ----------
+    masses: dict[str, float] | None
+        Name and mass number. Default: ``DEFAULT_MASSES`` (H2, H2O, CO, CO2)
+    alpha: float
+        Weight of the newest scan (0 < alpha <= 1)
+    window: float
+        Half width (mass unit) around the mass to find the peak height
+    history: int
+        Number of the scans kept for ``trend``
+    """
+
+    def __init__(
+        self,
+        masses: dict[str, float] | None = None,
+        alpha: float = 0.1,
+        window: float = 0.5,
+        history: int = HISTORY_LENGTH,
+    ) -> None:
+        """Initialize."""
+        if not 0 < alpha <= 1:
+            msg = "alpha must be 0 < alpha <= 1"
+            raise ValueError(msg)
+        masses = DEFAULT_MASSES if masses is None else masses
+        self.names: list[str] = list(masses)
+        self.masses: NDArray[np.float64] = np.array(
+            [masses[name] for name in self.names],
+            dtype=np.float64,
+        )
+        self.alpha = alpha
+        self.window = window
+        n_masses = len(self.names)
+        self.count = np.zeros(n_masses, dtype=np.int64)
+        self.mean = np.zeros(n_masses)
+        self.variance = np.zeros(n_masses)
+        self.last = np.full(n_masses, np.nan)
+        self.maximum = np.full(n_masses, np.nan)
+        self.alarms: list[Alarm] = []
+        self._times = np.zeros(history, dtype=np.int64)
+        self._peaks = np.full((history, n_masses), np.nan)
+        self._n_scans = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, scan: Scan) -> list[Alarm]:
+        """Same as ``update`` (to be used as a subscriber)."""
+        return self.update(scan)
+
+    def peaks(self, scan: Scan) -> NDArray[np.float64]:
+        """Return the peak height of each mass in the scan (nan if not scanned)."""
+        near = np.abs(scan.mass[np.newaxis, :] - self.masses[:, np.newaxis])
+        inside = near <= self.window
+        heights = np.where(inside, scan.pressure[np.newaxis, :], -np.inf).max(axis=1)
+        return np.where(inside.any(axis=1), heights, np.nan)
+
+    def update(self, scan: Scan) -> list[Alarm]:
+        """Add the scan.
+
+        Returns
+        -------
+        list[Alarm]
+            Alarms fired by this scan
+        """
+        peaks = self.peaks(scan)
+        found = ~np.isnan(peaks)
+        with self._lock:
+            first = found & (self.count == 0)
+            self.mean[first] = peaks[first]
+            following = found & ~first
+            diff = peaks[following] - self.mean[following]
+            increment = self.alpha * diff
+            self.mean[following] += increment
+            self.variance[following] = (1 - self.alpha) * (
+                self.variance[following] + diff * increment
+            )
+            self.count[found] += 1
+            self.last[found] = peaks[found]
+            self.maximum[found] = np.fmax(self.maximum[found], peaks[found])
+            row = self._n_scans % self._times.size
+            self._times[row] = scan.timestamp_ns
+            self._peaks[row] = peaks
+            self._n_scans += 1
+            fired = [
+                alarm
+                for alarm in self.alarms
+                if found[self.names.index(alarm.name)]
+                and alarm.check(peaks[self.names.index(alarm.name)])
+            ]
+        for alarm in fired:
+            value = float(peaks[self.names.index(alarm.name)])
+            logger.warning(
+                f"Alarm: {alarm.name} {value:.2e} mbar "
+                f"({'>' if alarm.above else '<'} {alarm.threshold:.2e})",
+            )
+            if alarm.callback is not None:
+                alarm.callback(alarm, value)
+        return fired
+
+    def add_alarm(
+        self,
+        name: str,
+        threshold: float,
+        above: bool = True,
+        callback: Callable[[Alarm, float], object] | None = None,
+    ) -> Alarm:
+        """Register an alarm on the peak height of the mass.
+
+        Parameters
+        ----------
+        name: str
+            Name of the mass
+        threshold: float
+            Pressure (mbar)
+        above: bool
+            True: fires when the peak exceeds the threshold, False: falls below.
+        callback: Callable[[Alarm, float], object] | None
+            Called with the alarm and the peak height when it fires.
+
+        Returns
+        -------
+        Alarm
+        """
+        if name not in self.names:
+            msg = f"{name} is not monitored ({self.names})"
+            raise ValueError(msg)
+        alarm = Alarm(name, threshold, above=above, callback=callback)
+        with self._lock:
+            self.alarms.append(alarm)
+        return alarm
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Return mean, std, last and max of the peak height of each mass."""
+        with self._lock:
+            measured = self.count > 0
+            mean = np.where(measured, self.mean, np.nan)
+            std = np.where(measured, np.sqrt(self.variance), np.nan)
+            return {
+                name: {
+                    "mass": float(self.masses[i]),
+                    "count": int(self.count[i]),
+                    "mean": float(mean[i]),
+                    "std": float(std[i]),
+                    "last": float(self.last[i]),
+                    "max": float(self.maximum[i]),
+                }
+                for i, name in enumerate(self.names)
+            }
+
+    def history(self, name: str) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Return the kept times (ns since the epoch) and peak heights of the mass."""
+        column = self.names.index(name)
+        with self._lock:
+            n_kept = min(self._n_scans, self._times.size)
+            order = (np.arange(n_kept) + self._n_scans - n_kept) % self._times.size
+            times = self._times[order]
+            peaks = self._peaks[order, column]
+        found = ~np.isnan(peaks)
+        return times[found], peaks[found]
+
+    def trend(self, name: str, span: float | None = None) -> float:
+        """Return the slope of the peak height (mbar/s) by least squares.
+
+        Parameters
+        ----------
+        name: str
+            Name of the mass
+        span: float | None
+            Time span (s) from the latest scan. None uses all the kept scans.
+
+        Returns
+        -------
+        float
+            Slope (mbar/s). nan if less than two scans.
+        """
+        times, peaks = self.history(name)
+        if span is not None and times.size:
+            inside = times >= times[-1] - span * 1e9
+            times, peaks = times[inside], peaks[inside]
+        if times.size < 2 or np.all(times == times[0]):
+            return np.nan
+        seconds = (times - times[0]) / 1e9
+        return float(np.polyfit(seconds, peaks, 1)[0])
@@ -6,9 +6,17 @@ from __future__ import annotations
 import argparse
 import datetime
 import time
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
 from logging import DEBUG, Formatter, StreamHandler, getLogger
+from typing import TYPE_CHECKING
 
+import numpy as np
 import serial
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from spd_controller.qmass.acquisition import Scan
 
 # logger
 LOGLEVEL = DEBUG
@@ -22,6 +30,208 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.propagate = False
 
+SCAN_START = bytes.fromhex("b6")
+END_MARKERS: tuple[int, ...] = (0xF4, 0xF6)
+FAILURE_MARKERS: tuple[int, ...] = (0xF0, 0xF2)
+LEAK_CHECK_POINTS = 128
+MULTIPLE_ION_MODE = 3
+SCAN_STOP = bytes.fromhex("00 00")
+
+# Conversion table from the 3-byte code to pressure, indexed by pressure range.
+# pressure = ((byte0 * 64 + byte1) * 64 + byte2 - PRESSURE_OFFSET) * PRESSURE_UNIT
+PRESSURE_UNIT: NDArray[np.float64] = np.array(
+    [3.81e-12, 3.81e-12, 3.81e-12, 1.907e-14, 1.907e-14, 1.907e-14, 1.907e-14],
+)
+PRESSURE_OFFSET: NDArray[np.int64] = np.array([0, 0, 0, 64, 64, 64, 64])
+CODE_WEIGHTS: NDArray[np.int64] = np.array([64 * 64, 64, 1])
+ZERO_PRESSURE_CODE = 0x7F
+
+
+IDLE_GAP = 0.05  # s. A reply of unknown length ends when the line is idle this long.
+
+
+@dataclass(frozen=True)
+class BootStep:
+    """One step of the initialization handshake of Microvision plus.
+
+    Attributes
+    ----------
+    name: str
+        Name of the step (for logging)
+    command: bytes
+        Bytes to send
+    length: int
+        Length of the reply. 0 means that the reply ends with ``terminator`` or,
+        if ``terminator`` is empty, when the line becomes idle.
+    expected: bytes
+        Expected first bytes of the reply (b"" accepts any reply)
+    terminator: bytes
+        Last byte of the reply (used when length is 0)
+    reply: bool
+        False if the command has no reply
+    optional: bool
+        If True, a missing reply is not an error
+    timeout: float
+        Deadline (s) for the reply of each attempt
+    retries: int
+        Number of resends when the reply is missing or unexpected
+    settle: float
+        Minimum wait (s) after the step before the next command
+    """
+
+    name: str
+    command: bytes
+    length: int = 0
+    expected: bytes = b""
+    terminator: bytes = b""
+    reply: bool = True
+    optional: bool = False
+    timeout: float = 3.0
+    retries: int = 2
+    settle: float = 0.0
+
+
+# The replies in the comments were captured from the original software.
+BOOT_SEQUENCE: tuple[BootStep, ...] = (
+    BootStep("wake up", b"$$$$$$$$$${000D,10:1FB6", timeout=5.0),
+    BootStep("LM76 001A", b"}LM76-00499001,001A,5:1660"),
+    BootStep("0011", b"{0011,55,1,0:402A"),
+    BootStep("LM76 001B", b"}LM76-00499001,001B,15:A7C2"),
+    # "aa d2" is returned, but the reply must be discarded to measure.
+    BootStep("af aa", bytes.fromhex("af aa"), optional=True, timeout=0.3, retries=0),
+    BootStep("ba 03", bytes.fromhex("ba 03"), reply=False, settle=1.5),
+    # 03 56 61 00 25 03 09 44 03 13 3e 02 2f 6a 03 00 00 01 00 4b 00
+    BootStep("a6", bytes.fromhex("a6"), length=21),
+    # 8f 04 19 00 ... 00 8e
+    BootStep(
+        "bf 04",
+        bytes.fromhex("bb 00 80 80 80 be 0a 00 ff 00 bf 04"),
+        expected=bytes.fromhex("8f 04"),
+        terminator=bytes.fromhex("8e"),
+    ),
+    BootStep("a7", bytes.fromhex("a7"), length=2),  # ff 00
+    # c2 52 85 7f
+    BootStep("aa 01", bytes.fromhex("aa 01 03 10 86 00 a1 00 00 bc"), length=4),
+    BootStep("ad 02", bytes.fromhex("ad 02"), length=1),  # 07
+    BootStep("ad 03", bytes.fromhex("ad 03"), length=1),  # 1e
+    BootStep("e1 00", bytes.fromhex("e1 00"), length=4),  # b2 33 8c bf
+    # 8f 05 21 0d 4c 4d 37 36 2d 30 30 34 39 39 30 30 31 00 ff ... ff 8e
+    BootStep(
+        "bf 05",
+        bytes.fromhex("bf 05"),
+        expected=bytes.fromhex("8f 05"),
+        terminator=bytes.fromhex("8e"),
+    ),
+    BootStep("e6 80 00", bytes.fromhex("e6 80 00"), reply=False, settle=1.0),
+)
+
+
+@dataclass(frozen=True)
+class MassChannel:
+    """A mass monitored in the multiple ion mode.
+
+    Attributes
+    ----------
+    mass: int
+        Mass number
+    accuracy: int
+        Accuracy (0 - 5) used for this mass
+    points: int
+        Number of the points averaged for this mass
+    """
+
+    mass: int
+    accuracy: int = 5
+    points: int = 1
+
+
+def find_marker(stream: bytes | bytearray, offset: int = 0) -> tuple[int, int]:
+    """Find the first end/failure marker in the 3-byte-per-point stream.
+
+    The stream is viewed as an (N, 3) uint8 array and the third byte of every
+    point is checked in one pass.  The incomplete point at the tail is ignored.
+
+    Parameters
+    ----------
+    stream: bytes | bytearray
+        Bytes received from Microvision plus.
+    offset: int
+        Index of the first point to check (the points before it are skipped).
+
+    Returns
+    -------
+    tuple[int, int]
+        (index of the point carrying the marker, marker byte).
+        If no marker is found, (number of complete points, -1).
+    """
+    n_points = len(stream) // 3
+    if n_points <= offset:
+        return n_points, -1
+    third = np.frombuffer(
+        stream,
+        dtype=np.uint8,
+        count=(n_points - offset) * 3,
+        offset=offset * 3,
+    )[2::3]
+    found = np.flatnonzero(np.isin(third, END_MARKERS + FAILURE_MARKERS))
+    if found.size == 0:
+        return n_points, -1
+    return offset + int(found[0]), int(third[found[0]])
+
+
+def to_mbar(
+    points: NDArray[np.uint8],
+    pressure_range: int | NDArray[np.integer],
+) -> NDArray[np.float64]:
+    """Convert (N, 3) codes from Microvision plus to pressure (mbar) at once.
+
+    Parameters
+    ----------
+    points: NDArray[np.uint8]
+        (N, 3) array of the 3-byte codes.
+    pressure_range: int | NDArray[np.integer]
+        Pressure range (0 - 6), or the array of the range of each point.
+
+    Returns
+    -------
+    NDArray[np.float64]
+        Pressure data
+    """
+    points = np.asarray(points, dtype=np.uint8).reshape(-1, 3)
+    pressure_range = np.asarray(pressure_range)
+    if np.any((pressure_range < 0) | (pressure_range >= PRESSURE_UNIT.size)):
+        msg = "pressure_range must be 0 - 6 and integer"
+        raise ValueError(msg)
+    counts = points.astype(np.int64) @ CODE_WEIGHTS - PRESSURE_OFFSET[pressure_range]
+    pressure = counts * PRESSURE_UNIT[pressure_range]
+    return np.where(points[:, 0] == ZERO_PRESSURE_CODE, 0.0, pressure)
+
+
+def convert_stream(
+    stream: bytes | bytearray,
+    pressure_range: int | NDArray[np.integer],
+) -> NDArray[np.float64]:
+    """Convert the raw bytes (3 bytes per point) to pressure (mbar) in bulk.
+
+    Useful to convert long leak-check/digital-mode logs after acquisition.
+    The incomplete point at the tail is ignored.
+
+    Parameters
+    ----------
+    stream: bytes | bytearray
+        Raw bytes without the end marker.
+    pressure_range: int | NDArray[np.integer]
+        Pressure range (0 - 6), or the array of the range of each point.
+
+    Returns
+    -------
+    NDArray[np.float64]
+        Pressure data
+    """
+    n_points = len(stream) // 3
+    points = np.frombuffer(stream, dtype=np.uint8, count=n_points * 3)
+    return to_mbar(points.reshape(-1, 3), pressure_range)
+
 
 def pressure_indicator(pressure: float, pressure_range: int | float) -> str:
     """Return Graph of the pressure by the character.
@@ -138,105 +348,66 @@ class Qmass:
         logger.debug("__init__() ends")
 
     def boot(self) -> None:
-        """Boot Microvision plus."""
-        data_to_read = self.com.in_waiting  # よけいなリードバッファがあった時用
-        self.com.read(data_to_read)
-        #
-        self.com.write(b"$$$$$$$$$$")
-        self.com.write(b"{000D,10:1FB6")
-        time.sleep(1.5)
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            time.sleep(0.2)
-            data_to_read = self.com.in_waiting
-            logger.debug(f"data_to_read {data_to_read}")
-        logger.debug(self.com.read(data_to_read))
-        self.com.write(b"}LM76-00499001,001A,5:1660")
-        time.sleep(0.2)
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            time.sleep(0.2)
-            data_to_read = self.com.in_waiting
-        logger.debug(self.com.read(data_to_read))
-        self.com.write(b"{0011,55,1,0:402A")
-        time.sleep(0.2)
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            time.sleep(0.2)
-            data_to_read = self.com.in_waiting
-        logger.debug(self.com.read(data_to_read))
-        self.com.write(b"}LM76-00499001,001B,15:A7C2")
-        time.sleep(0.2)
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            time.sleep(0.2)
-            data_to_read = self.com.in_waiting
-        logger.debug(self.com.read(data_to_read))
-        time.sleep(0.1)  # << OK?
-        self.com.write(bytes.fromhex("af"))
-        # By commenting out the following line, "aa d2" can be read.
-        # *But* cannot measure!!
-        self.com.write(bytes.fromhex("aa"))
-        self.com.timeout = 0.3
-        tmp = self.com.readline()
-        logger.debug(f'should be "aa d2": {tmp.hex()}')
-        tmp = self.com.reset_input_buffer()
-        logger.debug(f"Return of reset_input_buffer: {tmp}")
-        self.com.write(bytes.fromhex("ba 03"))
-        time.sleep(1.5)  # << OK?
-        self.com.write(bytes.fromhex("a6"))
-        data_to_read = self.com.in_waiting
-        logger.debug(f"data_to_read: {data_to_read}")
-        tmp = self.com.readline()
-        logger.debug(f"035661...004b00: {tmp}")
-        # 03 56 61 00 25 03 09 44 03 13 3e 02 2f 6a 03 00 00 01 00 4b 00
-        self.com.write(bytes.fromhex("bb 00 80 80 80 be 0a"))
-        self.com.write(bytes.fromhex("00 ff 00 bf 04"))
-        tmp = self.com.readline()
-        logger.debug(f'"8f041900...00008e": {tmp.hex()}')
-        # 8f 04 19 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 8e
-        self.com.write(bytes.fromhex("a7"))
-        data_to_read = self.com.in_waiting
-        logger.debug(f"data_to_read: {data_to_read}")
-        tmp = self.com.readline()
-        logger.debug(f'should be "ff 00": {tmp}"')
-        self.com.write(bytes.fromhex("aa 01 03 10 86 00 a1 00 00 bc"))
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            data_to_read = self.com.in_waiting
-        tmp = self.com.read(data_to_read)
-        logger.debug(f'"#c2 52 85 7f": {tmp}')
-        # c2 52 85 7f
-        time.sleep(1)
-        self.com.write(bytes.fromhex("ad 02"))
-        tmp = self.com.readline()
-        logger.debug(f"0x07: {tmp}")
-        # 07
-        self.com.write(bytes.fromhex("ad 03"))
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            data_to_read = self.com.in_waiting
-        tmp = self.com.read(data_to_read)
-        tmpfmt = 'data_to_read is: {} & should be "1e": {}'
-        logger.debug(tmpfmt.format(data_to_read, tmp))
-        # 1e
-        time.sleep(1)
-        self.com.write(bytes.fromhex("e1 00"))
-        data_to_read = self.com.in_waiting
-        while data_to_read == 0:
-            data_to_read = self.com.in_waiting
-        tmp = self.com.read(data_to_read)
-        logger.debug(f'"b2 33 8c bf": {tmp}')
-        # b2 33 8c bf
-        time.sleep(1)
-        self.com.write(bytes.fromhex("bf 05"))
-        tmp = self.com.readline()
-        logger.debug(f'"8f 05 21 0d ... ff ff ff 8e": {tmp}')
-        # 8f 05 21 0d 4c 4d 37 36 2d 30 30 34 39 39 30 30 31 00 ff ff ff ff ff ff ff ff ff ff ff ff ff ff ff ff ff ff 8e
-        self.com.write(bytes.fromhex("e6 80 00"))
+        """Boot Microvision plus.
+
+        Run the steps in ``BOOT_SEQUENCE``.  Each step waits for its reply until
+        the deadline (blocking read, no polling), and resends the command if the
+        reply is missing or unexpected.  The steps which need time to take effect
+        are followed by their minimum settle time.
+
+        Raises
+        ------
+        RuntimeError
+            If a step fails after the retries.
+        """
+        self.com.reset_input_buffer()  # よけいなリードバッファがあった時用
+        started = time.perf_counter()
+        for step in BOOT_SEQUENCE:
+            self._run_boot_step(step)
         self.com.timeout = None
-        logger.info("Microvision initialized")
-        time.sleep(1)
+        logger.info(
+            f"Microvision initialized ({time.perf_counter() - started:.2f} s)",
+        )
+
+    def _run_boot_step(self, step: BootStep) -> bytes:
+        """Send the command of the step and wait for the expected reply."""
+        for attempt in range(step.retries + 1):
+            started = time.perf_counter()
+            self.com.write(step.command)
+            if not step.reply:
+                logger.debug(f"boot step {step.name}: sent")
+                time.sleep(step.settle)
+                return b""
+            reply = self._read_reply(step)
+            elapsed = (time.perf_counter() - started) * 1e3
+            logger.debug(
+                f"boot step {step.name}: {elapsed:.1f} ms "
+                f"(attempt {attempt + 1}) {reply.hex(' ')}",
+            )
+            if step.optional:
+                self.com.reset_input_buffer()
+                time.sleep(step.settle)
+                return reply
+            if reply and reply.startswith(step.expected):
+                time.sleep(step.settle)
+                return reply
+            logger.warning(f"boot step {step.name}: unexpected reply {reply.hex(' ')}")
+            self.com.reset_input_buffer()
+        msg = f"Microvision boot failed at step {step.name}"
+        raise RuntimeError(msg)
+
+    def _read_reply(self, step: BootStep) -> bytes:
+        """Read the reply of the step (empty if the deadline expires)."""
+        self.com.timeout = step.timeout
+        if step.length:
+            return self.com.read(step.length)
+        if step.terminator:
+            return self.com.read_until(step.terminator)
+        reply = bytearray(self.com.read(1))
+        self.com.timeout = IDLE_GAP
+        while reply and (chunk := self.com.read(max(1, self.com.in_waiting))):
+            reply.extend(chunk)
+        return bytes(reply)
 
     def exit(self) -> None:
         """Close Microvision plus."""
@@ -332,17 +503,17 @@ class Qmass:
             command_pressure = f"00 {self.pressure_range - 2:02} "
         command_accuracy = f"00 {self.accuracy:02} "
         command_mass_span = f"{self.mass_span:02} "
-        command_start_mass = f"00 {self.start_mass - 1:02} 00 "
+        command_start_mass = f"00 {self.start_mass - 1:02x} 00 "
         command = command0 + command_pressure + command_accuracy
         command += command_mass_span + command_start_mass
         logger.debug(f"start_mass: {self.start_mass}")
         logger.debug(
-            f"mass_span: {mass_span} ({Qmass.mass_span_analog[self.mass_span]})",
+            f"mass_span: {self.mass_span} ({Qmass.mass_span_analog[self.mass_span]})",
         )
         logger.debug(f"accuracy: {self.accuracy}")
         logger.debug(
             "Pressure_range: {} ({:.0e})".format(
-                pressure_range,
+                self.pressure_range,
                 Qmass.range_table[self.pressure_range],
             ),
         )
@@ -434,7 +605,7 @@ class Qmass:
         logger.debug(f"accuracy: {self.accuracy}")
         logger.debug(
             "Pressure_range: {} ({:.0e})".format(
-                pressure_range,
+                self.pressure_range,
                 Qmass.range_table[self.pressure_range],
             ),
         )
@@ -442,29 +613,117 @@ class Qmass:
         self.com.write(bytes.fromhex(command))
         return 2
 
+    def monitor_masses(
+        self,
+        channels: Sequence[int | MassChannel],
+        cycles: int | None = None,
+        timeout: float = 10.0,
+    ) -> Iterator[Scan]:
+        """Multiple ion (peak-jump) monitoring mode.
+
+        Cycle through the selected masses, measuring only these masses.
+        Each mass is measured in the leak check mode with its own accuracy,
+        and the leak check is stopped before jumping to the next mass.
+
+        Parameters
+        ----------
+        channels: Sequence[int | MassChannel]
+            Masses to monitor. int means MassChannel(mass) (accuracy 5, 1 point).
+        cycles: int | None
+            Number of the cycles. None means forever.
+        timeout: float
+            Deadline (s) for the points of a mass.
+
+        Yields
+        ------
+        Scan
+            One scan (mode 3) per cycle, with the masses and their pressures.
+
+        Raises
+        ------
+        RuntimeError
+            If the points of a mass are not returned in time.
+        """
+        from spd_controller.qmass.acquisition import Scan
+
+        channels = [
+            channel if isinstance(channel, MassChannel) else MassChannel(channel)
+            for channel in channels
+        ]
+        masses = np.array([channel.mass for channel in channels], dtype=np.float64)
+        settings = (self.mode, self.start_mass, self.accuracy, self.com.timeout)
+        self.mode = MULTIPLE_ION_MODE
+        self.is_scanning = True
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                started = time.time_ns()
+                pressure = np.array(
+                    [self._measure_mass(channel, timeout) for channel in channels],
+                )
+                yield Scan(
+                    timestamp_ns=started,
+                    duration_ns=time.time_ns() - started,
+                    mode=MULTIPLE_ION_MODE,
+                    pressure_range=self.pressure_range,
+                    mass=masses,
+                    pressure=pressure,
+                )
+                cycle += 1
+        finally:
+            self.is_scanning = False
+            self.mode, self.start_mass, self.accuracy, self.com.timeout = settings
+
+    def _measure_mass(self, channel: MassChannel, timeout: float) -> float:
+        """Measure the averaged pressure of a mass in the leak check mode."""
+        self.start_mass = channel.mass
+        self.accuracy = channel.accuracy
+        self.leak_check()
+        self.com.timeout = timeout
+        self.com.write(SCAN_START)
+        stream = self.com.read(channel.points * 3)
+        self.com.write(SCAN_STOP)
+        self.com.timeout = IDLE_GAP
+        while self.com.read(max(1, self.com.in_waiting)):
+            pass  # discard the points sent before the stop
+        n_points, marker = find_marker(stream)
+        if n_points < channel.points or marker >= 0:
+            msg = f"No data for mass {channel.mass} (marker: {marker})"
+            raise RuntimeError(msg)
+        points = np.frombuffer(stream, dtype=np.uint8).reshape(-1, 3)
+        return float(self.convert_mbar_array(points).mean())
+
     def set_mode(self) -> None:
         """Measure mode set."""
         if self.mode == 0:
             self.analog_mode()
-            if savefile:
-                self._write_header()
         elif self.mode == 1:
             self.digital_mode()
-            if savefile:
-                self._write_header()
         else:
             self.leak_check()
-            if savefile:
-                self._write_header()
+        if isinstance(self.f_save, str):
+            self._write_header()
+
+    def settings(self) -> dict[str, int]:
+        """Return the measurement condition (stored in the recorded file)."""
+        return {
+            "mode": self.mode,
+            "pressure_range": self.pressure_range,
+            "accuracy": self.accuracy,
+            "start_mass": self.start_mass,
+            "mass_span": self.mass_span,
+        }
 
     def _write_header(self) -> None:
-        self.f_save = open(savefile, mode="w")
+        self.f_save = open(self.f_save, mode="w")
         # ここにヘッダ情報を書き込む
         # mode, range, date, start_mass, accuracy
         if self.mode == 0:
             header = "#Analog_mode. Date:"
         elif self.mode == 1:
             header = "#Digital_mode. Date:"
+        elif self.mode == MULTIPLE_ION_MODE:
+            header = "#Multiple_ion_mode. Date:"
         else:  # Leak check
             header = f"#Leak check mode. mass:{self.start_mass}. Date:"
         header += datetime.datetime.strftime(
@@ -481,6 +740,8 @@ class Qmass:
     def convert_mbar(self, data: bytearray) -> float | None:
         """Convert pressure (mbar) from byte data.
 
+        Reference implementation of ``to_mbar`` for a single point.
+
         Parameters
         ----------
         data: bytes object
@@ -492,16 +753,65 @@ class Qmass:
             Pressure data
 
         """
-        if data[0] == 0x7F:
+        if data[0] == ZERO_PRESSURE_CODE:
             return 0.0
         if self.pressure_range in (0, 1, 2):
             unit = 3.81e-12
-            return data[0] * 64 * 64 + data[1] * 64 * unit + data[2] * unit
+            return (data[0] * 64 * 64 + data[1] * 64 + data[2]) * unit
         if self.pressure_range in (3, 4, 5, 6):
             unit = 1.907e-14
-            return data[0] * 64 * 64 + data[1] * 64 * unit + (data[2] - 64) * unit
+            return (data[0] * 64 * 64 + data[1] * 64 + (data[2] - 64)) * unit
         return None
 
+    def convert_mbar_array(self, points: NDArray[np.uint8]) -> NDArray[np.float64]:
+        """Convert pressures (mbar) of many points at once.
+
+        Parameters
+        ----------
+        points: NDArray[np.uint8]
+            (N, 3) array of the data from Microvision
+
+        Returns
+        -------
+        NDArray[np.float64]
+            Pressure data
+        """
+        return to_mbar(points, self.pressure_range)
+
+    def decode(
+        self,
+        stream: bytes | bytearray,
+        n_points: int,
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Decode the first n_points of the stream into mass and pressure arrays.
+
+        Parameters
+        ----------
+        stream: bytes | bytearray
+            Bytes received from Microvision plus.
+        n_points: int
+            Number of the (complete) points to decode.
+
+        Returns
+        -------
+        tuple[NDArray[np.float64], NDArray[np.float64]]
+            mass and pressure (mbar).  In leak check mode, mass is constant.
+        """
+        points = np.frombuffer(stream, dtype=np.uint8, count=n_points * 3).reshape(
+            -1,
+            3,
+        )
+        pressure = self.convert_mbar_array(points)
+        if self.mode == 0:
+            mass_step = Qmass.mass_span_analog[self.mass_span] / 256
+            first_mass = self.start_mass - ((1 / mass_step) / 2 - 1) * mass_step
+            mass = first_mass + np.arange(n_points) * mass_step
+        elif self.mode == 1:
+            mass = self.start_mass + np.arange(n_points, dtype=np.float64)
+        else:
+            mass = np.full(n_points, self.start_mass, dtype=np.float64)
+        return mass, pressure
+
     def single_scan(self) -> list[str]:
         """Single scan.
 
@@ -509,109 +819,72 @@ class Qmass:
         the mass spectrum.  In leak check mode, single scan means
         128 times measurement.
 
+        The decoded values are also stored in self.mass and self.pressure.
+
         Returns
         -------
         data: list
+            Formatted lines for ``record``. Empty if the scan fails.
 
         """
         self.is_scanning = True
-        log_fmt = "{:02x} {:02x} {:02x} Pressure.: {:.2e} {:5.2f} {}"
         save_fmt = "{:5.3f}\t{:.5e}\n"
         leak_chk_fmt = "Pressure:{:.3e}: {}"
-        data = []
-        #
-        if self.mode == 0:
-            mass_step = 1 / (256 / Qmass.mass_span_analog[self.mass_span])
-            mass = self.start_mass - ((1 / mass_step) / 2 - 1) * mass_step
-            logger.debug(f"mass:{mass} mass_step: {mass_step}")
-        else:
-            mass_step = 1
-            mass = start_mass
         logger.debug("Sanning starts...")
-        scan_start_command = bytes.fromhex("b6")
-        i = 0
-        a_byte = b""
-        buf3bytes = []
-        #
         self.buffer = bytearray(b"")
-        self.com.write(scan_start_command)
-        running = True
-        while running:
+        arrivals: list[tuple[int, datetime.datetime]] = []
+        n_points, marker = 0, -1
+        self.com.write(SCAN_START)
+        while marker < 0:
             data_to_read = self.com.in_waiting
             while data_to_read == 0:
                 time.sleep(0.1)
                 data_to_read = self.com.in_waiting
             self.buffer.extend(self.com.read(data_to_read))
-            logger.debug(
-                "type of self.buffer {}, self.buffer {}".format(
-                    type(self.buffer),
-                    self.buffer,
-                ),
-            )
-            while len(self.buffer) > 2:
-                for _ in range(3):
-                    a_byte = self.buffer.pop(0)
-                    logger.debug(
-                        f"type of a_byte is {type(a_byte)}, a_byte {a_byte}",
-                    )
-                    buf3bytes.append(a_byte)
-                if a_byte in (0xF4, 0xF6):
-                    logger.debug('Scan end signal "0xf4" detected')
-                    running = False
-                    break  # normal end
-                if buf3bytes[2] in (0xF0, 0xF2):
-                    logger.debug("buf3bytes[2] is 0xf0(240). Scan fails.")
-                    running = False
-                    break
-                logger.debug(
-                    "type of buf3bytes is {}, buf3bytes {}".format(
-                        type(buf3bytes),
-                        buf3bytes,
-                    ),
+            n_points, marker = find_marker(self.buffer, offset=n_points)
+            arrivals.append((n_points, datetime.datetime.now()))
+            if self.mode == 2 and n_points >= LEAK_CHECK_POINTS:
+                n_points = LEAK_CHECK_POINTS
+                break
+        self.is_scanning = False
+        if marker in FAILURE_MARKERS:
+            logger.debug(f"Failure marker 0x{marker:02x} detected. Scan fails.")
+            return []
+        logger.debug(f"Scan ends with {n_points} points")
+        self.mass, self.pressure = self.decode(self.buffer, n_points)
+        if self.mode < 2:  # analog or digital mode
+            return [
+                save_fmt.format(mass, pressure)
+                for mass, pressure in zip(
+                    self.mass.tolist(),
+                    self.pressure.tolist(),
+                    strict=True,
                 )
-                pressure = self.convert_mbar(buf3bytes)
-                if self.mode < 2:  # analog or digital mode
-                    logger.debug(
-                        log_fmt.format(
-                            buf3bytes[0],
-                            buf3bytes[1],
-                            buf3bytes[2],
-                            pressure,
-                            mass,
-                            pressure_indicator(pressure, pressure_range),
-                        ),
-                    )
-                    a_data = save_fmt.format(mass, pressure)
-                    data.append(a_data)
-                    mass += mass_step
-                else:  # Leak check mode
-                    print(
-                        leak_chk_fmt.format(
-                            pressure,
-                            pressure_indicator(pressure, pressure_range),
-                        ),
-                    )
-                    now = datetime.datetime.strftime(
-                        datetime.datetime.now(),
-                        "%Y-%m-%d %H:%M:%S.%f",
-                    )
-                    a_data = f"{now}\t{pressure:.3e}\n"
-                    data.append(a_data)
-                    logger.debug(f"iterate {i}")
-                    i += 1
-                if i == 128:
-                    running = False
-                    break
-                for _ in range(3):
-                    buf3bytes.pop(0)
-        if buf3bytes[2] not in (0xF4, 0xF6):
-            logger.debug("buf3bytes[2] is 0xf0(240). Scan fails.")
-            running = False
-            data = []
-        logger.debug(f"Last buf3bytes is {buf3bytes}")
-        logger.debug(f"data is :{data}")
-        self.is_scannig = False
-        return data
+            ]
+        # Leak check mode: each point is stamped with the arrival time of its chunk.
+        print(
+            leak_chk_fmt.format(
+                self.pressure[-1],
+                pressure_indicator(self.pressure[-1], self.pressure_range),
+            ),
+        )
+        stamps = [
+            datetime.datetime.strftime(now, "%Y-%m-%d %H:%M:%S.%f")
+            for _, now in arrivals
+        ]
+        chunk_index = np.searchsorted(
+            [n for n, _ in arrivals],
+            np.arange(n_points),
+            side="right",
+        )
+        return [
+            f"{stamps[i]}\t{pressure:.3e}\n"
+            for i, pressure in zip(
+                chunk_index.tolist(),
+                self.pressure.tolist(),
+                strict=True,
+            )
+        ]
 
     def record(self, data: list[float]) -> None:
         """Record the Data.
@@ -644,7 +917,7 @@ class Qmass:
             start mass
 
         """
-        command = f"23 {start_mass - 1:02} 00"
+        command = f"23 {start_mass - 1:02x} 00"
         self.start_mass = start_mass
         self.com.write(bytes.fromhex(command))
 
@@ -737,7 +1010,8 @@ NOTE: あとでちゃんと書く。""",
     description_mode = """Mode (default: 0)
     0: Analog
     1: Digital
-    2: Leak check"""
+    2: Leak check
+    3: Multiple ion (use with --masses)"""
     description_mass_span = """mass span  (default: 2)
     Analog mode
         0: 8
@@ -768,7 +1042,7 @@ NOTE: あとでちゃんと書く。""",
         "-o",
         type=str,
         default=None,
-        help="""Output filename""",
+        help="""Output filename (binary, see spd_controller.qmass.recorder)""",
     )
     parser.add_argument("--mode", "-m", type=int, default=0, help=description_mode)
     parser.add_argument(
@@ -793,7 +1067,16 @@ NOTE: あとでちゃんと書く。""",
         default=4,
         help=description_pressure_range,
     )
+    parser.add_argument(
+        "--masses",
+        type=int,
+        nargs="+",
+        default=None,
+        help="""Masses monitored in the multiple ion mode (mode 3)""",
+    )
     args = parser.parse_args()
+    if args.mode == MULTIPLE_ION_MODE and not args.masses:
+        parser.error("--masses is required in the multiple ion mode (mode 3)")
     #
     mode_select = args.mode
     start_mass = args.init
@@ -815,18 +1098,42 @@ NOTE: あとでちゃんと書く。""",
         p_range=pressure_range,
         accuracy=accuracy,
         span=mass_span,
-        output=savefile,
     )
     q_mass.boot()
     q_mass.fil_on(1)
     q_mass.multiplier_on()
-    q_mass.set_mode()
-    try:
-        while True:
-            data = q_mass.single_scan()
-            q_mass.record(data)
-    except KeyboardInterrupt:
-        q_mass.terminate_scan()
+    from spd_controller.qmass.acquisition import QmassAcquisition, format_scan
+    from spd_controller.qmass.recorder import QmassRecorder
+
+    recorder = None
+    if mode_select == MULTIPLE_ION_MODE:
+        if savefile:
+            metadata = q_mass.settings() | {"masses": args.masses}
+            recorder = QmassRecorder(savefile, metadata=metadata)
+        monitor = q_mass.monitor_masses(args.masses)
+        try:
+            for scan in monitor:
+                print("".join(format_scan(scan)), end="")
+                if recorder:
+                    recorder.append(scan)
+        except KeyboardInterrupt:
+            monitor.close()
+            q_mass.terminate_scan()  # the leak check may still be streaming
+            q_mass.com.reset_input_buffer()
+    else:
+        q_mass.set_mode()
+        acquisition = QmassAcquisition(q_mass)
+        if savefile:
+            recorder = QmassRecorder(savefile, metadata=q_mass.settings())
+            acquisition.subscribe(recorder.append, name="recorder")
+        acquisition.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            acquisition.stop()
+    if recorder:
+        recorder.close()
     q_mass.multiplier_off()
     q_mass.fil_off()
     q_mass.exit()
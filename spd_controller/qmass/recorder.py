@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Binary columnar recorder of Q-mass scans.
+
+File layout (little endian)::
+
+    b"QMB1" | metadata length (uint32) | metadata (JSON, utf-8)
+    record 0 | record 1 | ...
+
+Each record is a fixed-width header (``RECORD``: b"SCAN", timestamp ns,
+duration ns, mode, pressure range, number of points) followed by the mass
+column and the pressure column (float32).  The records are only appended.
+The byte offset of every record is kept in a small sidecar index
+(``<file>.idx``, int64), which is rebuilt from the data file when it is
+missing or does not match the data.
+
+Text and Igor (itx) files are exported on demand::
+
+    python -m spd_controller.qmass.recorder rga.qmb --text rga.txt --itx rga.itx
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import struct
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO
+
+import numpy as np
+
+from .acquisition import Scan, format_scan
+from .qmass import Qmass
+
+MAGIC = b"QMB1"
+PREAMBLE = struct.Struct("<4sI")
+RECORD_MAGIC = b"SCAN"
+RECORD = struct.Struct("<4sqqBBxxI")
+MODE_NAMES: dict[int, str] = {
+    0: "Analog_mode",
+    1: "Digital_mode",
+    2: "Leak check mode",
+    3: "Multiple_ion_mode",
+}
+
+
+def index_path(path: str | Path) -> Path:
+    """Return the path of the sidecar index."""
+    path = Path(path)
+    return path.with_name(path.name + ".idx")
+
+
+class QmassRecorder:
+    """Append scans to a binary columnar file.
+
+    Parameters
+    ----------
+    path: str | Path
+        File name.  If the file exists, the scans are appended to it.
+    metadata: dict[str, Any] | None
+        Measurement condition stored in the file header (``Qmass.settings()``).
+        Ignored when appending to an existing file.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        metadata: dict[str, Any] | None = None,
+    ) -> None:
+        """Initialize."""
+        self.path = Path(path)
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            meta = dict(metadata or {})
+            meta.setdefault("created", datetime.datetime.now().isoformat())
+            encoded = json.dumps(meta).encode("utf-8")
+            with self.path.open("wb") as data_file:
+                data_file.write(PREAMBLE.pack(MAGIC, len(encoded)) + encoded)
+            index_path(self.path).write_bytes(b"")
+        else:
+            log = QmassLog(self.path)  # validates the file and repairs the index
+            end, offsets = log.end, log.offsets
+            del log  # release the memmap before truncating
+            if end < self.path.stat().st_size:
+                # drop the record cut off by a crash, so that the new records
+                # follow the last valid one
+                with self.path.open("r+b") as data_file:
+                    data_file.truncate(end)
+                offsets.astype("<i8").tofile(index_path(self.path))
+        self._data: BinaryIO = self.path.open("ab")
+        self._index: BinaryIO = index_path(self.path).open("ab")
+
+    def append(self, scan: Scan) -> None:
+        """Append the scan as one record."""
+        offset = self._data.tell()
+        self._data.write(
+            RECORD.pack(
+                RECORD_MAGIC,
+                scan.timestamp_ns,
+                scan.duration_ns,
+                scan.mode,
+                scan.pressure_range,
+                scan.pressure.size,
+            ),
+        )
+        self._data.write(np.asarray(scan.mass, dtype="<f4").tobytes())
+        self._data.write(np.asarray(scan.pressure, dtype="<f4").tobytes())
+        self._data.flush()
+        self._index.write(struct.pack("<q", offset))
+        self._index.flush()
+
+    def close(self) -> None:
+        """Close the files."""
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self) -> QmassRecorder:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class QmassLog:
+    """Read-only access to the file written by ``QmassRecorder``.
+
+    Parameters
+    ----------
+    path: str | Path
+        File name.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize."""
+        self.path = Path(path)
+        self._raw = np.memmap(self.path, dtype=np.uint8, mode="r")
+        magic, length = PREAMBLE.unpack_from(self._raw, 0)
+        if magic != MAGIC:
+            msg = f"{self.path} is not a Q-mass binary file"
+            raise ValueError(msg)
+        self.metadata: dict[str, Any] = json.loads(
+            self._raw[PREAMBLE.size : PREAMBLE.size + length].tobytes(),
+        )
+        self._first = PREAMBLE.size + length
+        self.offsets = self._load_index()
+        # byte offset after the last valid record
+        self.end = (
+            self._record_end(int(self.offsets[-1]))
+            if self.offsets.size
+            else self._first
+        )
+
+    def _load_index(self) -> np.ndarray:
+        idx = index_path(self.path)
+        offsets = np.fromfile(idx, dtype="<i8") if idx.exists() else np.array([], "<i8")
+        end = self._record_end(int(offsets[-1])) if offsets.size else self._first
+        if end != self._raw.size:
+            offsets = self._scan_offsets()
+            offsets.astype("<i8").tofile(idx)
+        return offsets
+
+    def _record_end(self, offset: int) -> int:
+        if offset + RECORD.size > self._raw.size:
+            return offset + RECORD.size  # cut in the header: beyond the file
+        n_points = RECORD.unpack_from(self._raw, offset)[-1]
+        return offset + RECORD.size + 8 * n_points
+
+    def _scan_offsets(self) -> np.ndarray:
+        offsets = []
+        offset = self._first
+        while offset + RECORD.size <= self._raw.size:
+            end = self._record_end(offset)
+            magic = RECORD.unpack_from(self._raw, offset)[0]
+            if magic != RECORD_MAGIC or end > self._raw.size:
+                break  # truncated record (crash while writing)
+            offsets.append(offset)
+            offset = end
+        return np.array(offsets, dtype="<i8")
+
+    def __len__(self) -> int:
+        return self.offsets.size
+
+    def __getitem__(self, i: int) -> Scan:
+        offset = int(self.offsets[i])
+        _, timestamp_ns, duration_ns, mode, pressure_range, n_points = (
+            RECORD.unpack_from(self._raw, offset)
+        )
+        start = offset + RECORD.size
+        columns = self._raw[start : start + 8 * n_points].view("<f4")
+        return Scan(
+            timestamp_ns=timestamp_ns,
+            duration_ns=duration_ns,
+            mode=mode,
+            pressure_range=pressure_range,
+            mass=columns[:n_points],
+            pressure=columns[n_points:],
+        )
+
+    def __iter__(self) -> Iterator[Scan]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def header(self) -> str:
+        """Return the header line of the text file (same as ``Qmass._write_header``)."""
+        mode = self.metadata.get("mode", 0)
+        if mode == 2:
+            header = f"#Leak check mode. mass:{self.metadata.get('start_mass')}. Date:"
+        else:
+            header = f"#{MODE_NAMES.get(mode, mode)}. Date:"
+        created = self.metadata.get("created", "")
+        header += created.replace("T", " ").split(".")[0]
+        pressure_range = self.metadata.get("pressure_range")
+        if pressure_range is not None:
+            header += ". Pressure_range: {} ({:.0e}).".format(
+                pressure_range,
+                Qmass.range_table[pressure_range],
+            )
+        header += f"Accuracy:{self.metadata.get('accuracy')}\n"
+        return header
+
+    def export_text(self, path: str | Path) -> None:
+        """Export as the text file written by ``Qmass.record``."""
+        with Path(path).open("w") as text_file:
+            text_file.write(self.header())
+            for scan in self:
+                text_file.writelines(format_scan(scan))
+                text_file.write("\n")
+
+    def export_itx(self, path: str | Path, prefix: str = "qmass") -> None:
+        """Export as Igor text file.
+
+        In analog/digital mode, the scans are stored as a 2D wave (scan x point)
+        with the mass wave.  In leak check mode, the pressures and times (s since
+        the first scan) are stored as 1D waves (plus the masses in multiple ion
+        mode).
+        """
+        lines = ["IGOR", f"X //{self.header().strip()}"]
+        if len(self) and self[0].mode < 2:
+            n_points = min(scan.pressure.size for scan in self)
+            pressure = np.array([scan.pressure[:n_points] for scan in self])
+            mass = self[0].mass[:n_points]
+            lines.append(f"WAVES/S/N=({n_points}) '{prefix}_mass'")
+            lines += ["BEGIN", *[f"{m:.4f}" for m in mass.tolist()], "END"]
+            lines.append(f"WAVES/S/N=({len(self)},{n_points}) '{prefix}_pressure'")
+            lines.append("BEGIN")
+            lines += [" ".join(f"{p:.5e}" for p in row) for row in pressure.tolist()]
+            lines.append("END")
+        else:
+            times = np.concatenate([scan.times_ns() for scan in self] or [[]])
+            mass = np.concatenate([scan.mass for scan in self] or [[]])
+            pressure = np.concatenate([scan.pressure for scan in self] or [[]])
+            elapsed = (times - times[0]) / 1e9 if times.size else times
+            if len(self) and self[0].mode == 3:
+                lines.append(
+                    f"WAVES/D '{prefix}_time', '{prefix}_mass', '{prefix}_pressure'",
+                )
+                lines.append("BEGIN")
+                lines += [
+                    f"{t:.6f} {m:.4f} {p:.5e}"
+                    for t, m, p in zip(
+                        elapsed.tolist(),
+                        mass.tolist(),
+                        pressure.tolist(),
+                        strict=True,
+                    )
+                ]
+            else:
+                lines.append(f"WAVES/D '{prefix}_time', '{prefix}_pressure'")
+                lines.append("BEGIN")
+                lines += [
+                    f"{t:.6f} {p:.5e}"
+                    for t, p in zip(elapsed.tolist(), pressure.tolist(), strict=True)
+                ]
+            lines.append("END")
+        Path(path).write_text("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("input", help="Q-mass binary file")
+    parser.add_argument("--text", type=str, default=None, help="text file to export")
+    parser.add_argument("--itx", type=str, default=None, help="itx file to export")
+    args = parser.parse_args()
+    log = QmassLog(args.input)
+    print(f"{args.input}: {len(log)} scans. {log.metadata}")
+    if args.text:
+        log.export_text(args.text)
+    if args.itx:
+        log.export_itx(args.itx)
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""Byte-level simulator of Microvision plus on a pseudo terminal.
+
+The simulator opens a pty pair and answers on the master side, so that the
+real ``Qmass`` class (pyserial) can be driven through ``simulator.port``
+without the analyzer::
+
+    with MicrovisionSimulator(baudrate=None) as simulator:
+        q_mass = Qmass(port=simulator.port, mode=1, p_range=4)
+        q_mass.boot()
+        q_mass.fil_on(1)
+        q_mass.multiplier_on()
+        q_mass.set_mode()
+        q_mass.single_scan()
+
+* The boot handshake is answered with the replies captured from the original
+  software (see ``BOOT_SEQUENCE`` in qmass.py).  The replies to the ASCII
+  commands (``{...}``/``}...``) were not captured, and are echoed back.
+* ``b6`` starts a scan.  In analog/digital mode, one spectrum (3 bytes per
+  point) ends with the end marker (or a failure marker, see ``failure_rate``).
+  In leak check mode, the points are sent continuously until ``00 00``.
+* The spectrum is a set of Gaussian peaks (``spectrum``: mass -> mbar) on a
+  flat ``background``, with relative (``noise``) and detector (``count_noise``,
+  in counts of the pressure range) Gaussian noise.  The codes are clipped at the
+  full scale of the pressure range.
+
+Qmass opens the port with XON/XOFF flow control.  On a pty, DC1/DC3 in the
+data would be swallowed (and DC3 stops the output of the client), so the
+simulator clears IXON/IXOFF of the terminal before every write and never puts
+DC1/DC3 in the point codes (such a code is moved to the nearest valid one).
+
+Run as a script to keep a simulator open for ``qmass.py``/``webqmass.py``::
+
+    python -m spd_controller.qmass.simulator
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from logging import DEBUG, Formatter, StreamHandler, getLogger
+from types import TracebackType
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .qmass import (
+    CODE_WEIGHTS,
+    LEAK_CHECK_POINTS,
+    PRESSURE_OFFSET,
+    PRESSURE_UNIT,
+    SCAN_START,
+    SCAN_STOP,
+    Qmass,
+)
+
+# logger
+LOGLEVEL = DEBUG
+logger = getLogger(__name__)
+fmt = "%(asctime)s %(levelname)s %(name)s :%(message)s"
+formatter = Formatter(fmt)
+handler = StreamHandler()
+handler.setLevel(LOGLEVEL)
+logger.setLevel(LOGLEVEL)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+# Replies captured from the original software (comments in qmass.py).
+BOOT_REPLIES: dict[bytes, bytes] = {
+    bytes.fromhex("af aa"): bytes.fromhex("aa d2"),
+    bytes.fromhex("a6"): bytes.fromhex(
+        "03 56 61 00 25 03 09 44 03 13 3e 02 2f 6a 03 00 00 01 00 4b 00",
+    ),
+    bytes.fromhex("bb 00 80 80 80 be 0a 00 ff 00 bf 04"): bytes.fromhex(
+        "8f 04 19" + " 00" * 25 + " 8e",
+    ),
+    bytes.fromhex("a7"): bytes.fromhex("ff 00"),
+    bytes.fromhex("aa 01 03 10 86 00 a1 00 00 bc"): bytes.fromhex("c2 52 85 7f"),
+    bytes.fromhex("ad 02"): bytes.fromhex("07"),
+    bytes.fromhex("ad 03"): bytes.fromhex("1e"),
+    bytes.fromhex("e1 00"): bytes.fromhex("b2 33 8c bf"),
+    bytes.fromhex("bf 05"): bytes.fromhex(
+        "8f 05 21 0d 4c 4d 37 36 2d 30 30 34 39 39 30 30 31 00" + " ff" * 20 + " 8e",
+    ),
+    bytes.fromhex("00 af"): bytes.fromhex("86"),
+    bytes.fromhex("e3 40"): bytes.fromhex("40"),  # not captured
+}
+
+# Length of the binary commands, by the first byte.
+COMMAND_LENGTH: dict[int, int] = {
+    0xA6: 1,
+    0xA7: 1,
+    0xB6: 1,
+    0xE2: 1,
+    0x22: 2,
+    0xAD: 2,
+    0xAF: 2,
+    0xBA: 2,
+    0xBF: 2,
+    0xE1: 2,
+    0xE3: 2,
+    0x23: 3,
+    0xE6: 3,
+    0xAA: 10,
+    0xBB: 12,
+}
+# Length of "00 e4 00 00 02 <mode> ...", by the mode byte.
+MODE_COMMAND = bytes.fromhex("00 e4 00 00 02")
+MODE_COMMAND_LENGTH: dict[int, int] = {0x01: 14, 0x02: 16, 0x04: 13}
+DEGAS_LENGTH = 8
+FLOW_CONTROL: tuple[int, ...] = (0x11, 0x13)  # DC1 (XON), DC3 (XOFF)
+
+# Residual gas of a baked UHV chamber (mass: mbar)
+DEFAULT_SPECTRUM: dict[float, float] = {
+    1: 2e-11,
+    2: 2e-9,
+    16: 1e-10,
+    17: 2e-10,
+    18: 8e-10,
+    28: 6e-10,
+    32: 2e-11,
+    40: 1e-11,
+    44: 1e-10,
+}
+
+
+def command_length(buffer: bytes | bytearray) -> int:
+    """Return the length of the first command in the buffer.
+
+    Returns
+    -------
+    int
+        Length of the command. 0 if the command is not complete yet.
+    """
+    if not buffer:
+        return 0
+    first = buffer[0]
+    if first == ord("$"):  # wake up
+        return 1
+    if first in b"{}":  # ASCII command: "{....:XXXX"
+        colon = buffer.find(b":")
+        return colon + 5 if 0 <= colon <= len(buffer) - 5 else 0
+    if first == 0x00:
+        if len(buffer) < 2:
+            return 0
+        if buffer[1] == 0x0B:
+            length = DEGAS_LENGTH
+        elif buffer[1] == MODE_COMMAND[1]:
+            if len(buffer) < len(MODE_COMMAND) + 1:
+                return 0
+            length = MODE_COMMAND_LENGTH.get(buffer[len(MODE_COMMAND)], 1)
+        else:  # 00 00 (stop), 00 af (exit)
+            length = 2
+    elif first == 0x20:  # 20 0x 00: multiplier, 20 0x rr 00: pressure range
+        if len(buffer) < 3:
+            return 0
+        length = 3 if buffer[2] == 0 else 4
+    else:
+        length = COMMAND_LENGTH.get(first, 1)
+    return length if len(buffer) >= length else 0
+
+
+def encode_pressure(
+    pressure: NDArray[np.float64],
+    pressure_range: int,
+) -> NDArray[np.uint8]:
+    """Encode pressures (mbar) into (N, 3) codes (inverse of ``to_mbar``).
+
+    The codes are clipped at the full scale of the range, and the codes with
+    a DC1/DC3 digit are moved to the nearest code without it.
+    """
+    counts = np.rint(np.asarray(pressure) / PRESSURE_UNIT[pressure_range])
+    counts = np.clip(counts, 0, CODE_WEIGHTS[0] * 64 - 1).astype(np.int64)
+    for weight in CODE_WEIGHTS:
+        bad = np.isin(counts // weight % 64, FLOW_CONTROL)
+        below = counts - counts % weight - 1  # previous digit, the rest 63
+        above = below + weight + 1  # next digit, the rest 0
+        nearest = np.where(counts - below < above - counts, below, above)
+        counts = np.where(bad, nearest, counts)
+    points = (counts[:, np.newaxis] // CODE_WEIGHTS) % 64
+    points[:, 2] += PRESSURE_OFFSET[pressure_range]
+    return points.astype(np.uint8)
+
+
+class MicrovisionSimulator:
+    """Microvision plus simulated on a pseudo terminal.
+
+    Parameters
+    ----------
+    spectrum: dict[float, float] | None
+        Partial pressure (mbar) of each mass. Default: ``DEFAULT_SPECTRUM``
+    background: float
+        Flat background (mbar)
+    peak_width: float
+        Standard deviation of the peaks (mass unit) in analog mode
+    noise: float
+        Relative noise of the pressure (at accuracy 5; doubles for each step down)
+    count_noise: float
+        Detector noise in the counts of the pressure range
+    failure_rate: float
+        Probability that an analog/digital scan ends with the failure marker
+    baudrate: int | None
+        Line speed (10 bits per byte). None sends the data as fast as possible.
+    seed: int | None
+        Seed of the random generator
+    """
+
+    def __init__(
+        self,
+        spectrum: dict[float, float] | None = None,
+        background: float = 1e-12,
+        peak_width: float = 0.15,
+        noise: float = 0.02,
+        count_noise: float = 2.0,
+        failure_rate: float = 0.0,
+        baudrate: int | None = 9600,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize."""
+        self.spectrum = dict(DEFAULT_SPECTRUM if spectrum is None else spectrum)
+        self.background = background
+        self.peak_width = peak_width
+        self.noise = noise
+        self.count_noise = count_noise
+        self.failure_rate = failure_rate
+        self.baudrate = baudrate
+        self.rng = np.random.default_rng(seed)
+        # state of the analyzer
+        self.mode = 0
+        self.pressure_range = 4
+        self.accuracy = 5
+        self.start_mass = 4
+        self.end_mass = 0
+        self.mass_span = 2
+        self.filament: int | None = None
+        self.multiplier = False
+        self.scanning = False
+        self.received: list[bytes] = []
+        self.n_scans = 0
+        #
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._rx = bytearray()
+        self._tx = bytearray()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start answering in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._serve,
+            name="microvision-simulator",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the thread and close the pty."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self) -> MicrovisionSimulator:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def masses(self) -> NDArray[np.float64]:
+        """Return the masses of one scan in the current mode."""
+        if self.mode == 0:
+            mass_step = Qmass.mass_span_analog[self.mass_span] / 256
+            first_mass = self.start_mass - ((1 / mass_step) / 2 - 1) * mass_step
+            return first_mass + np.arange(256) * mass_step
+        if self.mode == 1:
+            return np.arange(self.start_mass, self.end_mass + 1, dtype=np.float64)
+        return np.full(LEAK_CHECK_POINTS, self.start_mass, dtype=np.float64)
+
+    def pressures(self, masses: NDArray[np.float64]) -> NDArray[np.float64]:
+        """Return the (noisy) pressures measured at the masses."""
+        pressure = np.full(masses.shape, self.background)
+        if self.filament:
+            for mass, partial in self.spectrum.items():
+                if self.mode == 0:
+                    pressure += partial * np.exp(
+                        -0.5 * ((masses - mass) / self.peak_width) ** 2,
+                    )
+                else:
+                    pressure += np.where(np.rint(masses) == mass, partial, 0.0)
+        relative = self.noise * 2 ** (5 - self.accuracy)
+        pressure *= 1 + relative * self.rng.standard_normal(masses.shape)
+        unit = PRESSURE_UNIT[self.pressure_range]
+        return pressure + self.count_noise * unit * self.rng.standard_normal(
+            masses.shape,
+        )
+
+    def scan_bytes(self) -> bytes:
+        """Return the bytes of one scan (with the marker, except leak check)."""
+        points = encode_pressure(
+            self.pressures(self.masses()),
+            self.pressure_range,
+        ).tobytes()
+        self.n_scans += 1
+        if self.mode == 2:
+            return points
+        marker = 0xF0 if self.rng.random() < self.failure_rate else 0xF4
+        return points + bytes((0, 0, marker))
+
+    def _serve(self) -> None:
+        credit = 0.0
+        last = time.perf_counter()
+        while not self._stop.is_set():
+            wait = 0.002 if self._tx or self.scanning else 0.02
+            readable, _, _ = select.select([self._master], [], [], wait)
+            if readable:
+                try:
+                    self._rx.extend(os.read(self._master, 4096))
+                except BlockingIOError:
+                    pass
+                self._dispatch()
+            now = time.perf_counter()
+            if self.baudrate is None:
+                credit = float("inf")
+            else:
+                credit = min(credit + (now - last) * self.baudrate / 10, 64.0)
+            last = now
+            credit -= self._transmit(credit)
+
+    def _transmit(self, credit: float) -> int:
+        with self._lock:
+            leak_check = self.scanning and self.mode == 2
+            if leak_check and len(self._tx) < 3 * LEAK_CHECK_POINTS:
+                self._tx.extend(self.scan_bytes())
+            size = min(len(self._tx), int(min(credit, 4096)))
+            if size == 0:
+                return 0
+            self._release_flow_control()
+            try:
+                written = os.write(self._master, self._tx[:size])
+            except BlockingIOError:
+                return 0
+            del self._tx[:written]
+            return written
+
+    def _release_flow_control(self) -> None:
+        """Disable XON/XOFF on the terminal (pyserial enables it on reconfigure)."""
+        attributes = termios.tcgetattr(self._slave)
+        flags = termios.IXON | termios.IXOFF | termios.IXANY
+        if attributes[0] & flags:
+            attributes[0] &= ~flags
+            termios.tcsetattr(self._slave, termios.TCSANOW, attributes)
+
+    def _dispatch(self) -> None:
+        while length := command_length(self._rx):
+            command = bytes(self._rx[:length])
+            del self._rx[:length]
+            self.received.append(command)
+            with self._lock:
+                self._handle(command)
+
+    def _handle(self, command: bytes) -> None:
+        """Update the state and queue the reply of the command."""
+        if command in BOOT_REPLIES:
+            self._tx.extend(BOOT_REPLIES[command])
+        if command[:1] in (b"{", b"}"):
+            self._tx.extend(command)  # ASCII replies were not captured.
+        if command == SCAN_START:
+            self.scanning = True
+            if self.mode != 2:
+                self._tx.extend(self.scan_bytes())
+        elif command == SCAN_STOP:
+            self.scanning = False
+            self._tx.clear()
+        elif command.startswith(MODE_COMMAND):
+            self._set_mode(command)
+        elif command[0] == 0x22:
+            self.accuracy = command[1]
+        elif command[0] == 0x20:
+            self.multiplier = command[1] == 0x02
+            if len(command) == 4:
+                self.pressure_range = command[2] - (0 if self.multiplier else 2)
+        elif command[0] == 0x23:
+            self.start_mass = command[1] + 1
+        elif command[0] == 0xE3:
+            self.filament = {0x48: 1, 0x50: 2}.get(command[1])
+        elif command not in BOOT_REPLIES and command[:1] not in (b"$", b"{", b"}"):
+            logger.debug(f"command: {command.hex(' ')}")
+
+    def _set_mode(self, command: bytes) -> None:
+        mode = command[len(MODE_COMMAND)]
+        self.multiplier = command[6] == 0x02
+        if mode == 0x01:  # analog
+            self.mode = 0
+            self.pressure_range = command[7] + (0 if self.multiplier else 2)
+            self.accuracy = command[9]
+            self.mass_span = command[10]
+            self.start_mass = command[12] + 1
+        elif mode == 0x02:  # digital
+            self.mode = 1
+            self.pressure_range = command[7] + (0 if self.multiplier else 1)
+            self.accuracy = command[9]
+            self.start_mass = command[11] + 1
+            self.end_mass = int.from_bytes(command[12:14], "big")
+            self.mass_span = command[14]
+        else:  # leak check
+            self.mode = 2
+            self.pressure_range = command[7] + (0 if self.multiplier else 1)
+            self.accuracy = command[8]
+            self.start_mass = int.from_bytes(command[9:11], "big")
+        self.scanning = False
+        self._tx.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--noise", type=float, default=0.02, help="relative noise")
+    parser.add_argument(
+        "--baudrate",
+        type=int,
+        default=9600,
+        help="line speed (0: as fast as possible)",
+    )
+    parser.add_argument("--failure", type=float, default=0.0, help="failure rate")
+    args = parser.parse_args()
+    with MicrovisionSimulator(
+        noise=args.noise,
+        failure_rate=args.failure,
+        baudrate=args.baudrate or None,
+    ) as simulator:
+        print(f"Microvision plus simulator on {simulator.port}  (Ctrl-C to quit)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
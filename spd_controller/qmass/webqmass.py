@@ -1,12 +1,371 @@
 #!/usr/bin/env python3
-"""Qmass spectral data acquisition Web based user interface."""
+"""Qmass spectral data acquisition Web based user interface.
+
+The measurement runs in the background (``QmassAcquisition``), independently of
+the browser.  Every second the page asks for the points acquired since its last
+update (``cursor``), and the graph is updated partially:
+
+* analog/digital mode: only the pressures of a new scan are sent (``Patch``).
+* leak check mode: only the new points are appended (``extendData``).  The trace
+  is downsampled on the server (``DownsampledTrace``), so that the size of the
+  trace in the browser and in the server is bounded for a multi-day run.
+
+::
+
+    python -m spd_controller.qmass.webqmass --port /dev/ttyUSB0
+    python -m spd_controller.qmass.webqmass --simulator  # without the analyzer
+"""
 
 
 from __future__ import annotations
 
+import argparse
+import datetime
+import threading
+from logging import DEBUG, Formatter, StreamHandler, getLogger
+from typing import Any
+
 import dash
 import dash_daq as daq
-from dash import Input, Output, dcc, html
+import numpy as np
+from dash import Input, Output, Patch, State, dcc, html, no_update
+from numpy.typing import NDArray
+
+from spd_controller.qmass.acquisition import QmassAcquisition, Scan
+from spd_controller.qmass.qmass import Qmass
+from spd_controller.qmass.recorder import QmassRecorder
+
+# logger
+LOGLEVEL = DEBUG
+logger = getLogger(__name__)
+fmt = "%(asctime)s %(levelname)s %(name)s :%(message)s"
+formatter = Formatter(fmt)
+handler = StreamHandler()
+handler.setLevel(LOGLEVEL)
+logger.setLevel(LOGLEVEL)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+MODES: dict[str, int] = {"analog_mode": 0, "digital_mode": 1, "leak_check_mode": 2}
+TRACE_CAPACITY = 4096  # buckets of the leak check trace (2 points per bucket)
+TITLE = "Q-mass spectroscopy"
+
+
+class DownsampledTrace:
+    """Min/max envelope of a long time trace in fixed memory.
+
+    The points are grouped into buckets of ``width`` points, and each bucket
+    keeps its minimum and maximum points (so spikes never disappear).  When
+    ``capacity`` buckets are filled, neighbouring buckets are merged and
+    ``width`` doubles.  ``generation`` counts the merges: within the same
+    generation, the buckets only grow at the end.
+
+    Parameters
+    ----------
+    capacity: int
+        Number of the buckets (even)
+    """
+
+    def __init__(self, capacity: int = TRACE_CAPACITY) -> None:
+        """Initialize."""
+        self.capacity = capacity - capacity % 2
+        self.width = 1
+        self.size = 0
+        self.generation = 0
+        self.n_points = 0
+        # time (s since the epoch) and pressure of the min/max point of buckets
+        self._buckets = np.empty((4, self.capacity))  # t_low, low, t_high, high
+        self._partial: NDArray[np.float64] | None = None  # incomplete bucket
+        self._count = 0  # number of points in the incomplete bucket
+
+    def extend(self, times: NDArray[np.float64], pressure: NDArray[np.float64]) -> None:
+        """Append the points.
+
+        Parameters
+        ----------
+        times: NDArray[np.float64]
+            Time of each point (s since the epoch)
+        pressure: NDArray[np.float64]
+            Pressure of each point
+        """
+        times = np.asarray(times, dtype=np.float64)
+        pressure = np.asarray(pressure, dtype=np.float64)
+        self.n_points += times.size
+        while times.size:
+            if self._count or times.size < self.width:
+                n = min(self.width - self._count, times.size)
+                self._fill_partial(times[:n], pressure[:n])
+                times, pressure = times[n:], pressure[n:]
+                continue
+            if self.size == self.capacity:
+                self._compact()
+                continue
+            n_buckets = min(times.size // self.width, self.capacity - self.size)
+            n = n_buckets * self.width
+            rows_t = times[:n].reshape(n_buckets, self.width)
+            rows_p = pressure[:n].reshape(n_buckets, self.width)
+            index = np.arange(n_buckets)
+            low, high = rows_p.argmin(axis=1), rows_p.argmax(axis=1)
+            self._buckets[:, self.size : self.size + n_buckets] = (
+                rows_t[index, low],
+                rows_p[index, low],
+                rows_t[index, high],
+                rows_p[index, high],
+            )
+            self.size += n_buckets
+            times, pressure = times[n:], pressure[n:]
+
+    def _fill_partial(
+        self,
+        times: NDArray[np.float64],
+        pressure: NDArray[np.float64],
+    ) -> None:
+        low, high = int(pressure.argmin()), int(pressure.argmax())
+        bucket = np.array([times[low], pressure[low], times[high], pressure[high]])
+        if self._partial is not None and self._count:
+            bucket = self._merge(self._partial, bucket)
+        self._partial = bucket
+        self._count += times.size
+        if self._count == self.width:
+            if self.size == self.capacity:
+                self._compact()
+            if self._count == self.width:
+                self._buckets[:, self.size] = self._partial
+                self.size += 1
+                self._count = 0
+
+    @staticmethod
+    def _merge(
+        first: NDArray[np.float64],
+        second: NDArray[np.float64],
+    ) -> NDArray[np.float64]:
+        """Merge the buckets ((4, ...) arrays)."""
+        merged = first.copy()
+        lower = second[1] < first[1]
+        higher = second[3] > first[3]
+        merged[:2] = np.where(lower, second[:2], first[:2])
+        merged[2:] = np.where(higher, second[2:], first[2:])
+        return merged
+
+    def _compact(self) -> None:
+        pairs = self._buckets[:, : self.size].reshape(4, -1, 2)
+        half = self.size // 2
+        self._buckets[:, :half] = self._merge(pairs[:, :, 0], pairs[:, :, 1])
+        self.size = half
+        self.width *= 2
+        self.generation += 1
+
+    def points(self, start: int = 0) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Return the points of the buckets from start, in time order.
+
+        Returns
+        -------
+        tuple[NDArray[np.float64], NDArray[np.float64]]
+            time (s since the epoch) and pressure
+        """
+        t_low, low, t_high, high = self._buckets[:, start : self.size]
+        if self.width == 1:
+            return t_low.copy(), low.copy()
+        first = t_low <= t_high
+        times = np.column_stack(
+            [np.where(first, t_low, t_high), np.where(first, t_high, t_low)],
+        )
+        pressure = np.column_stack(
+            [np.where(first, low, high), np.where(first, high, low)],
+        )
+        return times.ravel(), pressure.ravel()
+
+
+def local_time(seconds: NDArray[np.float64]) -> list[str]:
+    """Convert the times (s since the epoch) to local ISO strings for plotly."""
+    offset = datetime.datetime.now().astimezone().utcoffset()
+    shift = offset.total_seconds() if offset else 0.0
+    stamps = ((np.asarray(seconds) + shift) * 1e6).astype("datetime64[us]")
+    return np.datetime_as_string(stamps).tolist()
+
+
+def spectrum_figure(scan: Scan) -> dict[str, Any]:
+    """Figure of the mass spectrum."""
+    return {
+        "data": [
+            {
+                "type": "scatter",
+                "mode": "lines" if scan.mode == 0 else "lines+markers",
+                "x": scan.mass.tolist(),
+                "y": scan.pressure.tolist(),
+            },
+        ],
+        "layout": {
+            "uirevision": "spectrum",
+            "xaxis": {"title": {"text": "Mass"}},
+            "yaxis": {"title": {"text": "Pressure (mbar)"}, "exponentformat": "e"},
+        },
+    }
+
+
+def trace_figure(times: list[str], pressure: list[float]) -> dict[str, Any]:
+    """Figure of the leak check trace."""
+    return {
+        "data": [{"type": "scattergl", "mode": "lines", "x": times, "y": pressure}],
+        "layout": {
+            "uirevision": "trace",
+            "xaxis": {"title": {"text": "Time"}},
+            "yaxis": {"title": {"text": "Pressure (mbar)"}, "exponentformat": "e"},
+        },
+    }
+
+
+class AcquisitionWorker:
+    """Background measurement of the dashboard.
+
+    Qmass is connected (and booted) at the first ``start``.
+
+    Parameters
+    ----------
+    port: str
+        Serial port of Microvision plus
+    trace_capacity: int
+        Number of the buckets of the leak check trace
+    """
+
+    def __init__(
+        self,
+        port: str = "/dev/ttyUSB0",
+        trace_capacity: int = TRACE_CAPACITY,
+    ) -> None:
+        """Initialize."""
+        self.port = port
+        self.trace_capacity = trace_capacity
+        self.q_mass: Qmass | None = None
+        self.acquisition: QmassAcquisition | None = None
+        self.recorder: QmassRecorder | None = None
+        self.lock = threading.Lock()
+        self.run = 0
+        self.n_scans = 0
+        self.latest: Scan | None = None
+        self.trace = DownsampledTrace(trace_capacity)
+
+    @property
+    def running(self) -> bool:
+        """True if measuring."""
+        return self.acquisition is not None and self.acquisition.running
+
+    def start(
+        self,
+        mode: int,
+        pressure_range: int,
+        accuracy: int,
+        start_mass: int,
+        mass_span: int,
+        filament: int = 0,
+        multiplier: bool = False,
+        filename: str | None = None,
+    ) -> None:
+        """Set the measurement condition and start the measurement."""
+        self.stop()
+        if self.q_mass is None:
+            self.q_mass = Qmass(port=self.port)
+            self.q_mass.boot()
+        q_mass = self.q_mass
+        if filament and q_mass.filament != filament:
+            q_mass.fil_on(filament)
+        elif not filament and q_mass.filament:
+            q_mass.fil_off()
+        if multiplier and not q_mass.multiplier:
+            q_mass.multiplier_on()
+        elif not multiplier and q_mass.multiplier:
+            q_mass.multiplier_off()
+        q_mass.mode = mode
+        q_mass.pressure_range = pressure_range
+        q_mass.accuracy = accuracy
+        q_mass.start_mass = start_mass
+        q_mass.mass_span = mass_span
+        q_mass.set_mode()
+        with self.lock:
+            self.run += 1
+            self.n_scans = 0
+            self.latest = None
+            self.trace = DownsampledTrace(self.trace_capacity)
+        self.acquisition = QmassAcquisition(q_mass)
+        self.acquisition.subscribe(self.add_scan, name="dashboard")
+        if filename:
+            self.recorder = QmassRecorder(filename, metadata=q_mass.settings())
+            self.acquisition.subscribe(self.recorder.append, name="recorder")
+        self.acquisition.start()
+        logger.info(f"Measurement starts: {q_mass.settings()}")
+
+    def stop(self) -> None:
+        """Stop the measurement."""
+        if self.acquisition is not None:
+            self.acquisition.stop()
+            self.acquisition = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def add_scan(self, scan: Scan) -> None:
+        """Store the scan (subscriber of the acquisition)."""
+        with self.lock:
+            self.latest = scan
+            self.n_scans += 1
+            if scan.mode == 2:
+                self.trace.extend(scan.times_ns() / 1e9, scan.pressure)
+
+    def graph_update(
+        self,
+        cursor: dict[str, int] | None,
+    ) -> tuple[Any, Any, Any, Any]:
+        """Return the partial update of the graph since cursor.
+
+        Parameters
+        ----------
+        cursor: dict[str, int] | None
+            What the browser already has (returned by the previous call)
+
+        Returns
+        -------
+        tuple[Any, Any, Any, Any]
+            (figure, extendData, cursor, title).  ``no_update`` for the
+            unchanged ones.  figure is a ``Patch`` when only the pressures of
+            the spectrum change.
+        """
+        cursor = cursor or {}
+        with self.lock:
+            scan = self.latest
+            if scan is None:
+                return no_update, no_update, no_update, no_update
+            same_run = cursor.get("run") == self.run
+            if same_run and cursor.get("scan") == self.n_scans:
+                return no_update, no_update, no_update, no_update
+            title = no_update
+            if scan.pressure.size:  # empty when cut short by a failure marker
+                title = f"{TITLE}: scan {self.n_scans}, {scan.pressure[-1]:.2e} mbar"
+            new_cursor = {"run": self.run, "scan": self.n_scans}
+            if scan.mode < 2:
+                new_cursor["points"] = scan.pressure.size
+                if same_run and cursor.get("points") == scan.pressure.size:
+                    figure = Patch()
+                    figure["data"][0]["y"] = scan.pressure.tolist()
+                else:
+                    figure = spectrum_figure(scan)
+                return figure, no_update, new_cursor, title
+            trace = self.trace
+            new_cursor |= {"generation": trace.generation, "buckets": trace.size}
+            if same_run and cursor.get("generation") == trace.generation:
+                times, pressure = trace.points(start=cursor.get("buckets", 0))
+                extend = (
+                    {"x": [local_time(times)], "y": [pressure.tolist()]},
+                    [0],
+                    2 * trace.capacity,
+                )
+                return no_update, extend, new_cursor, title
+            times, pressure = trace.points()
+            figure = trace_figure(local_time(times), pressure.tolist())
+            return figure, no_update, new_cursor, title
+
+
+worker = AcquisitionWorker()
 
 external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
 
@@ -198,12 +557,13 @@ measurement_module = html.Div(
     [
         measure_button,
         dcc.Graph(id="Graph"),
+        dcc.Store(id="cursor"),
         dcc.Interval(id="intervals", interval=1000, max_intervals=-1),
     ],
 )  # << ここにグラフがはいる。
 app.layout = html.Div(
     [
-        html.H1("Q-mass spectroscopy", id="placeholder", style={"textAlign": "center"}),
+        html.H1(TITLE, id="placeholder", style={"textAlign": "center"}),
         html.Hr(),
         basic_module,
         mode_module,
@@ -268,44 +628,87 @@ def set_condition(
     Output("start_mass", "disabled"),
     Output("mass_span", "disabled"),
     Input("measure_button", "on"),
-)
-def measure_starts(measure: bool) -> tuple[bool, ...]:
-    if measure:
-        return (False, True, True, True, True, True, True, True, True)
-    return (True, False, False, False, False, False, False, False, False)
-
-
-"""
-@app.callback(
-    Output("Graph", "figure"),
-    Output("placeholder", "children")
-    Input("intervals", "n_interval"),
     State("filename", "value"),
+    State("filament_selection", "value"),
+    State("multiplier", "on"),
     State("mode_selection", "value"),
     State("range_selection", "value"),
     State("accuracy_selection", "value"),
-    State("start_mass", "disabled"),
+    State("start_mass", "value"),
     State("mass_span", "value"),
 )
-def measureing(n: int, mass_span: int, range: int, accuracy: int):
-    pass
-"""
+def measure_starts(
+    measure: bool,
+    filename: str | None,
+    filament: int,
+    multiplier: bool,
+    mode: str,
+    pressure_range: int,
+    accuracy: int,
+    start_mass: int,
+    mass_span: int,
+) -> tuple[bool, ...]:
+    """Start/stop the measurement by the power button."""
+    idle = (True, False, False, False, False, False, False, False, False)
+    if not measure:
+        worker.stop()
+        return idle
+    try:
+        worker.start(
+            mode=MODES[mode],
+            pressure_range=pressure_range,
+            accuracy=accuracy,
+            start_mass=start_mass,
+            mass_span=mass_span,
+            filament=filament,
+            multiplier=multiplier,
+            filename=filename,
+        )
+    except Exception:
+        logger.exception("Measurement cannot start")
+        return idle
+    return (False, True, True, True, True, True, True, True, True)
+
+
+@app.callback(
+    Output("Graph", "figure"),
+    Output("Graph", "extendData"),
+    Output("cursor", "data"),
+    Output("placeholder", "children"),
+    Input("intervals", "n_intervals"),
+    State("cursor", "data"),
+)
+def measuring(n: int, cursor: dict[str, int] | None) -> tuple[Any, Any, Any, Any]:
+    """Send only what the browser does not have yet."""
+    return worker.graph_update(cursor)
+
 
 # main
 
 if __name__ == "__main__":
-    """Main routine"""
-    """
-    port = "/dev/ttyUSB0"
-    q_mass = Qmass(
-        port=port
-        mode=0  ## Analog mode
-        init = 2  ## Start mass
-        p_range = 0  ## 1E-7 mbar
-        accuracy =4
-        span = 0
-        output=""  ## file name. q_mass.f_save でアクセスできる。
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--port",
+        type=str,
+        default="/dev/ttyUSB0",
+        help="serial port (default: /dev/ttyUSB0)",
     )
-    q_mass.boot()
-    """
-    app.run_server(debug=True, host="0.0.0.0")
+    parser.add_argument(
+        "--simulator",
+        action="store_true",
+        default=False,
+        help="if set, use the simulator of Microvision plus",
+    )
+    parser.add_argument("--debug", action="store_true", default=False)
+    args = parser.parse_args()
+    worker.port = args.port
+    if args.simulator:
+        from spd_controller.qmass.simulator import MicrovisionSimulator
+
+        simulator = MicrovisionSimulator()
+        simulator.start()
+        worker.port = simulator.port
+    try:
+        app.run(debug=args.debug, host="0.0.0.0", use_reloader=False)
+    finally:
+        worker.stop()
@@ -0,0 +1,203 @@
+"""Cache of the settings of SCPI instruments.
+
+The settings in effect are kept as {header: value}, seeded from ``*LRN?`` (or
+the queries of each setting), so that a setting already in effect is not sent
+again, and a profile of settings is applied as the minimal difference in one
+write::
+
+    scope.refresh()  # *LRN?
+    scope.apply({":ACQuire:MODe": "AVERage", ":ACQuire:AVERage": 16})
+
+The headers and the keyword values are compared in the short form (the
+uppercase part of the mixed-case keyword of the manual: ":CHANnel1:IMPedance"
+is "CHAN1:IMP", "SAMPle" is "SAMP"), and the numbers by their value.  The
+optional root node SENSe is dropped (":SENSe:VOLTage:NPLC" is "VOLT:NPLC").
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator, Mapping, Sequence
+
+from . import Comm
+
+_NODE = re.compile(r"([A-Za-z]+)(\d*)")
+_OPTIONAL_ROOTS = {"SENS", "SENS1"}
+
+
+def _short(keyword: str) -> str:
+    if keyword.isupper():
+        return keyword
+    match = re.match(r"[A-Z]*", keyword)
+    return match.group() if match and match.group() else keyword.upper()
+
+
+def normalize_header(header: str) -> str:
+    """Return the short form of the command header (":ACQuire1:MODe" -> "ACQ1:MOD").
+
+    A trailing "?" and the optional root node SENSe ("SENS:VOLT:RANG" ->
+    "VOLT:RANG") are removed.
+    """
+    nodes: list[str] = []
+    for node in header.strip().rstrip("?").lstrip(":").split(":"):
+        match = _NODE.fullmatch(node.lstrip("*"))
+        if match is None:
+            nodes.append(node.upper())
+            continue
+        keyword, suffix = match.groups()
+        nodes.append(("*" if node.startswith("*") else "") + _short(keyword) + suffix)
+    if len(nodes) > 1 and nodes[0] in _OPTIONAL_ROOTS:
+        nodes = nodes[1:]
+    return ":".join(nodes)
+
+
+def normalize_value(value: object) -> str:
+    """Return the comparable form of the value (number, keyword or string)."""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    text = str(value).strip()
+    try:
+        return repr(float(text))
+    except ValueError:
+        pass
+    if text[:1] in ('"', "'"):
+        return text
+    return _short(text) if text.isalpha() else text.upper()
+
+
+class SettingsCache:
+    """Settings in effect of an instrument.
+
+    Unknown settings (not cached) are always sent.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._settings: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._settings)
+
+    def __contains__(self, header: object) -> bool:
+        return isinstance(header, str) and normalize_header(header) in self._settings
+
+    def load(self, learned: str) -> None:
+        """Replace the cache by the response of ``*LRN?``.
+
+        The response is the sequence of ";"-separated commands
+        (":ACQuire:MODe SAMPle;:ACQuire:AVERage 2;...").  The entries without
+        the value are ignored.
+        """
+        self._settings.clear()
+        for entry in learned.strip().split(";"):
+            header, _, value = entry.strip().partition(" ")
+            if header and value:
+                self._settings[normalize_header(header)] = normalize_value(value)
+
+    def get(self, header: str) -> str | None:
+        """Return the cached value (normalized), or None if unknown."""
+        return self._settings.get(normalize_header(header))
+
+    def is_current(self, header: str, value: object) -> bool:
+        """Return True if the value is known to be in effect."""
+        return self.get(header) == normalize_value(value)
+
+    def update(self, header: str, value: object) -> None:
+        """Record the value sent (or read) as in effect."""
+        self._settings[normalize_header(header)] = normalize_value(value)
+
+    def diff(self, profile: Mapping[str, object]) -> dict[str, object]:
+        """Return the settings of the profile which are not in effect."""
+        return {
+            header: value
+            for header, value in profile.items()
+            if not self.is_current(header, value)
+        }
+
+    def snapshot(self) -> dict[str, str]:
+        """Return the copy of the cached settings (usable as a profile)."""
+        return {
+            (h if h.startswith("*") else ":" + h): v for h, v in self._settings.items()
+        }
+
+    def clear(self) -> None:
+        """Forget the settings (after "*RST", "AUTOSet" etc.)."""
+        self._settings.clear()
+
+
+class SCPIInstrument(Comm):
+    """SCPI instrument with the settings cache.
+
+    Parameters
+    ----------
+    term : str, optional
+        terminal character, by default "\\r"
+    """
+
+    def __init__(self, term: str = "\r") -> None:
+        """Initialize."""
+        super().__init__(term=term)
+        self.settings = SettingsCache()
+
+    def configure(self, header: str, value: object, force: bool = False) -> bool:
+        """Send the setting unless it is already in effect.
+
+        Parameters
+        ----------
+        header : str
+            Command header (":ACQuire:MODe")
+        value : object
+            Value of the setting
+        force : bool
+            If True, send it anyway.
+
+        Returns
+        -------
+        bool
+            True if the command is sent.
+        """
+        if not force and self.settings.is_current(header, value):
+            return False
+        self.sendtext(f"{header} {value}")
+        self.settings.update(header, value)
+        return True
+
+    def apply(self, profile: Mapping[str, object]) -> list[str]:
+        """Send the settings of the profile not in effect, in one write.
+
+        Returns
+        -------
+        list[str]
+            Commands sent
+        """
+        commands = [
+            f"{header} {value}" for header, value in self.settings.diff(profile).items()
+        ]
+        if commands:
+            self.send("".join(c + self.TERM for c in commands).encode("utf-8"))
+        for header, value in profile.items():
+            self.settings.update(header, value)
+        return commands
+
+    def query_settings(self, headers: Sequence[str]) -> dict[str, str]:
+        """Query the settings in one write, and cache them.
+
+        Returns
+        -------
+        dict[str, str]
+            Response of each header
+        """
+        if not headers:
+            return {}
+        self.send("".join(f"{h}?{self.TERM}" for h in headers).encode("utf-8"))
+        values = {h: self.read_until().decode("utf-8").strip() for h in headers}
+        for header, value in values.items():
+            self.settings.update(header, value)
+        return values
+
+    def refresh(self) -> None:
+        """Read again the cached settings from the instrument."""
+        self.query_settings(list(self.settings.snapshot()))
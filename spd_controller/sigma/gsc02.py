@@ -11,10 +11,12 @@ Hardware specification:
 from __future__ import annotations
 
 import argparse
+from functools import cached_property
 
 from serial.tools import list_ports
 
 from .. import Comm
+from ..motion import MotionFuture, PositionCache
 
 
 class GSC02(Comm):
@@ -50,31 +52,53 @@ class GSC02(Comm):
                 msg,
             )
 
-    def angle(self) -> float:
+    @cached_property
+    def angle_cache(self) -> PositionCache[float]:
+        """Last known angle while the stage is idle."""
+        return PositionCache(self._read_angle)
+
+    def angle(self, *, refresh: bool = False) -> float:
         """Return the current angle of the rotation stage.
 
+        While the stage is idle, the angle known from the last read or the last
+        rotation is returned without the query (see ``PositionCache``).
+
+        Parameters
+        ----------
+        refresh : bool
+            If True, read the angle from the controller anyway.
+
         Returns
         -------
         float
             The current angle of the stage
         """
+        return self.angle_cache(refresh=refresh)
+
+    def _read_angle(self) -> float:
         self.sendtext("Q:")
         reply: str = self.recvtext().strip().split(",")[0]
         return int(reply) * 0.0025
 
-    def move_to_origin(self, axis: int = 1, wait: bool = True) -> None:
+    def move_to_origin(self, axis: int = 1, wait: bool = True) -> MotionFuture:
         """Go to mechanical origin.
 
         Parameters
         ----------
         wait : bool, optional
-            If true show the current angle during rotation, by default True
+            If true, wait for finishing the rotation, by default True
         """
         self.sendtext(f"H:{axis}-")
-        if wait:
-            self.waiting_for_rotation()
-
-    def move_rel(self, pulse: int, axis: int = 1, *, wait: bool = True) -> None:
+        return self._motion(0.0, wait=wait)
+
+    def move_rel(
+        self,
+        pulse: int,
+        axis: int = 1,
+        *,
+        wait: bool = True,
+        target: float | None = None,
+    ) -> MotionFuture:
         """Rotate the stage by the input value.
 
         Parameters
@@ -84,7 +108,14 @@ class GSC02(Comm):
         axis: int
             axis
         wait : bool, optional
-            If true show the current angle during rotation, by default True
+            If true, wait for finishing the rotation, by default True
+        target : float | None
+            Angle after the rotation, if known (for the polling interval)
+
+        Returns
+        -------
+        MotionFuture
+            Completion of the rotation (its result is the angle)
         """
         if pulse >= 0:
             command = f"M:{axis}+P{int(abs(pulse))}"
@@ -92,10 +123,24 @@ class GSC02(Comm):
             command = f"M:{axis}-P{int(abs(pulse))}"
         self.sendtext(command)
         self.sendtext("G")
-        if wait:
-            self.waiting_for_rotation()
+        return self._motion(target, wait=wait)
 
-    def rotate(self, angle_deg: float, axis: int = 1, *, wait: bool = True) -> None:
+    def _motion(self, target: float | None, *, wait: bool) -> MotionFuture:
+        future = self.angle_cache.track(
+            MotionFuture(self.rotating, final=self._read_angle, target=target),
+        )
+        if wait:
+            future.wait()
+        return future
+
+    def rotate(
+        self,
+        angle_deg: float,
+        axis: int = 1,
+        *,
+        wait: bool = True,
+        target: float | None = None,
+    ) -> MotionFuture:
         """Rotate the stage by the input angle.
 
         Parameters
@@ -105,12 +150,23 @@ class GSC02(Comm):
         axis: int
             axis number
         wait : bool, optional
-            If true show the current angle during rotation, by default True
+            If true, wait for finishing the rotation, by default True
+        target : float | None
+            Angle after the rotation, if known (for the polling interval)
         """
         pulse = int(angle_deg / 0.0025)
-        self.move_rel(pulse, axis=axis, wait=wait)
-
-    def set_angle(self, angle_deg: float, axis: int = 1, *, wait: bool = True) -> None:
+        cache = self.angle_cache
+        if target is None and not cache.moving and cache.value is not None:
+            target = cache.value + pulse * 0.0025
+        return self.move_rel(pulse, axis=axis, wait=wait, target=target)
+
+    def set_angle(
+        self,
+        angle_deg: float,
+        axis: int = 1,
+        *,
+        wait: bool = True,
+    ) -> MotionFuture:
         """Set the angle of the ND filter.
 
         Parameters
@@ -120,12 +176,12 @@ class GSC02(Comm):
         axis: int
             axis number
         wait : bool, optional
-            If true show the current angle during rotation, by default True
+            If true, wait for finishing the rotation, by default True
 
         """
         current_angle = self.angle()
         rotate_angle = angle_deg - current_angle
-        self.rotate(rotate_angle, axis=axis, wait=wait)
+        return self.rotate(rotate_angle, axis=axis, wait=wait, target=angle_deg)
 
     def rotating(self) -> float | None:
         """Check the ND filter is rotating.
@@ -141,12 +197,20 @@ class GSC02(Comm):
             return None
         return int(position) * 0.0025
 
-    def waiting_for_rotation(self) -> None:
-        """Wait for the rotation."""
-        current_angle = self.rotating()
-        while current_angle:
-            print(f"{current_angle:.4f}")
-            current_angle = self.rotating()
+    def waiting_for_rotation(self, *, printing: bool = False) -> None:
+        """Wait for the rotation.
+
+        The status is polled with the interval growing from 5 ms to 0.2 s.
+
+        Parameters
+        ----------
+        printing: bool
+            if True, print the "current" angle
+        """
+        MotionFuture(
+            self.rotating,
+            progress=(lambda angle: print(f"{angle:.4f}")) if printing else None,
+        ).wait()
 
     def force_stop(self, axis: int = 1) -> float:
         """Force stop motor.
@@ -157,6 +221,7 @@ class GSC02(Comm):
             The Current angle of the ND filter
         """
         self.sendtext(f"L:{axis}")
+        self.angle_cache.invalidate()
         return self.angle()
 
     def check_stop(self) -> bool:
@@ -5,9 +5,13 @@ Hardware specification:
 """
 
 from __future__ import annotations
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from functools import cached_property, partial
 from typing import Literal, TypedDict
 
 from .. import Comm
+from ..motion import MotionFuture, PositionCache
 
 from enum import Enum
 
@@ -30,6 +34,29 @@ class _OMECStatus(TypedDict, total=True):
     extend_to_edge: bool
 
 
+@dataclass
+class RasterLine:
+    """Result of a line of ``OMEC4BF.raster_scan``.
+
+    Attributes
+    ----------
+    x : int
+        Position of the slow (x) axis
+    y : list[int]
+        Positions of the fast (y) axis, in the increasing order of the grid, up
+        to (not including) the first point which meets the stop condition.
+    values : list[float]
+        Detector values at y
+    reverse : bool
+        True if the line is scanned from the end of the y grid
+    """
+
+    x: int
+    y: list[int] = field(default_factory=list)
+    values: list[float] = field(default_factory=list)
+    reverse: bool = False
+
+
 class OMEC4BF(Comm):
     """Class for OMEC-4BF controller.
 
@@ -46,6 +73,22 @@ class OMEC4BF(Comm):
         super().__init__(term=term)
         self.open(tty=port, baud=9600)
 
+    @cached_property
+    def _position_caches(self) -> dict[int, PositionCache[tuple[int, int]]]:
+        return {}
+
+    def position_cache(self, group: Literal[1, 2]) -> PositionCache[tuple[int, int]]:
+        """Last known (x, y) position of the group while it is idle."""
+        if group not in self._position_caches:
+            self._position_caches[group] = PositionCache(
+                lambda: self._read_position(group),
+            )
+        return self._position_caches[group]
+
+    def _read_position(self, group: Literal[1, 2]) -> tuple[int, int]:
+        status = self.status(group)
+        return status["x"], status["y"]
+
     def status(self, group: Literal[1, 2]) -> _OMECStatus:
         """Retrieves the status of the specified group.
 
@@ -77,19 +120,29 @@ class OMEC4BF(Comm):
 
         return status_dict
 
-    def position(self, group: Literal[1, 2], axis: Literal["x", "y"]) -> int:
+    def position(
+        self,
+        group: Literal[1, 2],
+        axis: Literal["x", "y"],
+        *,
+        refresh: bool = False,
+    ) -> int:
         """
         Gets the position of the specified axis for the given group.
 
+        While the group is idle, the position known from the last read is
+        returned without the query (see ``PositionCache``).
+
         Args:
             group (Literal[1, 2]): The group number (1 or 2).
             axis (Literal["x", "y"]): The axis ("x" or "y").
+            refresh (bool): If True, read the position from the controller anyway.
 
         Returns:
             int: The position of the specified axis.
         """
-        status = self.status(group)
-        return status[axis.lower()]
+        x, y = self.position_cache(group)(refresh=refresh)
+        return x if axis.lower() == "x" else y
 
     def wait_during_move(
         self,
@@ -100,6 +153,7 @@ class OMEC4BF(Comm):
         """Wait for the move operation to complete.
 
         This method blocks the excecution until the move operation is finished.
+        The status is polled with the interval growing from 5 ms to 0.2 s.
 
         Parameters
         ----------
@@ -109,22 +163,66 @@ class OMEC4BF(Comm):
             if True, print the "current" position
 
         """
+        self._motion(group, printing=printing).wait()
+
+    def moving(
+        self,
+        group: Literal[1, 2] = 1,
+        *,
+        printing: bool = False,
+    ) -> int | None:
+        """Return the x position during the move, or None if the group is ready.
+
+        Parameters
+        ----------
+        group : Literal[1, 2]
+            The group number (1 or 2), by default 1.
+        printing: bool
+            if True, print the "current" position
+        """
+        position = self._moving_xy(group, printing=printing)
+        return None if position is None else position[0]
+
+    def _moving_xy(
+        self,
+        group: Literal[1, 2],
+        *,
+        printing: bool = False,
+    ) -> tuple[int, int] | None:
         status = self.status(group=group)
-        while not status["ready"]:
-            if printing:
-                print(
-                    f"current_position(x): {status['x']}, current_position(y): {status['y']}"
-                )
-            status = self.status(group)
+        if status["ready"]:
+            return None
+        if printing:
+            print(
+                f"current_position(x): {status['x']}, current_position(y): {status['y']}"
+            )
+        return status["x"], status["y"]
+
+    def _motion(
+        self,
+        group: Literal[1, 2],
+        *,
+        printing: bool = False,
+        wait: bool = False,
+    ) -> MotionFuture[tuple[int, int]]:
+        future = self.position_cache(group).track(
+            MotionFuture(
+                lambda: self._moving_xy(group, printing=printing),
+                final=lambda: self._read_position(group),
+            ),
+        )
+        if wait:
+            future.wait()
+        return future
 
     def move_abs(
         self,
         group: Literal[1, 2] = 1,
         axis: Literal["x", "y", "both"] | Axis = "x",
-        position: int = 0,
+        position: int | tuple[int, int] = 0,
         *,
         wait: bool = True,
-    ) -> None:
+    ) -> MotionFuture[tuple[int, int]]:
         """Move to the absolute position.
 
         Parameters
@@ -133,22 +231,31 @@ class OMEC4BF(Comm):
             The group number (1 or 2), by default 1.
         axis : Literal["x", "y", "both"] | Axis, optional
             The axis to move ("x", "y", or "both"), by default "x".
-        position : int, optional
+        position : int | tuple[int, int], optional
             The absolute position to move to, by default 0.
+            (x, y) with axis "both" moves the axes to the different positions.
         wait : bool, optional
             If True, wait for finishing the move, by default True.
+
+        Returns
+        -------
+        MotionFuture
+            Completion of the move (its result is the (x, y) position)
         """
         axis_int = axis_int = (
             Axis[axis.upper()].value if isinstance(axis, str) else axis.value
         )
-        cmd = f"{group}A{axis_int}:{position}"
+        if isinstance(position, tuple):
+            target = ",".join(str(p) for p in position)
+        else:
+            target = str(position)
+        cmd = f"{group}A{axis_int}:{target}"
         self.sendtext(cmd)
-        if wait:
-            self.wait_during_move(group=group, printing=VERBOSE)
+        return self._motion(group, printing=VERBOSE, wait=wait)
 
     def move_origin(
         self, group: Literal[1, 2] = 1, axis: Literal["x", "y", "both"] | Axis = "x"
-    ) -> None:
+    ) -> MotionFuture[tuple[int, int]]:
         """Move the specified axis to the origin (home position).
 
         Parameters
@@ -163,7 +270,7 @@ class OMEC4BF(Comm):
         )
         cmd = f"{group}H{axis_int}"
         self.sendtext(cmd)
-        self.wait_during_move(group=group, printing=VERBOSE)
+        return self._motion(group, printing=VERBOSE, wait=True)
 
     def move_rel(
         self,
@@ -172,7 +279,7 @@ class OMEC4BF(Comm):
         move: int = 0,
         *,
         wait: bool = True,
-    ) -> None:
+    ) -> MotionFuture[tuple[int, int]]:
         """Move to the relative position.
 
         Parameters
@@ -185,11 +292,126 @@ class OMEC4BF(Comm):
             The relative distance to move, by default 0.
         wait : bool, optional
             If True, wait for finishing the move, by default True.
+
+        Returns
+        -------
+        MotionFuture
+            Completion of the move (its result is the (x, y) position)
         """
         axis_int = axis_int = (
             Axis[axis.upper()].value if isinstance(axis, str) else axis.value
         )
         cmd = f"{group}M{axis_int}:{move}"
         self.sendtext(cmd)
-        if wait:
-            self.wait_during_move(group=group, printing=VERBOSE)
+        return self._motion(group, printing=VERBOSE, wait=wait)
+
+    def raster_scan(
+        self,
+        x_positions: Sequence[int],
+        y_positions: Sequence[int],
+        measure: Callable[[], float],
+        stop: Callable[[float], bool] | None = None,
+        *,
+        group: Literal[1, 2] = 1,
+        serpentine: bool = True,
+        margin: int = 2,
+        on_point: Callable[[int, int, float], object] | None = None,
+        on_line: Callable[[RasterLine], object] | None = None,
+    ) -> list[RasterLine]:
+        """Scan the 2D grid line by line (x: slow axis, y: fast axis).
+
+        With serpentine (boustrophedon) order, every other line is scanned
+        backward, so that the y axis does not return to the start on every
+        line.  A line ends at the first point (from the start of the y grid)
+        where ``stop(value)`` is True; the forward line stops there, and the
+        next (backward) line starts ``margin`` points above it (extended upward
+        until the stop condition if needed).  The move to the next line runs
+        on both axes at once (``Axis.BOTH``), and the callbacks run while the
+        stage moves to the next point.
+
+        Parameters
+        ----------
+        x_positions : Sequence[int]
+            Positions of the slow axis
+        y_positions : Sequence[int]
+            Positions of the fast axis (increasing)
+        measure : Callable[[], float]
+            Returns the detector value at the current point.
+        stop : Callable[[float], bool] | None
+            Stop condition of the line (e.g. ``lambda v: v < threshold``)
+        group : Literal[1, 2]
+            The group number (1 or 2), by default 1.
+        serpentine : bool
+            If False, every line is scanned forward (the y axis returns).
+        margin : int
+            Number of the extra points above the previous stop
+        on_point : Callable[[int, int, float], object] | None
+            Called with x, y and the value of each measured point.
+        on_line : Callable[[RasterLine], object] | None
+            Called with each finished line.
+
+        Returns
+        -------
+        list[RasterLine]
+        """
+        ys = list(y_positions)
+        n_points = len(ys)
+        lines: list[RasterLine] = []
+        current: tuple[int, int] | None = None
+        deferred: list[Callable[[], object]] = []
+
+        def run_deferred() -> None:
+            while deferred:
+                deferred.pop(0)()
+
+        def visit(x: int, index: int) -> float:
+            nonlocal current
+            target = (x, ys[index])
+            move: MotionFuture[tuple[int, int]] | None = None
+            if current is not None and current[0] == x and current != target:
+                move = self.move_abs(group, Axis.Y, ys[index], wait=False)
+            elif current != target:
+                move = self.move_abs(group, Axis.BOTH, target, wait=False)
+            current = target
+            run_deferred()  # during the move
+            if move is not None:
+                move.wait()
+            value = measure()
+            if on_point is not None:
+                deferred.append(partial(on_point, x, ys[index], value))
+            return value
+
+        last_stop = n_points
+        for line_number, x in enumerate(x_positions):
+            reverse = serpentine and line_number % 2 == 1
+            measured: dict[int, float] = {}
+            if not reverse:
+                for index in range(n_points):
+                    measured[index] = visit(x, index)
+                    if stop is not None and stop(measured[index]):
+                        break
+            else:
+                top = min(last_stop + margin, n_points - 1)
+                index = top
+                measured[index] = visit(x, index)
+                while (
+                    stop is not None
+                    and not stop(measured[index])
+                    and index < n_points - 1
+                ):
+                    index += 1
+                    measured[index] = visit(x, index)
+                for index in range(top - 1, -1, -1):
+                    measured[index] = visit(x, index)
+            line = RasterLine(x=x, reverse=reverse)
+            for index in sorted(measured):
+                if stop is not None and stop(measured[index]):
+                    break
+                line.y.append(ys[index])
+                line.values.append(measured[index])
+            last_stop = len(line.y)
+            lines.append(line)
+            if on_line is not None:
+                deferred.append(partial(on_line, line))
+        run_deferred()
+        return lines
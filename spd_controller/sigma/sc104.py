@@ -19,10 +19,16 @@ Serial communication specification:
 from __future__ import annotations
 
 import argparse
+from collections.abc import Callable
+from functools import cached_property
 
+import numpy as np
+from numpy.typing import NDArray
 from serial.tools import list_ports
 
 from .. import Comm
+from ..flyscan import FlyScanResult, sample_motion, sampling_period
+from ..motion import MotionFuture, PositionCache
 
 
 class MockSC104:
@@ -35,8 +41,8 @@ class MockSC104:
         *,
         wait: bool = True,
         micron: bool = False,
-    ) -> None:
-        pass
+    ) -> MotionFuture:
+        return MotionFuture.completed(pos)
 
     def move_rel(
         self,
@@ -44,8 +50,8 @@ class MockSC104:
         *,
         wait: bool = True,
         micron: bool = False,
-    ) -> None:
-        pass
+    ) -> MotionFuture:
+        return MotionFuture.completed()
 
     def position(self) -> float:
         pass
@@ -68,6 +74,8 @@ class SC104(Comm):
         Occurs when no port can be found.
     """
 
+    speed: float | None = None  # mm/s (None: unknown)
+
     def __init__(self, term: str = "\r\n", port: str = "") -> None:
         """Initialize."""
         super().__init__(term=term)
@@ -94,44 +102,65 @@ class SC104(Comm):
                 msg,
             )
 
-    def position(self) -> float:
+    @cached_property
+    def position_cache(self) -> PositionCache[float]:
+        """Last known position (mm) while the stage is idle."""
+        return PositionCache(self._read_position)
+
+    def position(self, *, refresh: bool = False) -> float:
         """Return the current position.
 
+        While the stage is idle, the position known from the last read or the
+        last move is returned without the query (see ``PositionCache``).
+
+        Parameters
+        ----------
+        refresh : bool
+            If True, read the position from the controller anyway.
+
         Returns
         -------
         float
             The current position in mm unit.
         """
+        return self.position_cache(refresh=refresh)
+
+    def _read_position(self) -> float:
         self.sendtext("P:1")
         pos = int(self.recvtext().strip())
         return pos * 1e-4
 
-    def move_to_origin(self, *, wait: bool = True) -> None:
+    def move_to_origin(self, *, wait: bool = True) -> MotionFuture:
         """Move to the mechanical origin.
 
         And electric zero is set at this point.
         """
         self.sendtext("H:1")
-        if wait:
-            self.wait_during_move()
+        return self._motion(0.0, wait=wait)
 
-    def move_to_zero(self, *, wait: bool = True) -> None:
+    def move_to_zero(self, *, wait: bool = True) -> MotionFuture:
         """Move to electrical origin which can be varied.
 
         Parameters
         ----------
         wait : bool
-            If true show the current position during move, by default True
+            If true, wait for finishing the move, by default True
         """
         self.sendtext("Z:1")
-        if wait:
-            self.wait_during_move()
+        return self._motion(0.0, wait=wait)
 
     def set_zero(self) -> None:
         """Set the current position as the electrical origin."""
         self.sendtext("R:1")
+        self.position_cache.invalidate()
 
-    def move_abs(self, pos: float, *, wait: bool = True, micron: bool = False) -> None:
+    def move_abs(
+        self,
+        pos: float,
+        *,
+        wait: bool = True,
+        micron: bool = False,
+    ) -> MotionFuture:
         """Move to the absolute position.
 
         Parameters
@@ -141,7 +170,12 @@ class SC104(Comm):
         micron: Boolean, optional
             if True, the unit of position is micron (default: False)
         wait : bool, optional
-            If true show the current position during move, by default True
+            If true, wait for finishing the move, by default True
+
+        Returns
+        -------
+        MotionFuture
+            Completion of the move (its result is the position in mm)
         """
         if micron:
             pos /= 1000
@@ -151,10 +185,15 @@ class SC104(Comm):
             command = "A:1-P{}".format(int(abs(pos * 1e4)))
         self.sendtext(command)
         self.sendtext("G")
-        if wait:
-            self.wait_during_move()
+        return self._motion(pos, wait=wait)
 
-    def move_rel(self, move: float, *, wait: bool = True, micron: bool = False) -> None:
+    def move_rel(
+        self,
+        move: float,
+        *,
+        wait: bool = True,
+        micron: bool = False,
+    ) -> MotionFuture:
         """Move by the value from the current position(Relative move).
 
         Parameters
@@ -164,7 +203,12 @@ class SC104(Comm):
         micron: bool
             if True, the unit of position is micron (default: False)
         wait : bool, optional
-            If true show the current position during move, by default True
+            If true, wait for finishing the move, by default True
+
+        Returns
+        -------
+        MotionFuture
+            Completion of the move (its result is the position in mm)
         """
         if micron:
             move /= 1000
@@ -172,10 +216,24 @@ class SC104(Comm):
             command = "M:1+P{}".format(int(abs(move * 1e4)))
         else:
             command = "M:1-P{}".format(int(abs(move * 1e4)))
+        cache = self.position_cache
+        target = None if cache.moving or cache.value is None else cache.value + move
         self.sendtext(command)
         self.sendtext("G")
+        return self._motion(target, wait=wait)
+
+    def _motion(self, target: float | None, *, wait: bool) -> MotionFuture:
+        future = self.position_cache.track(
+            MotionFuture(
+                self.moving,
+                final=self._read_position,
+                target=target,
+                speed=self.speed,
+            ),
+        )
         if wait:
-            self.wait_during_move()
+            future.wait()
+        return future
 
     def moving(self) -> float | None:
         """Check the current stage condition.
@@ -186,7 +244,7 @@ class SC104(Comm):
             the current position, if the stage is not moving, return None
         """
         self.sendtext("Q:")
-        tmp = self.recvtext().split(",")
+        tmp = self.recvtext().strip().split(",")
         if tmp[3] == "K":
             return None
         else:
@@ -203,6 +261,7 @@ class SC104(Comm):
         assert speed > 0
         command: str = "D:1F{}".format(int(speed * 1e4))
         self.sendtext(command)
+        self.speed = speed
 
     def set_acceralation_time(self, acc: int) -> None:
         """Set acceleration/deceleration time  (default 100ms).
@@ -219,17 +278,72 @@ class SC104(Comm):
     def wait_during_move(self, *, printing: bool = False) -> None:
         """Wait moving ends.
 
+        The status is polled with the interval growing from 5 ms to 0.2 s.
+
         Parameters
         ----------
         printing: bool
             if True, print the "current" position
 
         """
-        current_position: float | None = self.moving()
-        while current_position:
-            if printing:
-                print(f"{current_position:.4f}")
-            current_position = self.moving()
+        MotionFuture(
+            self.moving,
+            progress=(lambda p: print(f"{p:.4f}")) if printing else None,
+        ).wait()
+
+    def fly_scan(
+        self,
+        start: float,
+        end: float,
+        detector: Callable[[], float],
+        grid: NDArray[np.float64] | None = None,
+        speed: float | None = None,
+        interval: float = 0.05,
+        samples_per_point: int = 4,
+    ) -> FlyScanResult:
+        """Measure during one continuous move from start to end (mm).
+
+        The stage moves to start, and then to end at the constant speed, while
+        the position ("Q:") and the detector are sampled every interval.  The
+        samples are binned onto the grid.  The speed set here remains after the
+        scan.
+
+        Parameters
+        ----------
+        start : float
+            Start position (mm)
+        end : float
+            End position (mm)
+        detector : Callable[[], float]
+            Returns the detector value (e.g. ``lambda: power_meter.read``)
+        grid : NDArray[np.float64] | None
+            Positions (mm) of the result. Default: 0.001 mm (1 micron) step
+        speed : float | None
+            Stage speed (mm/s). Default: samples_per_point samples at each grid
+            point, with the sampling period measured by two detector reads
+            (``flyscan.sampling_period``).
+        interval : float
+            Sampling period (s)
+        samples_per_point : int
+            Number of the samples at each grid point for the default speed
+
+        Returns
+        -------
+        FlyScanResult
+            Samples and the binned data
+        """
+        if grid is None:
+            n_points = int(round(abs(end - start) / 0.001)) + 1
+            grid = np.linspace(start, end, n_points)
+        if speed is None:
+            step = float(abs(grid[-1] - grid[0])) / max(len(grid) - 1, 1)
+            period = sampling_period(detector, interval)
+            speed = max(step / (period * samples_per_point), 1e-4)
+        self.move_abs(start, wait=True)
+        self.set_speed(speed)
+        self.move_abs(end, wait=False)
+        timeout = abs(end - start) / speed * 2 + 10
+        return sample_motion(self.moving, detector, interval, timeout).bin(grid)
 
     def force_stop(self) -> float:
         """Force stop the motor.
@@ -240,6 +354,7 @@ class SC104(Comm):
             The stop position of the mirrors
         """
         self.sendtext("L:1")
+        self.position_cache.invalidate()
         return self.position()
 
     def check_stop(self) -> bool:
@@ -0,0 +1,251 @@
+"""Features of the oscilloscope waveforms (peak amplitude, area, centroid, FWHM).
+
+``waveform_features`` works on a batch of waveforms at once (vectorized over
+the rows).  ``FeatureExtractor`` applies it to each waveform as it is acquired
+in the scan loop, keeps only the features (optionally with the decimated
+waveform in a ``WaveformStack``), and tells the position of the overlap during
+the scan::
+
+    extractor = FeatureExtractor(record.timescale, baseline=1000, decimate=10)
+    while ...:
+        record = o.acquire((1,))
+        extractor.add(record.memory[1], position=pos)
+    extractor.overlap()  # position of the maximum amplitude
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .waveform_stack import WaveformStack
+
+FEATURES = ("amplitude", "area", "centroid", "fwhm")
+FEATURE_DTYPE = np.dtype(
+    [("position", "<f8"), ("frequency", "<f8")] + [(name, "<f8") for name in FEATURES],
+)
+
+
+def decimate(waveforms: NDArray[np.float64], factor: int) -> NDArray[np.float64]:
+    """Average every ``factor`` points (the remainder at the end is dropped).
+
+    Parameters
+    ----------
+    waveforms: NDArray[np.float64]
+        Waveform (1D) or waveforms (2D, one waveform per row)
+    factor: int
+        Number of the points averaged
+
+    Returns
+    -------
+    NDArray[np.float64]
+    """
+    if factor == 1:
+        return waveforms
+    n_points = waveforms.shape[-1] // factor * factor
+    return (
+        waveforms[..., :n_points]
+        .reshape(*waveforms.shape[:-1], n_points // factor, factor)
+        .mean(axis=-1)
+    )
+
+
+def waveform_features(
+    timescale: NDArray[np.float64],
+    waveforms: NDArray[np.float64],
+    baseline: int = 0,
+    polarity: int = 1,
+) -> NDArray[np.void]:
+    """Return peak amplitude, area, centroid and FWHM of the waveforms.
+
+    Parameters
+    ----------
+    timescale: NDArray[np.float64]
+        Time axis (s)
+    waveforms: NDArray[np.float64]
+        Waveform (1D) or waveforms (2D, one waveform per row) (V)
+    baseline: int
+        Number of the leading points averaged as the baseline, which is
+        subtracted.  0: no subtraction.
+    polarity: int
+        1 for the positive pulse, -1 for the negative pulse
+
+    Returns
+    -------
+    NDArray[np.void]
+        Structured array of ``FEATURES`` (one element per waveform).
+        amplitude (V), area (V s), centroid (s) and fwhm (s).
+        fwhm is nan if the pulse does not fall to the half on both sides.
+    """
+    y = polarity * np.atleast_2d(np.asarray(waveforms, dtype=np.float64))
+    if baseline:
+        y = y - y[:, :baseline].mean(axis=1, keepdims=True)
+    t = np.asarray(timescale, dtype=np.float64)
+    n_waveforms, n_points = y.shape
+    rows = np.arange(n_waveforms)
+    peak = y.argmax(axis=1)
+    amplitude = y[rows, peak]
+    area = ((y[:, 1:] + y[:, :-1]) * np.diff(t)).sum(axis=1) / 2
+    weight = np.clip(y, 0, None)
+    total = weight.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroid = np.where(total > 0, (weight * t).sum(axis=1) / total, np.nan)
+    half = amplitude[:, np.newaxis] / 2
+    below = y < half
+    points = np.arange(n_points)
+    left = np.where(below & (points < peak[:, np.newaxis]), points, -1).max(axis=1)
+    right = np.where(below & (points > peak[:, np.newaxis]), points, n_points).min(
+        axis=1,
+    )
+    found = (left >= 0) & (right < n_points)
+    left = np.where(found, left, 0)
+    right = np.where(found, right, 1)
+    half = half[:, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_left = t[left] + (half - y[rows, left]) / (
+            y[rows, left + 1] - y[rows, left]
+        ) * (t[left + 1] - t[left])
+        t_right = t[right - 1] + (y[rows, right - 1] - half) / (
+            y[rows, right - 1] - y[rows, right]
+        ) * (t[right] - t[right - 1])
+    features = np.empty(n_waveforms, dtype=FEATURE_DTYPE[list(FEATURES)])
+    features["amplitude"] = amplitude
+    features["area"] = area
+    features["centroid"] = centroid
+    features["fwhm"] = np.where(found, t_right - t_left, np.nan)
+    return features
+
+
+class FeatureExtractor:
+    """Extract the features of each waveform of the scan as it is acquired.
+
+    Parameters
+    ----------
+    timescale: NDArray[np.float64]
+        Time axis of the waveforms (s)
+    baseline: int
+        Number of the leading points averaged as the baseline
+    polarity: int
+        1 for the positive pulse, -1 for the negative pulse
+    decimate: int
+        Factor of the decimation of the waveform stored in ``stack``
+    stack: WaveformStack | None
+        Where the (decimated) waveforms are stored.  None keeps only the
+        features.  Its timescale must be ``FeatureExtractor.stored_timescale``.
+    """
+
+    def __init__(
+        self,
+        timescale: NDArray[np.float64],
+        baseline: int = 0,
+        polarity: int = 1,
+        decimate: int = 1,
+        stack: WaveformStack | None = None,
+    ) -> None:
+        """Initialize."""
+        if polarity not in (1, -1):
+            msg = "polarity must be 1 or -1"
+            raise ValueError(msg)
+        if decimate < 1:
+            msg = "decimate must be a positive integer"
+            raise ValueError(msg)
+        self.timescale = np.asarray(timescale, dtype=np.float64)
+        self.baseline = baseline
+        self.polarity = polarity
+        self.decimate = decimate
+        self.stack = stack
+        self._features: list[NDArray[np.void]] = []
+
+    @property
+    def stored_timescale(self) -> NDArray[np.float64]:
+        """Time axis of the decimated waveforms."""
+        return decimate(self.timescale, self.decimate)
+
+    def add(
+        self,
+        waveform: NDArray[np.float64],
+        position: float,
+        frequency: float = np.nan,
+    ) -> NDArray[np.void]:
+        """Extract the features of the waveform (and store the decimated one).
+
+        Returns
+        -------
+        NDArray[np.void]
+            Features of the waveform (``FEATURE_DTYPE``)
+        """
+        row = self._row(
+            waveform_features(self.timescale, waveform, self.baseline, self.polarity),
+            [position],
+            [frequency],
+        )
+        if self.stack is not None:
+            self.stack.append(decimate(waveform, self.decimate), position, frequency)
+        self._features.append(row)
+        return row[0]
+
+    def extend(self, stack: WaveformStack, chunk: int = 64) -> None:
+        """Extract the features of the waveforms already stored in the stack.
+
+        The waveforms are read ``chunk`` rows at a time.  Used to resume the scan
+        or to analyze the recorded one.  The timescale of the stack is used (the
+        features of the decimated waveforms are approximate).
+        """
+        baseline = self.baseline * stack.memory_length // self.timescale.size
+        if self.baseline:
+            baseline = max(baseline, 1)
+        for start in range(0, len(stack), chunk):
+            index = stack.index[start : start + chunk]
+            features = waveform_features(
+                stack.timescale,
+                stack[start : start + chunk],
+                baseline,
+                self.polarity,
+            )
+            self._features.append(
+                self._row(features, index["position"], index["frequency"]),
+            )
+
+    @staticmethod
+    def _row(
+        features: NDArray[np.void],
+        position: NDArray[np.float64] | list[float],
+        frequency: NDArray[np.float64] | list[float],
+    ) -> NDArray[np.void]:
+        row = np.empty(features.size, dtype=FEATURE_DTYPE)
+        row["position"] = position
+        row["frequency"] = frequency
+        for name in FEATURES:
+            row[name] = features[name]
+        return row
+
+    def __len__(self) -> int:
+        return sum(row.size for row in self._features)
+
+    @property
+    def features(self) -> NDArray[np.void]:
+        """Features of all the waveforms (``FEATURE_DTYPE``)."""
+        if not self._features:
+            return np.empty(0, dtype=FEATURE_DTYPE)
+        self._features = [np.concatenate(self._features)]
+        return self._features[0]
+
+    def overlap(self, feature: str = "amplitude") -> float:
+        """Return the position where the feature is maximum (nan before any)."""
+        features = self.features
+        values = features[feature]
+        if not np.isfinite(values).any():
+            return np.nan
+        return float(features["position"][np.nanargmax(values)])
+
+    def export_text(self, path: str | Path) -> None:
+        """Write the features as the tab-separated text."""
+        features = self.features
+        np.savetxt(
+            path,
+            np.column_stack([features[name] for name in FEATURE_DTYPE.names or ()]),
+            delimiter="\t",
+            header="\t".join(FEATURE_DTYPE.names or ()),
+        )
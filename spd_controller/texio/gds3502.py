@@ -4,17 +4,100 @@
 
 from __future__ import annotations
 
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+
 import numpy as np
 from numpy.typing import NDArray
 from typing_extensions import Literal
 from pathlib import Path
-from .. import Comm
+from ..scpi import SCPIInstrument
 
 Channel = Literal[1, 2]
 Connection = Literal["usb", "socket"]
+VERTICAL_DIVISION = 25  # ADC counts per vertical division
+# Worst-case waiting time (s) of the average mode (used if the trigger rate is unknown)
+AVERAGE_WAITING_TIME: dict[int, float] = {
+    1: 1,
+    2: 2,
+    4: 2,
+    8: 2,
+    16: 5,
+    32: 10,
+    64: 15,
+    128: 20,
+    256: 40,
+}
+POLL_INTERVAL = (0.01, 0.2)  # s. The polling interval doubles from min to max.
+
+
+@lru_cache(maxsize=8)
+def _parse_header(header: bytes) -> tuple[tuple[str, float | str], ...]:
+    items: list[tuple[str, float | str]] = []
+    for entry in header.decode("utf-8").split(";"):
+        if "," not in entry:
+            continue
+        k, v = entry.split(",", 1)
+        try:
+            items.append((k, int(v)))
+        except ValueError:
+            try:
+                items.append((k, float(v)))
+            except ValueError:
+                items.append((k, v))
+    return tuple(items)
+
+
+def parse_header(header: bytes) -> dict[str, float | str]:
+    """Parse the waveform header ("key,value;key,value;...").
+
+    The parsed result is cached, as the header is the same while the
+    setting of the oscilloscope is not changed.
+
+    Parameters
+    ----------
+    header : bytes
+        Header of the response of ":ACQuire<n>:MEMory?" (before "#").
+
+    Returns
+    -------
+    dict[str, float | str]
+        Header information
+    """
+    return dict(_parse_header(bytes(header)))
+
+
+@dataclass
+class WaveformRecord:
+    """Result of ``GDS3502.acquire``.
+
+    Attributes
+    ----------
+    timescale : NDArray[np.float64]
+        Time axis shared by the channels (s)
+    memory : dict[int, NDArray[np.float64]]
+        Waveform (V) of each channel
+    measurements : dict[str, float]
+        Measured values, keyed by "CH<n>:<item>" (e.g. "CH1:FREQuency")
+    trigger_frequency : float | None
+        Trigger frequency (Hz)
+    header : dict[int, dict[str, float | str]]
+        Waveform header of each channel
+    """
+
+    timescale: NDArray[np.float64]
+    memory: dict[int, NDArray[np.float64]] = field(default_factory=dict)
+    measurements: dict[str, float] = field(default_factory=dict)
+    trigger_frequency: float | None = None
+    header: dict[int, dict[str, float | str]] = field(default_factory=dict)
+
+
+class GDS3502(SCPIInstrument):
+    _timescale_cache: tuple[float, int, NDArray[np.float64]] | None = None
+    n_average: int = 1
 
-
-class GDS3502(Comm):
     def __init__(
         self,
         term: str = "\n",
@@ -57,36 +140,101 @@ class GDS3502(Comm):
             Oscilloscope setting
         """
         self.sendtext("*LRN?")
-        tmp: list[bytes] = self.comm.readlines()
-        return_info: bytearray = bytearray()
-        for a in tmp:
-            return_info += a
-        return return_info.decode("utf-8")
+        return self.read_until().decode("utf-8")
+
+    def refresh(self) -> None:
+        """Seed the settings cache from "*LRN?"."""
+        self.settings.load(self.lrn())
 
     def reset(self) -> None:
-        self.sendtext(":CHANnel1IMPedance?")
-        impedance_1 = float(self.comm.readline())
-        self.sendtext(":CHANnel2IMPedance?")
-        impedance_2 = float(self.comm.readline())
+        """Reset the settings (keeping the input impedances) and run AUTOSet.
+
+        The impedances are queried from the oscilloscope (not from the cache),
+        as they may have been changed on the front panel.
+        """
+        impedances = self.query_settings(
+            [":CHANnel1:IMPedance", ":CHANnel2:IMPedance"],
+        )
         self.sendtext("*RST")
-        self.sendtext(":CHANnel1:IMPedance {}".format(impedance_1))
-        self.sendtext(":CHANnel2:IMPedance {}".format(impedance_2))
+        self.settings.clear()
+        self.apply(impedances)
         self.sendtext(":AUTOSet")
+        self.settings.clear()
+        self.n_average = 1
 
     def set_impedance(self, channel: Channel, impedance: float = 5.0e1) -> None:
-        self.sendtext(":CHANnel{}:IMPedance {}".format(channel, impedance))
+        self.configure(f":CHANnel{channel}:IMPedance", impedance)
 
     @property
     def triger_frequency(self) -> float:
         self.sendtext(":TRIG:FREQ?")
         return float(self.recvtext())
 
-    def is_ready(self, channel: Channel)->bool:
-        self.sendtext(f":ACQ{channel}:STAT?")
-        received_ = self.recvtext()
-        if received_:
-            return True
-        return False
+    def is_ready(self, channel: Channel) -> bool:
+        """Return True if the waveform data of the channel is ready."""
+        self.sendtext(f":ACQuire{channel}:STATe?")
+        return int(self.read_until()) == 1
+
+    def arm(self) -> None:
+        """Discard the acquired waveforms and start a fresh acquisition.
+
+        Resetting the number of averages restarts the average.  "*OPC?"
+        makes sure that the command is processed before returning.
+        """
+        if self.n_average > 1:
+            self.sendtext(f":ACQuire:AVERage {self.n_average}")
+        self.sendtext("*OPC?")
+        self.read_until()
+
+    def wait_acquisition(
+        self,
+        channel: Channel = 1,
+        timeout: float | None = None,
+    ) -> float:
+        """Arm a fresh acquisition and wait until it completes.
+
+        The wait takes at least n_average trigger periods (the trigger rate is
+        measured by the oscilloscope).  After that, ":ACQuire<n>:STATe?" is
+        polled with an interval growing from 10 ms to 0.2 s.
+
+        Parameters
+        ----------
+        channel : Channel
+            Channel to check
+        timeout : float | None
+            Maximum waiting time (s).  Default is twice the expected time plus
+            1 s, or the worst case of ``AVERAGE_WAITING_TIME`` if the trigger
+            rate is unknown.
+
+        Returns
+        -------
+        float
+            Waiting time (s)
+
+        Raises
+        ------
+        TimeoutError
+            If the acquisition does not complete within timeout.
+        """
+        started = time.perf_counter()
+        self.arm()
+        frequency = self.triger_frequency
+        if frequency > 0:
+            expected = self.n_average / frequency
+            limit = 2 * expected + 1
+        else:
+            expected = 0.0
+            limit = AVERAGE_WAITING_TIME[self.n_average]
+        deadline = started + (limit if timeout is None else timeout)
+        time.sleep(min(expected, max(deadline - time.perf_counter(), 0)))
+        interval = POLL_INTERVAL[0]
+        while not self.is_ready(channel):
+            if time.perf_counter() + interval > deadline:
+                msg = f"Acquisition of CH{channel} is not complete"
+                raise TimeoutError(msg)
+            time.sleep(interval)
+            interval = min(2 * interval, POLL_INTERVAL[1])
+        return time.perf_counter() - started
 
     def measure_frequency(self, channel: Channel) -> float:
         """Measure the frequency from the channel.
@@ -111,21 +259,13 @@ class GDS3502(Comm):
 
         The Average mode would be more better than the Sample (default) mode.
 
-        Different from the other modes, return the recommended waiting time.
+        Different from the other modes, return the worst-case waiting time.
+        Use ``wait_acquisition`` to wait only until the average completes.
         """
-        self.sendtext(":ACQuire:MODe AVERage")
         assert n_average in (2, 4, 8, 16, 32, 64, 128, 256)
-        waiting_time: dict[int, float] = {
-            2: 2,
-            4: 2,
-            8: 2,
-            16: 5,
-            32: 10,
-            128: 20,
-            256: 40,
-        }
-        self.sendtext(f":ACQuire:AVERage {n_average}")
-        return waiting_time[n_average]
+        self.apply({":ACQuire:MODe": "AVERage", ":ACQuire:AVERage": n_average})
+        self.n_average = n_average
+        return AVERAGE_WAITING_TIME[n_average]
 
     def set_hires_mode(self) -> None:
         """Set HiResolution mode
@@ -134,7 +274,8 @@ class GDS3502(Comm):
 
         The HiResolution mode would not be more better than the Sample (default) mode, but for completeness, this method has been prepared.
         """
-        self.sendtext(":ACQuire:MODe HIR")
+        self.configure(":ACQuire:MODe", "HIR")
+        self.n_average = 1
 
     def set_peak_detect_mode(self) -> None:
         """Set Peak Detect Mode mode
@@ -143,7 +284,8 @@ class GDS3502(Comm):
 
         The Peak Detect mode would not be more better than the Sample (default) mode, but for completeness, this method has been prepared.
         """
-        self.sendtext(":ACQuire:MODe PDET")
+        self.configure(":ACQuire:MODe", "PDET")
+        self.n_average = 1
 
     def set_sample_mode(self) -> None:
         """Set Peak Detect Mode mode
@@ -152,27 +294,44 @@ class GDS3502(Comm):
 
         The Sample mode is the default mode of this oscilloscope.
         """
-        self.sendtext(":ACQuire:MODe SAMP")
+        self.configure(":ACQuire:MODe", "SAMP")
+        self.n_average = 1
 
     def set_interpolation_et(self) -> None:
         """Set Interporation ET mode."""
-        self.sendtext(":ACQuire:INTERpolation ET")
+        self.configure(":ACQuire:INTERpolation", "ET")
 
     def set_realtime_sampling(self) -> None:
         """Set Interporation ET mode."""
-        self.sendtext(":ACQuire:INTERpolation SINC")
+        self.configure(":ACQuire:INTERpolation", "SINC")
 
-    def save_image(self, filename: str) -> None:
+    def save_image(self, filename: str, time_scale: float | None = None) -> None:
         """SaveImage data.
 
         The image file is png. (BMP is also available, but PNG would be better.)
         The filename suffix should be the capital. (.PNG)
+
+        Parameters
+        ----------
+        filename : str
+            File name in the disk of the oscilloscope
+        time_scale : float | None
+            If set, the image is taken with this time scale (s/div), and the
+            original time scale is restored.  The commands are sent in one write.
         """
-        self.sendtext(":SAV:IMAG:FILEF PNG")
         filename = "Disk:/" + Path(filename).stem + Path(filename).suffix.upper()
-        self.sendtext(f':SAV:IMAGe "{filename}"')
-
-    def acquire_memory(self, channel: Channel) -> NDArray[np.float_]:
+        commands = [":SAV:IMAG:FILEF PNG", f':SAV:IMAGe "{filename}"']
+        if time_scale is not None:
+            self.sendtext(":TIMebase:SCALe?")
+            original = float(self.read_until())
+            commands = [
+                f":TIMebase:SCALe {time_scale:.2E}",
+                *commands,
+                f":TIMebase:SCALe {original:.2E}",
+            ]
+        self.comm.write("".join(c + self.TERM for c in commands).encode("utf-8"))
+
+    def acquire_memory(self, channel: Channel) -> NDArray[np.float64]:
         """Return the memory
 
         Parameters
@@ -186,36 +345,104 @@ class GDS3502(Comm):
             Oscilloscope data
         """
         self.sendtext(":ACQuire{}:MEMory?".format(channel))
-        result_array: list[bytes] = self.comm.readlines()
-        result = b"".join(result_array)
-        data_index: int = 7 + result.find(b"#550000")
-        header = result[:data_index].decode("utf-8")
-        wave_data = result[data_index:-1]
-        for i in header.split(";")[:-2]:
-            k, v = i.split(",")
-            try:
-                self.header_dict[k] = int(v)
-            except ValueError:
-                try:
-                    self.header_dict[k] = float(v)
-                except ValueError:
-                    self.header_dict[k] = v
-        wave = [[wave_data[i], wave_data[i + 1]] for i in range(0, len(wave_data), 2)]
-        timescale: NDArray[np.float64] = np.linspace(
-            0,
-            float(self.header_dict["Sampling Period"])
-            * float(self.header_dict["Memory Length"]),
-            int(self.header_dict["Memory Length"]),
-            endpoint=False,
-        )
-        amplitudes: list[int] = []
-        for points in wave:
-            if points[0] == 0:
-                amplitudes.append(points[1])
-            else:
-                amplitudes.append(-1 * (int(bin(~points[1] & 0xFF), 0)))
-        self.timescale = timescale
-        self.memory = np.array(
-            np.array(amplitudes) * self.header_dict["Vertical Scale"] / 25
+        header, payload = self.read_block()
+        return self.decode_memory(header, payload)
+
+    def acquire(
+        self,
+        channels: Sequence[Channel] = (1, 2),
+        measurements: Sequence[str | tuple[str, Channel]] = (),
+        trigger_frequency: bool = True,
+    ) -> WaveformRecord:
+        """Fetch the waveforms and measured values in one pipelined transaction.
+
+        All the queries are sent in one write, and then the responses are read
+        in order, so that the round-trips of the separate queries are saved.
+
+        Parameters
+        ----------
+        channels : Sequence[Channel]
+            Channels of which the memory is fetched
+        measurements : Sequence[str | tuple[str, Channel]]
+            ":MEASure" items (e.g. "FREQuency", "PK2pk", ("AMPlitude", 2)).
+            A bare item is measured on the first channel.
+        trigger_frequency : bool
+            If True, the trigger frequency is also queried.
+
+        Returns
+        -------
+        WaveformRecord
+            Waveforms with the shared timescale, and the measured values.
+
+        Raises
+        ------
+        ValueError
+            If the channels do not share the time axis.
+        """
+        items = [
+            (item, channels[0]) if isinstance(item, str) else item
+            for item in measurements
+        ]
+        commands = [f":ACQuire{channel}:MEMory?" for channel in channels]
+        for item, channel in items:
+            commands += [f":MEASure:SOURce CH{channel}", f":MEASure:{item}?"]
+        if trigger_frequency:
+            commands.append(":TRIG:FREQ?")
+        self.comm.write("".join(c + self.TERM for c in commands).encode("utf-8"))
+        record = WaveformRecord(timescale=np.empty(0))
+        for channel in channels:
+            record.memory[channel] = self.decode_memory(*self.read_block())
+            record.header[channel] = self.header_dict
+            # The time axis is cached: the same object if the axes agree.
+            if record.timescale.size and record.timescale is not self.timescale:
+                msg = "The channels have different time axes"
+                raise ValueError(msg)
+            record.timescale = self.timescale
+        for item, channel in items:
+            record.measurements[f"CH{channel}:{item}"] = float(self.read_until())
+        if trigger_frequency:
+            record.trigger_frequency = float(self.read_until())
+        return record
+
+    def decode_memory(
+        self,
+        header: bytes,
+        payload: bytes | bytearray | memoryview,
+    ) -> NDArray[np.float64]:
+        """Decode the response of ":ACQuire<n>:MEMory?".
+
+        The response is the header text followed by the IEEE-488.2 definite
+        length block of big-endian int16 samples.  The samples are converted
+        to the voltage in one vectorized step.
+
+        Parameters
+        ----------
+        header : bytes
+            Header text before the block
+        payload : bytes | bytearray | memoryview
+            Payload of the block
+
+        Returns
+        -------
+        NDArray[np.float64]
+            Oscilloscope data (V)
+        """
+        self.header_dict = parse_header(header)
+        samples = np.frombuffer(payload, dtype=">i2")
+        scale = float(self.header_dict["Vertical Scale"]) / VERTICAL_DIVISION
+        self.memory = np.multiply(samples, scale, dtype=np.float64)
+        self.timescale = self._timescale(
+            float(self.header_dict["Sampling Period"]),
+            samples.size,
         )
         return self.memory
+
+    def _timescale(self, sampling_period: float, length: int) -> NDArray[np.float64]:
+        """Return the time axis (cached while the period and length are the same)."""
+        cached = self._timescale_cache
+        if cached is None or cached[:2] != (sampling_period, length):
+            timescale = np.arange(length) * sampling_period
+            timescale.flags.writeable = False
+            cached = (sampling_period, length, timescale)
+            self._timescale_cache = cached
+        return cached[2]
@@ -0,0 +1,248 @@
+"""Memory-mapped store of the waveforms of a scan.
+
+A stack is a directory::
+
+    waveforms.npy   (n_positions, memory_length) float32, preallocated
+    index.npy       metadata of each row (position, frequency, timestamp, valid)
+    timescale.npy   time axis shared by the waveforms
+    metadata.json   free-form information of the measurement
+
+Each waveform is written (and flushed) as soon as it is acquired, and the row is
+marked valid only after that, so that a crash loses at most the waveform being
+written.  The stack is reopened to resume the scan, and the arrays are
+memory-mapped, so that slicing reads only the requested rows::
+
+    stack = WaveformStack.create("scan1", n_positions=200, timescale=record.timescale)
+    stack.append(record.memory[1], position=pos, frequency=freq)
+    ...
+    stack = WaveformStack.open("scan1", mode="r")
+    stack.waveforms[10:20, 1000:2000]
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Literal
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from numpy.typing import NDArray
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("position", "<f8"),
+        ("frequency", "<f8"),
+        ("timestamp", "<f8"),
+        ("valid", "?"),
+    ],
+)
+WAVEFORMS = "waveforms.npy"
+INDEX = "index.npy"
+TIMESCALE = "timescale.npy"
+METADATA = "metadata.json"
+
+
+class WaveformStack:
+    """Memory-mapped stack of waveforms with the metadata index.
+
+    Use ``create`` for a new scan and ``open`` to resume or analyze.
+
+    Parameters
+    ----------
+    path: str | Path
+        Directory of the stack
+    mode: Literal["r", "r+"]
+        "r" for read-only, "r+" to append
+    """
+
+    def __init__(self, path: str | Path, mode: Literal["r", "r+"] = "r+") -> None:
+        """Initialize."""
+        self.path = Path(path)
+        self._waveforms = np.load(self.path / WAVEFORMS, mmap_mode=mode)
+        self._index = np.load(self.path / INDEX, mmap_mode=mode)
+        self.timescale: NDArray[np.float64] = np.load(self.path / TIMESCALE)
+        self.metadata: dict[str, Any] = json.loads((self.path / METADATA).read_text())
+        valid = self._index["valid"]
+        self._count = int(valid.size if valid.all() else np.argmin(valid))
+
+    @classmethod
+    def create(
+        cls,
+        path: str | Path,
+        n_positions: int,
+        timescale: NDArray[np.float64],
+        metadata: dict[str, Any] | None = None,
+    ) -> WaveformStack:
+        """Preallocate a new stack.
+
+        Parameters
+        ----------
+        path: str | Path
+            Directory of the stack (must not exist)
+        n_positions: int
+            Maximum number of the waveforms
+        timescale: NDArray[np.float64]
+            Time axis (its length is the memory length)
+        metadata: dict[str, Any] | None
+            Information of the measurement (JSON serializable)
+
+        Returns
+        -------
+        WaveformStack
+        """
+        path = Path(path)
+        path.mkdir(parents=True)
+        timescale = np.asarray(timescale, dtype=np.float64)
+        shape = (n_positions, timescale.size)
+        open_memmap(path / WAVEFORMS, mode="w+", dtype="<f4", shape=shape).flush()
+        index = open_memmap(
+            path / INDEX,
+            mode="w+",
+            dtype=INDEX_DTYPE,
+            shape=(n_positions,),
+        )
+        index[:] = np.zeros(n_positions, dtype=INDEX_DTYPE)
+        index.flush()
+        np.save(path / TIMESCALE, timescale)
+        meta = dict(metadata or {})
+        meta.setdefault("created", time.strftime("%Y-%m-%dT%H:%M:%S"))
+        (path / METADATA).write_text(json.dumps(meta, indent=1))
+        return cls(path)
+
+    @classmethod
+    def open(cls, path: str | Path, mode: Literal["r", "r+"] = "r+") -> WaveformStack:
+        """Open an existing stack (to resume with "r+", or to analyze with "r")."""
+        return cls(path, mode=mode)
+
+    @property
+    def capacity(self) -> int:
+        """Number of the preallocated rows."""
+        return self._index.size
+
+    @property
+    def memory_length(self) -> int:
+        """Number of the points of a waveform."""
+        return self._waveforms.shape[1]
+
+    def __len__(self) -> int:
+        """Return the number of the written waveforms."""
+        return self._count
+
+    @property
+    def waveforms(self) -> np.memmap:
+        """Written waveforms (memory-mapped, lazily read)."""
+        return self._waveforms[: self._count]
+
+    @property
+    def index(self) -> np.memmap:
+        """Metadata of the written waveforms."""
+        return self._index[: self._count]
+
+    @property
+    def positions(self) -> NDArray[np.float64]:
+        """Positions of the written waveforms."""
+        return np.asarray(self.index["position"])
+
+    @property
+    def frequency(self) -> NDArray[np.float64]:
+        """Frequencies of the written waveforms."""
+        return np.asarray(self.index["frequency"])
+
+    @property
+    def timestamps(self) -> NDArray[np.float64]:
+        """Times (s since the epoch) of the written waveforms."""
+        return np.asarray(self.index["timestamp"])
+
+    def __getitem__(self, key: Any) -> NDArray[np.float32]:
+        """Slice the written waveforms (only the requested rows are read)."""
+        return self.waveforms[key]
+
+    def __iter__(self) -> Iterator[NDArray[np.float32]]:
+        for i in range(self._count):
+            yield self._waveforms[i]
+
+    def append(
+        self,
+        waveform: NDArray[np.float64],
+        position: float,
+        frequency: float = np.nan,
+        timestamp: float | None = None,
+    ) -> int:
+        """Write the waveform to the next row and flush it.
+
+        Parameters
+        ----------
+        waveform: NDArray[np.float64]
+            Waveform (memory_length points)
+        position: float
+            Position of the stage
+        frequency: float
+            Frequency (trigger or measured)
+        timestamp: float | None
+            Time (s since the epoch). Default: now
+
+        Returns
+        -------
+        int
+            Row of the waveform
+
+        Raises
+        ------
+        IndexError
+            If the stack is full.
+        """
+        row = self._count
+        if row >= self.capacity:
+            msg = f"The stack is full ({self.capacity} waveforms)"
+            raise IndexError(msg)
+        self._waveforms[row] = waveform
+        self._waveforms.flush()
+        self._index[row] = (
+            position,
+            frequency,
+            time.time() if timestamp is None else timestamp,
+            True,
+        )
+        self._index.flush()
+        self._count += 1
+        return row
+
+    def export_text(self, path: str | Path, label: str = "position") -> None:
+        """Write the waveforms as the tab-separated text (timescale + columns)."""
+        header = ["timescale"] + [
+            f"{label}_{np.round(position, 3):.3f}@{frequency}"
+            for position, frequency in zip(
+                self.positions.tolist(),
+                self.frequency.tolist(),
+                strict=True,
+            )
+        ]
+        np.savetxt(
+            path,
+            np.column_stack([self.timescale, self.waveforms.T]),
+            delimiter="\t",
+            header="\t".join(header),
+        )
+
+    def close(self) -> None:
+        """Flush and release the memory maps."""
+        if self._waveforms.mode != "r":
+            self._waveforms.flush()
+            self._index.flush()
+        del self._waveforms
+        del self._index
+
+    def __enter__(self) -> WaveformStack:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
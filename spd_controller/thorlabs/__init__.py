@@ -1,16 +1,45 @@
 from __future__ import annotations
 
 import binascii
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from functools import cached_property
+from typing import TypeVar
 
 import serial
 from serial.tools import list_ports
 
+from ..motion import NotifiedMotionFuture
+from .apt import (
+    HW_START_UPDATEMSGS,
+    HW_STOP_UPDATEMSGS,
+    MOT_ACK_STATUSUPDATE,
+    MOT_GET_STATUSUPDATE,
+    MOT_MOVE_COMPLETED,
+    MOT_MOVE_HOMED,
+    AptFramer,
+    AptMessage,
+    Record,
+    StatusUpdate,
+)
+
+R = TypeVar("R", bound=Record)
+
+READ_INTERVAL = 0.1  # s, the reader thread checks the stop request
+ACK_INTERVAL = 0.5  # s, MGMSG_MOT_ACK_STATUSUPDATE keeps the updates coming
+MOVE_TIMEOUT = 120.0  # s, for the moves with wait=True
+
 __version__: str = "0.1.0"
 
 
 class THORLABS_MOTION_CONTROL:
     """An abstract layer for Thorlabs Motion Control."""
 
+    move_timeout: float | None = MOVE_TIMEOUT  # s, None waits forever
+
     def __init__(self, serial_num: str | int) -> None:
         """Set-up and connect to device with serial number.
 
@@ -54,6 +83,9 @@ class THORLABS_MOTION_CONTROL:
     def rd(self, bytelen: int) -> bytes:
         """Read buffer.
 
+        Exactly bytelen bytes are returned (the serial timeout only splits the
+        read).  For the replies of the requests, ``wait_for`` is preferred.
+
         Parameters
         ----------
         bytelen: int
@@ -63,10 +95,297 @@ class THORLABS_MOTION_CONTROL:
         -------
         bytes
         """
-        x = self.ser.readline()
+        x = bytearray()
         while len(x) < bytelen:
-            x = x + self.ser.readline()
-        return x
+            x.extend(self.ser.read(bytelen - len(x)))
+        return bytes(x)
+
+    @cached_property
+    def framer(self) -> AptFramer:
+        """Framer of the received APT messages."""
+        return AptFramer()
+
+    @cached_property
+    def handlers(self) -> dict[int, list[Callable[[Record | AptMessage], object]]]:
+        """Callbacks of the received messages, by message ID."""
+        return {}
+
+    def subscribe(
+        self,
+        msg_id: int,
+        callback: Callable[[Record | AptMessage], object],
+    ) -> None:
+        """Call back with every received message of msg_id (decoded).
+
+        With the reader thread running, the callback runs in that thread.
+
+        Parameters
+        ----------
+        msg_id: int
+            Message ID (e.g. ``apt.MOT_MOVE_COMPLETED``)
+        callback: Callable[[Record | AptMessage], object]
+            Called with the typed record (``AptMessage`` for the unknown ID)
+        """
+        self.handlers.setdefault(msg_id, []).append(callback)
+
+    def unsubscribe(
+        self,
+        msg_id: int,
+        callback: Callable[[Record | AptMessage], object],
+    ) -> None:
+        """Remove the callback registered by ``subscribe``."""
+        callbacks = self.handlers.get(msg_id, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def read_message(self, timeout: float | None = None) -> Record | AptMessage | None:
+        """Read one APT message and dispatch it to the subscribed callbacks.
+
+        The header (6 bytes) and the data packet (its length is in the header)
+        are read exactly, so that the next message stays aligned.
+
+        Parameters
+        ----------
+        timeout: float | None
+            Maximum waiting time (s). None waits until a message arrives.
+
+        Returns
+        -------
+        Record | AptMessage | None
+            The decoded message, None at the timeout.  The incomplete message
+            is kept and completed by the next read.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            messages = self.framer.feed(self.ser.read(self.framer.needed()))
+            if messages:
+                message = messages[0]
+                for callback in list(self.handlers.get(message.msg_id, [])):
+                    callback(message)
+                return message
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+
+    def wait_for(self, record: type[R], timeout: float | None = None) -> R:
+        """Read the messages until the record arrives.
+
+        The other messages are dispatched to the callbacks (and discarded).
+        With the reader thread running, the record is taken from that thread.
+
+        Parameters
+        ----------
+        record: type[R]
+            Record class (e.g. ``apt.PosCounter``)
+        timeout: float | None
+            Maximum waiting time (s). None waits forever.
+
+        Raises
+        ------
+        TimeoutError
+            If the record does not arrive within timeout.
+        """
+        return self.request(None, record, timeout)
+
+    def request(
+        self,
+        message: AptMessage | None,
+        record: type[R],
+        timeout: float | None = None,
+    ) -> R:
+        """Send the message and wait for the reply.
+
+        Parameters
+        ----------
+        message: AptMessage | None
+            Request (e.g. MGMSG_MOT_REQ_POSCOUNTER). None only waits.
+        record: type[R]
+            Record class of the reply (e.g. ``apt.PosCounter``)
+        timeout: float | None
+            Maximum waiting time (s). None waits forever.
+
+        Raises
+        ------
+        TimeoutError
+            If the reply does not arrive within timeout.
+        """
+        msg = f"{record.__name__} does not arrive within {timeout} s"
+        if not self.reading:
+            if message is not None:
+                self.send(message)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                reply = self.read_message(remaining)
+                if type(reply) is record:
+                    return reply
+                if reply is None:
+                    raise TimeoutError(msg)
+        replies: queue.Queue[Record | AptMessage] = queue.Queue()
+        self.subscribe(record.MSG_ID, replies.put)
+        try:
+            if message is not None:
+                self.send(message)
+            while True:
+                reply = replies.get(timeout=timeout)
+                if type(reply) is record:
+                    return reply
+        except queue.Empty:
+            raise TimeoutError(msg) from None
+        finally:
+            self.unsubscribe(record.MSG_ID, replies.put)
+
+    @property
+    def reading(self) -> bool:
+        """True if the reader thread is running."""
+        reader: threading.Thread | None = getattr(self, "_reader", None)
+        return reader is not None and reader.is_alive()
+
+    def start_reader(self, updates: bool = True) -> None:
+        """Start the thread reading and dispatching the messages.
+
+        The moves (``_move``) are completed by MGMSG_MOT_MOVE_COMPLETED (or
+        MGMSG_MOT_MOVE_HOMED) received in this thread.
+
+        Parameters
+        ----------
+        updates: bool
+            If True, enable the status update messages of the device
+            (MGMSG_HW_START_UPDATEMSGS), which report the position during the
+            move.
+        """
+        if self.reading:
+            return
+        self._reader_stop = threading.Event()
+        self._last_ack = 0.0
+        self.subscribe(MOT_GET_STATUSUPDATE, self._on_status_update)
+        self.subscribe(MOT_MOVE_COMPLETED, self._on_move_completed)
+        self.subscribe(MOT_MOVE_HOMED, self._on_move_completed)
+        self._reader = threading.Thread(
+            target=self._read_loop,
+            name=f"apt-reader-{self.serial_num}",
+            daemon=True,
+        )
+        self._reader.start()
+        if updates:
+            self.send(AptMessage(HW_START_UPDATEMSGS))
+
+    def stop_reader(self) -> None:
+        """Stop the reader thread (and the status update messages)."""
+        if not self.reading:
+            return
+        self.send(AptMessage(HW_STOP_UPDATEMSGS))
+        self._reader_stop.set()
+        self._reader.join()
+        self.unsubscribe(MOT_GET_STATUSUPDATE, self._on_status_update)
+        self.unsubscribe(MOT_MOVE_COMPLETED, self._on_move_completed)
+        self.unsubscribe(MOT_MOVE_HOMED, self._on_move_completed)
+        with self._moves_lock:  # can no longer be completed
+            self._moves.clear()
+            self._abandoned.clear()
+
+    def _read_loop(self) -> None:
+        while not self._reader_stop.is_set():
+            self.read_message(timeout=READ_INTERVAL)
+
+    def _move(
+        self,
+        command: str,
+        target: float | None = None,
+        *,
+        wait: bool = False,
+    ) -> NotifiedMotionFuture:
+        """Send the move command and return its completion.
+
+        One move is pending at a time.  The device reports the moves in the
+        order of the commands, so the moves are queued and each
+        MGMSG_MOT_MOVE_COMPLETED completes the oldest one; the completion of
+        an abandoned move (timeout) is discarded when it arrives late, or
+        dropped at the next status update reporting the stop.
+
+        Parameters
+        ----------
+        command: str
+            Move command (hex string)
+        target: float | None
+            Position after the move, if known (the result of the future)
+        wait: bool
+            If True, return after the move (within ``move_timeout``).
+
+        Raises
+        ------
+        RuntimeError
+            If the previous move has not finished.
+        TimeoutError
+            If the move with wait=True does not finish within move_timeout.  The
+            move is then abandoned (its late completion is ignored).
+        """
+        self.start_reader()
+        future = NotifiedMotionFuture(target=target)
+        with self._moves_lock:
+            if any(move not in self._abandoned for move in self._moves):
+                msg = "The previous move has not finished (wait for its future)"
+                raise RuntimeError(msg)
+            self._moves.append(future)
+        self.write(command)
+        if wait and not future.wait(self.move_timeout):
+            with self._moves_lock:
+                if not future.done():
+                    self._abandoned.add(future)
+            msg = f"The move does not finish within {self.move_timeout} s"
+            raise TimeoutError(msg)
+        return future
+
+    def _record_position(self, record: StatusUpdate) -> float | None:
+        """Position of the status update in the user unit (None: unknown)."""
+        return record.position
+
+    def _on_status_update(self, record: Record | AptMessage) -> None:
+        now = time.monotonic()
+        if now - self._last_ack > ACK_INTERVAL:
+            self._last_ack = now
+            self.send(AptMessage(MOT_ACK_STATUSUPDATE))
+        with self._moves_lock:
+            if not record.moving:  # type: ignore[union-attr]
+                while self._moves and self._moves[0] in self._abandoned:
+                    self._abandoned.discard(self._moves.popleft())  # lost
+            future = self._moves[0] if self._moves else None
+        position = self._record_position(record)  # type: ignore[arg-type]
+        if future is not None and position is not None:
+            future.update(position)
+
+    def _on_move_completed(self, record: Record | AptMessage) -> None:
+        with self._moves_lock:
+            if not self._moves:
+                return
+            future = self._moves.popleft()
+            if future in self._abandoned:
+                self._abandoned.discard(future)
+                return
+        if isinstance(record, StatusUpdate):
+            future.set_result(self._record_position(record))
+        else:
+            future.set_result()
+
+    @cached_property
+    def _moves(self) -> deque[NotifiedMotionFuture]:
+        return deque()
+
+    @cached_property
+    def _abandoned(self) -> set[NotifiedMotionFuture]:
+        return set()
+
+    @cached_property
+    def _moves_lock(self) -> threading.Lock:
+        return threading.Lock()
+
+    @cached_property
+    def _write_lock(self) -> threading.Lock:
+        return threading.Lock()
+
+    def send(self, message: AptMessage) -> int | None:
+        """Send the APT message."""
+        with self._write_lock:
+            return self.ser.write(message.encode())
 
     def write(self, x: str) -> int | None:
         """Write buffer.
@@ -77,7 +396,8 @@ class THORLABS_MOTION_CONTROL:
             String to buffer
         """
         command = bytearray.fromhex(x)
-        return self.ser.write(command)
+        with self._write_lock:
+            return self.ser.write(command)
 
 
 def decimal_to_hex(x: int, byte_length: int) -> str:
@@ -0,0 +1,280 @@
+"""Framing and decoding of the Thorlabs APT binary messages.
+
+Every message starts with the 6-byte header::
+
+    message ID (uint16 LE) | param1 param2 | dest | source
+
+If the most significant bit of dest (0x80) is set, param1/param2 are the
+length of the data packet (uint16 LE) which follows the header, and the
+destination is ``dest & 0x7F``.  ``AptFramer`` cuts the byte stream into the
+messages by these lengths (no terminator, no timeout), and ``decode`` converts
+the known messages into the typed records::
+
+    framer = AptFramer()
+    for record in framer.feed(port.read(port.in_waiting or 1)):
+        if isinstance(record, MoveCompleted):
+            ...
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from typing import ClassVar
+
+HEADER = struct.Struct("<HBBBB")
+DATA_FLAG = 0x80
+
+MOD_IDENTIFY = 0x0223
+HW_START_UPDATEMSGS = 0x0011
+HW_STOP_UPDATEMSGS = 0x0012
+MOT_REQ_POSCOUNTER = 0x0411
+MOT_GET_POSCOUNTER = 0x0412
+MOT_SET_VELPARAMS = 0x0413
+MOT_REQ_VELPARAMS = 0x0414
+MOT_GET_VELPARAMS = 0x0415
+MOT_REQ_STATUSBITS = 0x0429
+MOT_GET_STATUSBITS = 0x042A
+MOT_MOVE_HOME = 0x0443
+MOT_MOVE_HOMED = 0x0444
+MOT_MOVE_RELATIVE = 0x0448
+MOT_MOVE_ABSOLUTE = 0x0453
+MOT_MOVE_COMPLETED = 0x0464
+MOT_MOVE_STOP = 0x0465
+MOT_MOVE_STOPPED = 0x0466
+MOT_MOVE_JOG = 0x046A
+MOT_REQ_STATUSUPDATE = 0x0480
+MOT_GET_STATUSUPDATE = 0x0481
+MOT_ACK_STATUSUPDATE = 0x0492
+
+HOST = 0x01
+GENERIC_USB = 0x50
+
+
+@dataclass(frozen=True)
+class AptMessage:
+    """Raw APT message.
+
+    Attributes
+    ----------
+    msg_id : int
+        Message ID
+    param1 : int
+        First parameter of the header-only message (0 with data)
+    param2 : int
+        Second parameter of the header-only message (0 with data)
+    dest : int
+        Destination (without the data flag)
+    source : int
+        Source
+    data : bytes
+        Data packet (b"" for the header-only message)
+    """
+
+    msg_id: int
+    param1: int = 0
+    param2: int = 0
+    dest: int = GENERIC_USB
+    source: int = HOST
+    data: bytes = b""
+
+    def encode(self) -> bytes:
+        """Return the bytes to send."""
+        if self.data:
+            header = HEADER.pack(
+                self.msg_id,
+                len(self.data) & 0xFF,
+                len(self.data) >> 8,
+                self.dest | DATA_FLAG,
+                self.source,
+            )
+            return header + self.data
+        return HEADER.pack(
+            self.msg_id, self.param1, self.param2, self.dest, self.source
+        )
+
+
+class _Record:
+    MSG_ID: ClassVar[int]
+
+    @property
+    def msg_id(self) -> int:
+        """Message ID."""
+        return self.MSG_ID
+
+
+@dataclass(frozen=True)
+class StatusBits(_Record):
+    """MGMSG_MOT_GET_STATUSBITS (0x042A)."""
+
+    MSG_ID: ClassVar[int] = MOT_GET_STATUSBITS
+    channel: int
+    status_bits: int
+
+    @classmethod
+    def from_message(cls, message: AptMessage) -> StatusBits:
+        channel, status_bits = struct.unpack_from("<HI", message.data)
+        return cls(channel, status_bits)
+
+    @property
+    def moving(self) -> bool:
+        """True if the motor is moving (bits 4-7: moving cw/ccw, jogging)."""
+        return bool(self.status_bits & 0xF0)
+
+
+@dataclass(frozen=True)
+class PosCounter(_Record):
+    """MGMSG_MOT_GET_POSCOUNTER (0x0412). Position in the device unit."""
+
+    MSG_ID: ClassVar[int] = MOT_GET_POSCOUNTER
+    channel: int
+    position: int
+
+    @classmethod
+    def from_message(cls, message: AptMessage) -> PosCounter:
+        channel, position = struct.unpack_from("<Hi", message.data)
+        return cls(channel, position)
+
+
+@dataclass(frozen=True)
+class VelParams(_Record):
+    """MGMSG_MOT_GET_VELPARAMS (0x0415), also the data of SET_VELPARAMS.
+
+    Velocities and acceleration in the device unit.
+    """
+
+    MSG_ID: ClassVar[int] = MOT_GET_VELPARAMS
+    channel: int
+    min_velocity: int
+    acceleration: int
+    max_velocity: int
+
+    @classmethod
+    def from_message(cls, message: AptMessage) -> VelParams:
+        return cls(*struct.unpack_from("<Hiii", message.data))
+
+    def to_message(self) -> AptMessage:
+        """Return MGMSG_MOT_SET_VELPARAMS with these parameters."""
+        data = struct.pack(
+            "<Hiii",
+            self.channel,
+            self.min_velocity,
+            self.acceleration,
+            self.max_velocity,
+        )
+        return AptMessage(MOT_SET_VELPARAMS, data=data)
+
+
+@dataclass(frozen=True)
+class StatusUpdate(_Record):
+    """MGMSG_MOT_GET_STATUSUPDATE (0x0481).
+
+    Position and encoder count in the device unit.
+    """
+
+    MSG_ID: ClassVar[int] = MOT_GET_STATUSUPDATE
+    channel: int
+    position: int
+    encoder_count: int
+    status_bits: int
+
+    @classmethod
+    def from_message(cls, message: AptMessage) -> StatusUpdate:
+        return cls(*struct.unpack_from("<HiiI", message.data))
+
+    @property
+    def moving(self) -> bool:
+        """True if the motor is moving (bits 4-7: moving cw/ccw, jogging)."""
+        return bool(self.status_bits & 0xF0)
+
+
+@dataclass(frozen=True)
+class MoveCompleted(StatusUpdate):
+    """MGMSG_MOT_MOVE_COMPLETED (0x0464), with the status at the stop."""
+
+    MSG_ID: ClassVar[int] = MOT_MOVE_COMPLETED
+
+
+@dataclass(frozen=True)
+class MoveHomed(_Record):
+    """MGMSG_MOT_MOVE_HOMED (0x0444)."""
+
+    MSG_ID: ClassVar[int] = MOT_MOVE_HOMED
+    channel: int
+
+    @classmethod
+    def from_message(cls, message: AptMessage) -> MoveHomed:
+        return cls(message.param1)
+
+
+Record = StatusBits | PosCounter | VelParams | StatusUpdate | MoveCompleted | MoveHomed
+RECORDS: dict[int, type[Record]] = {
+    record.MSG_ID: record
+    for record in (
+        StatusBits,
+        PosCounter,
+        VelParams,
+        StatusUpdate,
+        MoveCompleted,
+        MoveHomed,
+    )
+}
+
+
+def decode(message: AptMessage) -> Record | AptMessage:
+    """Return the typed record of the known message (the message itself if not)."""
+    record = RECORDS.get(message.msg_id)
+    if record is None:
+        return message
+    try:
+        return record.from_message(message)
+    except struct.error:  # shorter data than expected
+        return message
+
+
+class AptFramer:
+    """Split the byte stream into the APT messages."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        """Return the number of the buffered bytes (incomplete message)."""
+        return len(self._buffer)
+
+    def needed(self) -> int:
+        """Return the number of the bytes to complete the next message."""
+        if len(self._buffer) < HEADER.size:
+            return HEADER.size - len(self._buffer)
+        _, param1, param2, dest, _ = HEADER.unpack_from(self._buffer)
+        if dest & DATA_FLAG:
+            return HEADER.size + (param1 | param2 << 8) - len(self._buffer)
+        return 0
+
+    def feed(self, data: bytes | bytearray) -> list[Record | AptMessage]:
+        """Add the received bytes and return the completed messages (decoded)."""
+        self._buffer.extend(data)
+        messages: list[Record | AptMessage] = []
+        while len(self._buffer) >= HEADER.size:
+            msg_id, param1, param2, dest, source = HEADER.unpack_from(self._buffer)
+            length = HEADER.size
+            if dest & DATA_FLAG:
+                length += param1 | param2 << 8
+                if len(self._buffer) < length:
+                    break
+                message = AptMessage(
+                    msg_id,
+                    dest=dest & ~DATA_FLAG,
+                    source=source,
+                    data=bytes(self._buffer[HEADER.size : length]),
+                )
+            else:
+                message = AptMessage(msg_id, param1, param2, dest, source)
+            del self._buffer[:length]
+            messages.append(decode(message))
+        return messages
+
+    def clear(self) -> None:
+        """Discard the buffered bytes."""
+        self._buffer.clear()
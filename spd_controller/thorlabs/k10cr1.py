@@ -1,6 +1,25 @@
 from __future__ import annotations
 
-from . import THORLABS_MOTION_CONTROL, bytes_to_decimal, decimal_to_hex
+from collections.abc import Callable
+
+import numpy as np
+from numpy.typing import NDArray
+
+from ..flyscan import FlyScanResult, sample_motion, sampling_period
+from ..motion import MotionFuture, NotifiedMotionFuture
+from . import THORLABS_MOTION_CONTROL, decimal_to_hex
+from .apt import (
+    MOT_REQ_POSCOUNTER,
+    MOT_REQ_VELPARAMS,
+    AptMessage,
+    PosCounter,
+    StatusUpdate,
+    VelParams,
+)
+
+VELOCITY_SCALE = 7329109  # device unit / (deg/s)
+ACCELERATION_SCALE = 1502  # device unit / (deg/s^2)
+REPLY_TIMEOUT = 1.0  # s, for MGMSG_MOT_GET_POSCOUNTER
 
 
 class MockK10CR1:
@@ -8,11 +27,13 @@ class MockK10CR1:
         self.serial_num = int(serial_num)
         self.ready = True
 
-    def move_abs(self, angle_deg: float) -> None:
+    def move_abs(self, angle_deg: float, *, wait: bool = True) -> MotionFuture:
         print(f"Rotate by {angle_deg} degrees")
+        return MotionFuture.completed(angle_deg)
 
-    def move_rel(self, angle_deg: float) -> None:
+    def move_rel(self, angle_deg: float, *, wait: bool = True) -> MotionFuture:
         print(f"Rotate to {angle_deg} degrees")
+        return MotionFuture.completed()
 
 
 class K10CR1(THORLABS_MOTION_CONTROL):
@@ -54,16 +75,23 @@ class K10CR1(THORLABS_MOTION_CONTROL):
             + offset_distance,
         )
 
-    def home(self) -> bytes:
+    def _record_position(self, record: StatusUpdate) -> float:
+        return self.DU_to_angle(record.position)
+
+    def home(self, *, wait: bool = True) -> NotifiedMotionFuture:
         """Start to a home position.
 
-        MGMSG_MOT_MOVE_HOME
+        MGMSG_MOT_MOVE_HOME.  The move is completed by MGMSG_MOT_MOVE_HOMED.
+
+        Parameters
+        ----------
+        wait: bool
+            If True, wait for finishing the homing, by default True.
         """
         self.set_home_speed(10)
-        self.write("430401005001")  # 43, 04, 01, 00, 50, 01
-        return self.rd(6)
+        return self._move("430401005001", 0.0, wait=wait)  # 43, 04, 01, 00, 50, 01
 
-    def move_rel(self, angle_deg: float) -> None:
+    def move_rel(self, angle_deg: float, *, wait: bool = True) -> NotifiedMotionFuture:
         """Start a relative move.
 
         The longer version (6 byte header plus 6 data bytes) is used.
@@ -73,26 +101,41 @@ class K10CR1(THORLABS_MOTION_CONTROL):
         ----------
         angle_deg: float
             Relative rotation angle in degree.
+        wait: bool
+            If True, wait for finishing the move, by default True.
+
+        Returns
+        -------
+        NotifiedMotionFuture
+            Completion of the move (its result is the angle)
         """
         rel_position: str = decimal_to_hex(self.angle_to_DU(angle_deg), 4)
         channel: str = "0100"
         header = "48040600d001"  # 48, 04, 06, 00, d0, 01
         cmd: str = header + channel + rel_position
-        self.write(cmd)
+        return self._move(cmd, wait=wait)
 
-    def move_abs(self, angle_deg: float) -> None:
+    def move_abs(self, angle_deg: float, *, wait: bool = True) -> NotifiedMotionFuture:
         """Start a absolute move.
 
         Parameters
         ----------
         angle_deg : float
             Absolute angle of the stage head in degree.
+        wait: bool
+            If True, wait for finishing the move, by default True.
+            ``move_abs(angle, wait=False).result(timeout)`` waits later.
+
+        Returns
+        -------
+        NotifiedMotionFuture
+            Completion of the move (its result is the angle)
         """
         abs_position: str = decimal_to_hex(self.angle_to_DU(angle_deg), 4)
         channel: str = "0100"
         header: str = "53040600d001"  # 53, 04, 06, 00, d0, 01
         cmd: str = header + channel + abs_position
-        self.write(cmd)
+        return self._move(cmd, angle_deg, wait=wait)
 
     def zerobacklash(self) -> None:
         backlash_position = decimal_to_hex(self.angle_to_DU(0), 4)
@@ -101,17 +144,22 @@ class K10CR1(THORLABS_MOTION_CONTROL):
         cmd: str = header + channel + backlash_position
         self.write(cmd)
 
-    def jog(self) -> bytes:
-        """Jog starts.
+    def jog(self, *, wait: bool = True) -> NotifiedMotionFuture:
+        """Start a jog move.
+
+        Parameters
+        ----------
+        wait: bool
+            If True, wait for finishing the jog, by default True.
 
         Returns
         -------
-        Start a jog move
+        NotifiedMotionFuture
+            Completion of the jog (its result is the angle)
         """
-        self.write("6a0401015001")  # 6a, 04, 01, 01, 50, 01
         # the first 01 is the channel.
         # the second 01 is the forward jog.
-        return self.rd(20)
+        return self._move("6a0401015001", wait=wait)  # 6a, 04, 01, 01, 50, 01
 
     def getpos(self) -> float:
         """Return the current angle.
@@ -121,7 +169,121 @@ class K10CR1(THORLABS_MOTION_CONTROL):
         float
             The current angle (degree)
         """
-        self.write("110401005001")  # 11, 04, 01, 00, 50, 01
-        bytedata: bytes = self.rd(12)[8:]
-        x = self.DU_to_angle(bytes_to_decimal(bytedata))
-        return float("%.3f" % x)
+        return float("%.3f" % self._read_angle())
+
+    def _read_angle(self) -> float:
+        request = AptMessage(MOT_REQ_POSCOUNTER, 1)  # 11, 04, 01, 00, 50, 01
+        reply = self.request(request, PosCounter, timeout=REPLY_TIMEOUT)
+        return self.DU_to_angle(reply.position)
+
+    def velocity_params(self) -> VelParams:
+        """Return the velocity parameters (MGMSG_MOT_REQ_VELPARAMS).
+
+        Returns
+        -------
+        VelParams
+            The parameters in the device unit (see VELOCITY_SCALE and
+            ACCELERATION_SCALE)
+        """
+        return self.request(AptMessage(MOT_REQ_VELPARAMS, 1), VelParams)
+
+    def set_velocity(
+        self,
+        speed_deg_s: float,
+        acceleration_deg_s2: float | None = None,
+    ) -> VelParams:
+        """Set the maximum velocity of the moves (MGMSG_MOT_SET_VELPARAMS).
+
+        Parameters
+        ----------
+        speed_deg_s : float
+            rotation speed in degree/s.
+        acceleration_deg_s2 : float | None
+            acceleration in degree/s^2. None keeps the current value.
+
+        Returns
+        -------
+        VelParams
+            The previous parameters (``self.send(previous.to_message())``
+            restores them)
+        """
+        previous = self.velocity_params()
+        acceleration = (
+            previous.acceleration
+            if acceleration_deg_s2 is None
+            else int(ACCELERATION_SCALE * acceleration_deg_s2)
+        )
+        params = VelParams(
+            1,
+            previous.min_velocity,
+            acceleration,
+            int(VELOCITY_SCALE * speed_deg_s),
+        )
+        self.send(params.to_message())
+        return previous
+
+    def fly_scan(
+        self,
+        detector: Callable[[], float],
+        start: float = 0.0,
+        span: float = 360.0,
+        grid: NDArray[np.float64] | None = None,
+        speed: float | None = None,
+        acceleration: float | None = None,
+        interval: float = 0.05,
+        samples_per_point: int = 4,
+    ) -> FlyScanResult:
+        """Measure during one continuous rotation from start by span (degree).
+
+        The stage moves to start, and then rotates by span at the constant
+        speed, while the position counter and the detector are sampled every
+        interval.  The samples are binned onto the grid.  The velocity
+        parameters are restored after the scan.
+
+        Parameters
+        ----------
+        detector : Callable[[], float]
+            Returns the detector value (e.g. ``lambda: power_meter.read``)
+        start : float
+            Start angle (degree)
+        span : float
+            Rotation angle (degree), negative for the backward rotation
+        grid : NDArray[np.float64] | None
+            Angles (degree) of the result. Default: 1 degree step
+        speed : float | None
+            Rotation speed (degree/s). Default: samples_per_point samples at
+            each grid point, with the sampling period measured by two detector
+            reads (``flyscan.sampling_period``).
+        acceleration : float | None
+            Acceleration (degree/s^2). None keeps the current value.
+        interval : float
+            Sampling period (s)
+        samples_per_point : int
+            Number of the samples at each grid point for the default speed
+
+        Returns
+        -------
+        FlyScanResult
+            Samples and the binned data
+        """
+        end = start + span
+        if grid is None:
+            grid = np.linspace(start, end, int(round(abs(span))) + 1)
+        if speed is None:
+            step = float(abs(grid[-1] - grid[0])) / max(len(grid) - 1, 1)
+            speed = step / (sampling_period(detector, interval) * samples_per_point)
+        self.move_abs(start, wait=True)
+        previous = self.set_velocity(speed, acceleration)
+        try:
+            move = self.move_rel(span, wait=False)
+            timeout = abs(span) / speed * 2 + 10
+            result = sample_motion(
+                lambda: None if move.done() else self._read_angle(),
+                detector,
+                interval,
+                timeout,
+            )
+            move.wait()
+        finally:
+            self.send(previous.to_message())
+        return result.bin(grid)
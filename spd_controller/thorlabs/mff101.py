@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 from __future__ import annotations
+from typing import Literal
+
+from ..motion import MotionFuture, NotifiedMotionFuture
 from . import THORLABS_MOTION_CONTROL
+from .apt import MOT_REQ_STATUSBITS, AptMessage, StatusBits, StatusUpdate
 
 from random import random
 
@@ -17,8 +21,13 @@ class MockMFF101:
         else:
             return 2
 
-    def flip(self) -> None:
+    def move_abs(self, position: Literal[1, 2], *, wait: bool = True) -> MotionFuture:
+        print(f"move to {position} : {self.serial_num} ")
+        return MotionFuture.completed(position)
+
+    def flip(self, *, wait: bool = True) -> MotionFuture:
         print(f"flip : {self.serial_num} ")
+        return MotionFuture.completed()
 
 
 class MFF101(THORLABS_MOTION_CONTROL):
@@ -40,12 +49,15 @@ class MFF101(THORLABS_MOTION_CONTROL):
         Returns
         -------
         int
-            the current position 1 or 2
+            the current position 1 or 2 (the lowest byte of the status bits)
         """
-        self.write("290400005001")  # MGMSG_MOT_REQ_STATUSBITS
-        return self.rd(12)[8]
+        request = AptMessage(MOT_REQ_STATUSBITS)  # 29, 04, 00, 00, 50, 01
+        return self.request(request, StatusBits).status_bits & 0xFF
+
+    def _record_position(self, record: StatusUpdate) -> None:
+        return None  # the result of the move is its target (1 or 2)
 
-    def move_forward(self) -> int | None:
+    def move_forward(self, *, wait: bool = True) -> NotifiedMotionFuture:
         """Move flipper forward (2->1).
 
         MGMSG_MOT_MOVE_JOG   (64 04 (Chan Ident) Direction d s)
@@ -53,10 +65,15 @@ class MFF101(THORLABS_MOTION_CONTROL):
             * Direction : The direction to Jog.
                           Set this byte to 0x01 to jog forward, or to 0x02 to jog in the
                           reverse diregtion.
+
+        Parameters
+        ----------
+        wait: bool
+            If True, wait for finishing the move (MGMSG_MOT_MOVE_COMPLETED).
         """
-        return self.write("6A0401015001")
+        return self._move("6A0401015001", 1, wait=wait)
 
-    def move_backward(self) -> int | None:
+    def move_backward(self, *, wait: bool = True) -> NotifiedMotionFuture:
         """Move flipper backward  (1->2).
 
         MGMSG_MOT_MOVE_JOG   (64 04 (Chan Ident) Direction d s)
@@ -64,12 +81,47 @@ class MFF101(THORLABS_MOTION_CONTROL):
             * Direction : The direction to Jog.
                           Set this byte to 0x01 to jog forward, or to 0x02 to jog in the
                           reverse diregtion.
+
+        Parameters
+        ----------
+        wait: bool
+            If True, wait for finishing the move (MGMSG_MOT_MOVE_COMPLETED).
+        """
+        return self._move("6A0401025001", 2, wait=wait)
+
+    def move_abs(
+        self,
+        position: Literal[1, 2],
+        *,
+        wait: bool = True,
+    ) -> NotifiedMotionFuture:
+        """Move flipper to the position 1 or 2.
+
+        Parameters
+        ----------
+        position: Literal[1, 2]
+            The position after the move
+        wait: bool
+            If True, wait for finishing the move, by default True.
+            ``move_abs(position, wait=False).result(timeout)`` waits later.
+
+        Returns
+        -------
+        NotifiedMotionFuture
+            Completion of the move (its result is the position)
         """
-        return self.write("6A0401025001")
+        if position == 1:
+            return self.move_forward(wait=wait)
+        return self.move_backward(wait=wait)
 
-    def flip(self) -> None:
-        """Flip the position."""
+    def flip(self, *, wait: bool = True) -> NotifiedMotionFuture:
+        """Flip the position.
+
+        Parameters
+        ----------
+        wait: bool
+            If True, wait for finishing the move, by default True.
+        """
         if self.position() == 1:
-            self.move_backward()
-        else:
-            self.move_forward()
+            return self.move_backward(wait=wait)
+        return self.move_forward(wait=wait)
@@ -1,5 +1,7 @@
 """Unit test for Specs."""
 
+import threading
+
 import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
@@ -8,6 +10,13 @@ from IPython.core.interactiveshell import InteractiveShell
 import spd_controller.Specs as specs  # ← モジュール名に合わせてください
 
 
+@pytest.fixture(autouse=True)
+def clear_notebook_context():
+    specs.notebook_context.clear()
+    yield
+    specs.notebook_context.clear()
+
+
 ###########
 # get_tqdm
 ###########
@@ -43,7 +52,7 @@ def test_get_tqdm_notebook(monkeypatch):
 #################
 def test_generate_logfile_path(monkeypatch):
     # notebook名とdatetimeをモック
-    monkeypatch.setattr(specs, "get_notebook_name", lambda: "FooBar")
+    monkeypatch.setattr(specs, "get_notebook_name", lambda timeout=None: "FooBar")
     dt = specs.datetime.datetime(2024, 6, 1, 12, 34, 56, tzinfo=specs.UTC)
     monkeypatch.setattr(specs.datetime, "datetime", MagicMock(now=lambda tz=None: dt))
     path = specs.generate_logfile_path()
@@ -66,10 +75,39 @@ def test_get_notebook_name(monkeypatch):
     )
     assert specs.get_notebook_name() == "Doping-Analysis"
     # 情報がない時
+    specs.notebook_context.clear()
     monkeypatch.setattr(specs, "get_full_notebook_information", lambda: None)
     assert specs.get_notebook_name() == "unnamed"
 
 
+def test_get_notebook_name_timeout(monkeypatch):
+    # サーバーが応答しない時は待たずに "unnamed"
+    release = threading.Event()
+
+    def hung_server():
+        release.wait()
+        return {"session": {"notebook": {"name": "Late.ipynb"}}}
+
+    monkeypatch.setattr(specs, "get_full_notebook_information", hung_server)
+    assert specs.get_notebook_name(timeout=0.01) == "unnamed"
+    release.set()
+    # 解決後はキャッシュされた値を返す
+    assert specs.get_notebook_name(timeout=None) == "Late"
+
+
+def test_notebook_context_cached(monkeypatch):
+    calls = []
+
+    def query():
+        calls.append(1)
+        return None
+
+    monkeypatch.setattr(specs, "get_full_notebook_information", query)
+    assert specs.notebook_context.get(timeout=1) is None
+    assert specs.notebook_context.get(timeout=1) is None
+    assert len(calls) == 1
+
+
 ##################
 # start_logging
 ##################
@@ -94,6 +132,35 @@ def test_start_logging(monkeypatch, tmp_path):
     assert "foo.log" in dummy_shell.called[1]
 
 
+def test_start_logging_renamed_when_resolved(monkeypatch, tmp_path):
+    # import 時は待たずに "unnamed" で記録し、名前が分かったら次のセルで rename
+    release = threading.Event()
+
+    def slow_server():
+        release.wait()
+        return {"session": {"notebook": {"name": "Slow.ipynb"}}}
+
+    monkeypatch.setattr(specs, "get_full_notebook_information", slow_server)
+    monkeypatch.chdir(tmp_path)
+    shell = InteractiveShell()
+    monkeypatch.setattr("IPython.core.getipython.get_ipython", lambda: shell)
+    try:
+        specs.start_logging()
+        (unnamed,) = (tmp_path / "logs").iterdir()
+        assert unnamed.name.startswith("unnamed_")
+        shell.events.trigger("pre_run_cell", None)
+        assert unnamed.exists()  # not resolved yet
+        release.set()
+        specs.notebook_context.get(timeout=1)
+        shell.events.trigger("pre_run_cell", None)
+        (renamed,) = (tmp_path / "logs").iterdir()
+        assert renamed.name == "Slow" + unnamed.name.removeprefix("unnamed")
+        assert shell.logger.log_active
+        assert shell.logger.logfname == str(renamed.relative_to(tmp_path))
+    finally:
+        shell.logger.logstop()
+
+
 def test_start_logging_not_interactive(monkeypatch):
     # InteractiveShell以外の場合は何もしない
     monkeypatch.setattr("IPython.core.getipython.get_ipython", lambda: None)
@@ -136,7 +203,7 @@ def test_get_full_notebook_information(monkeypatch, passwordless):
             return b""
 
     monkeypatch.setattr(specs.json, "load", lambda fp: sessions)
-    monkeypatch.setattr(specs.urllib.request, "urlopen", lambda url: None)
+    monkeypatch.setattr(specs.urllib.request, "urlopen", lambda url, timeout=None: None)
     info = specs.get_full_notebook_information()
     assert info is not None
     assert info["server"] == server
@@ -173,7 +240,7 @@ def test_get_full_notebook_information_http_error(monkeypatch):
     monkeypatch.setattr(
         specs.urllib.request,
         "urlopen",
-        lambda url: (_ for _ in ()).throw(
+        lambda url, timeout=None: (_ for _ in ()).throw(
             specs.HTTPError(url, 404, "Not found", None, None)
         ),
     )
@@ -198,6 +265,6 @@ def test_get_full_notebook_information_url_error(monkeypatch):
             }
         ],
     )
-    monkeypatch.setattr(specs.urllib.request, "urlopen", lambda url: None)
+    monkeypatch.setattr(specs.urllib.request, "urlopen", lambda url, timeout=None: None)
     monkeypatch.setattr(specs.json, "load", lambda x: [])
     assert specs.get_full_notebook_information() is None
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""Import-time and startup benchmark for spd_controller.
+
+Three groups of numbers are measured:
+
+* import: wall time of ``import <module>`` in a fresh interpreter, per submodule.
+* first_command: time to construct a driver and run its first query against an
+  in-process simulator of the serial/socket peer.  "first" includes the import.
+* per_point: overhead per data point of the main acquisition loops
+  (``RemoteIn.scan``, ``Qmass.single_scan``, ``QmassAcquisition`` on the pty
+  simulator of Microvision plus and ``GDS3502.acquire_memory``).
+
+Each run is appended to a JSON history file, so that regressions show up as numbers::
+
+    python test/benchmark/benchmark.py
+    python test/benchmark/benchmark.py --group import --repeat 10
+
+The DEBUG log output of the drivers is disabled during the measurements.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[2]
+HISTORY = Path(__file__).with_name("history.json")
+
+MODULES: tuple[str, ...] = (
+    "spd_controller",
+    "spd_controller.Specs",
+    "spd_controller.Specs.Prodigy",
+    "spd_controller.Specs.convert",
+    "spd_controller.coherent.verdi_c12",
+    "spd_controller.keithley.dmm2700",
+    "spd_controller.keithley.k2000",
+    "spd_controller.keithley.k6514",
+    "spd_controller.newport.picomotor8742",
+    "spd_controller.qmass.qmass",
+    "spd_controller.qmass.webqmass",
+    "spd_controller.sigma.gsc02",
+    "spd_controller.sigma.omec4bf",
+    "spd_controller.sigma.sc104",
+    "spd_controller.smc.hecr",
+    "spd_controller.texio.gds3502",
+    "spd_controller.thorlabs",
+    "spd_controller.thorlabs.k10cr1",
+    "spd_controller.thorlabs.mff101",
+)
+
+
+class SimulatedSerial:
+    """Minimal in-process stand-in of ``serial.Serial``.
+
+    ``responder`` receives every written chunk and returns the bytes the
+    instrument would send back (b"" for no reply).
+    """
+
+    def __init__(self, responder: Callable[[bytes], bytes]) -> None:
+        self.responder = responder
+        self.rx = bytearray()
+        self.timeout: float | None = 1
+        self.baudrate = 9600
+        self.is_open = True
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.rx)
+
+    def write(self, data: bytes) -> int:
+        self.rx.extend(self.responder(bytes(data)))
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        chunk = bytes(self.rx[:size])
+        del self.rx[:size]
+        return chunk
+
+    def readline(self) -> bytes:
+        index = self.rx.find(b"\n")
+        return self.read(len(self.rx) if index < 0 else index + 1)
+
+    def readlines(self) -> list[bytes]:
+        lines = []
+        while self.rx:
+            lines.append(self.readline())
+        return lines
+
+    def read_until(self, expected: bytes = b"\n", size: int | None = None) -> bytes:
+        index = self.rx.find(expected)
+        length = len(self.rx) if index < 0 else index + len(expected)
+        if size is not None:
+            length = min(length, size)
+        return self.read(length)
+
+    def reset_input_buffer(self) -> None:
+        self.rx.clear()
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+class SimulatedSocket:
+    """Minimal stand-in of ``TcpSocketWrapper`` answering SpecsLab Prodigy commands."""
+
+    def __init__(self, n_points: int) -> None:
+        self.n_points = n_points
+        self.reply = ""
+
+    def sendtext(self, text: str) -> int:
+        request_id, command = text[1:5], text[6:]
+        if command.startswith("GetAcquisitionStatus"):
+            body = f"ControllerState:finished NumberOfAcquiredPoints:{self.n_points}"
+        elif command.startswith("GetAcquisitionData"):
+            body = "Data:[" + ",".join(["1.0"] * self.n_points) + "]"
+        else:
+            body = ""
+        self.reply = f"!{request_id} OK: {body}\n"
+        return len(text)
+
+    def recvtext(self, byte_size: int) -> str:
+        chunk, self.reply = self.reply[:byte_size], self.reply[byte_size:]
+        return chunk
+
+
+def _timeit(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"first": times[0], "min": min(times), "median": statistics.median(times)}
+
+
+def _run_case(func: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    try:
+        return func()
+    except Exception as err:  # noqa: BLE001
+        return {"error": f"{type(err).__name__}: {err}"}
+
+
+# ---- import ----
+def bench_import(repeat: int) -> dict[str, dict[str, Any]]:
+    """Measure import time of each submodule in a fresh interpreter."""
+    code = (
+        "import sys, time; sys.argv = ['bench'];"
+        "t = time.perf_counter(); import {}; print(time.perf_counter() - t)"
+    )
+    results: dict[str, dict[str, Any]] = {}
+    for module in MODULES:
+        times: list[float] = []
+        error = ""
+        for _ in range(repeat):
+            proc = subprocess.run(
+                [sys.executable, "-c", code.format(module)],
+                capture_output=True,
+                text=True,
+                cwd=ROOT,
+                timeout=60,
+                check=False,
+            )
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1]
+                break
+            times.append(float(proc.stdout.strip().splitlines()[-1]))
+        if error:
+            results[module] = {"error": error}
+        else:
+            results[module] = {"min": min(times), "median": statistics.median(times)}
+    return results
+
+
+# ---- first command ----
+def _first_sc104() -> None:
+    from spd_controller.sigma.sc104 import SC104
+
+    stage = SC104.__new__(SC104)
+    super(SC104, stage).__init__(term="\r\n")
+    stage.comm = SimulatedSerial(lambda _: b"12345\r\n")
+    stage.position()
+
+
+def _first_gsc02() -> None:
+    from spd_controller.sigma.gsc02 import GSC02
+
+    stage = GSC02.__new__(GSC02)
+    super(GSC02, stage).__init__(term="\r\n")
+    stage.comm = SimulatedSerial(lambda _: b"1000,0,K,K,R\r\n")
+    stage.angle()
+
+
+def _first_omec4bf() -> None:
+    from spd_controller.sigma.omec4bf import OMEC4BF
+
+    stage = OMEC4BF.__new__(OMEC4BF)
+    super(OMEC4BF, stage).__init__(term="\r\n")
+    stage.comm = SimulatedSerial(lambda _: b"100,200,N,N,N,NN\r\n")
+    stage.position(1, "x")
+
+
+def _first_gds3502() -> None:
+    from spd_controller.texio.gds3502 import GDS3502
+
+    scope = GDS3502.__new__(GDS3502)
+    super(GDS3502, scope).__init__(term="\n")
+    scope.header_dict = {}
+    scope.comm = SimulatedSerial(lambda _: b"1.000000E+03\n")
+    _ = scope.triger_frequency
+
+
+def _first_k10cr1() -> None:
+    from spd_controller.thorlabs.k10cr1 import K10CR1
+
+    stage = K10CR1.__new__(K10CR1)
+    stage.serial_num = "55000000"
+    stage.ready = True
+    stage.ser = SimulatedSerial(
+        lambda _: bytes.fromhex("120406008150" + "0100" + "00e01000"),
+    )
+    stage.getpos()
+
+
+def _first_remote_in() -> None:
+    from spd_controller.Specs.Prodigy import RemoteIn
+
+    remote = RemoteIn()
+    remote.sock = SimulatedSocket(1)  # type: ignore[assignment]
+    remote.sendcommand("Connect")
+
+
+FIRST_COMMAND: dict[str, Callable[[], None]] = {
+    "SC104": _first_sc104,
+    "GSC02": _first_gsc02,
+    "OMEC4BF": _first_omec4bf,
+    "GDS3502": _first_gds3502,
+    "K10CR1": _first_k10cr1,
+    "RemoteIn": _first_remote_in,
+}
+
+
+def bench_first_command(repeat: int) -> dict[str, dict[str, Any]]:
+    """Measure the construction and the first query of each driver."""
+    return {
+        name: _run_case(lambda func=func: _timeit(func, repeat))
+        for name, func in FIRST_COMMAND.items()
+    }
+
+
+# ---- per point ----
+def _per_point(func: Callable[[], None], n_points: int, repeat: int) -> dict[str, Any]:
+    result: dict[str, Any] = _timeit(func, repeat)
+    result["n_points"] = n_points
+    result["per_point"] = result["min"] / n_points
+    return result
+
+
+def bench_remote_in_scan(repeat: int, n_points: int = 20000) -> dict[str, Any]:
+    """Per-point overhead of ``RemoteIn.scan`` (2 scans summed)."""
+    from spd_controller.Specs.Prodigy import RemoteIn
+
+    remote = RemoteIn()
+    remote.sock = SimulatedSocket(n_points)  # type: ignore[assignment]
+    remote.param = {"Samples": 1, "DwellTime": 0.0}
+    return _per_point(lambda: remote.scan(num_scan=2), 2 * n_points, repeat)
+
+
+def qmass_stream(n_points: int) -> bytes:
+    """Analog-mode byte stream of the Microvision plus: 3 bytes per point + end."""
+    points = bytearray()
+    for i in range(n_points):
+        points += bytes((0, i % 64, 64 + (i * 7) % 64))
+    return bytes(points + b"\x00\x00\xf4")
+
+
+def bench_qmass_single_scan(repeat: int, n_points: int = 8192) -> dict[str, Any]:
+    """Per-point overhead of ``Qmass.single_scan`` (analog mode)."""
+    from spd_controller.qmass.qmass import Qmass
+
+    stream = qmass_stream(n_points)
+    q_mass = Qmass.__new__(Qmass)
+    q_mass.mode = 0
+    q_mass.pressure_range = 4
+    q_mass.accuracy = 5
+    q_mass.start_mass = 4
+    q_mass.mass_span = 2
+    q_mass.f_save = None
+    q_mass.filament = None
+    q_mass.multiplier = True
+    q_mass.is_scanning = False
+    q_mass.com = SimulatedSerial(lambda cmd: stream if cmd == b"\xb6" else b"")
+    return _per_point(q_mass.single_scan, n_points, repeat)
+
+
+def gds3502_memory(n_points: int = 25000) -> bytes:
+    """Response of ``:ACQuire1:MEMory?`` with a ramp waveform."""
+    import numpy as np
+
+    header = (
+        "Format,1.0B;Memory Length,{};IntpDistance,0;Trigger Address,0;"
+        "Trigger Level,0.000E+00;Source,CH1;Vertical Units,V;"
+        "Vertical Units Div,0;Vertical Units Extend Div,16;Label,;"
+        "Probe Type,0;Probe Ratio,1.000e+00;Vertical Scale,2.000e-02;"
+        "Vertical Position,0.000e+00;Horizontal Units,S;Horizontal Scale,1.000E-08;"
+        "Horizontal Position,0.000E+00;Horizontal Mode,Main;SincET Mode,Real Time;"
+        "Sampling Period,2.000e-10;Horizontal Old Scale,1.000E-08;"
+        "Horizontal Old Position,0.000E+00;Firmware,V1.00;Mode,Fast;"
+    ).format(n_points)
+    samples = (np.arange(n_points) % 200 - 100).astype(">i2").tobytes()
+    length = str(len(samples))
+    return (
+        header.encode() + f"#{len(length)}{length}".encode() + samples + b"\n"
+    )
+
+
+def bench_gds3502_acquire_memory(repeat: int, n_points: int = 25000) -> dict[str, Any]:
+    """Per-point overhead of ``GDS3502.acquire_memory``."""
+    from spd_controller.texio.gds3502 import GDS3502
+
+    memory = gds3502_memory(n_points)
+    scope = GDS3502.__new__(GDS3502)
+    super(GDS3502, scope).__init__(term="\n")
+    scope.header_dict = {}
+    scope.comm = SimulatedSerial(
+        lambda cmd: memory if b"MEMory?" in cmd else b"",
+    )
+    return _per_point(lambda: scope.acquire_memory(1), n_points, repeat)
+
+
+def bench_qmass_acquisition(repeat: int, n_scans: int = 200) -> dict[str, Any]:
+    """Per-point cost of ``QmassAcquisition`` at full rate (pty simulator).
+
+    Digital mode scans of 50 points are read through a pseudo terminal, decoded
+    and delivered to a subscriber as fast as the simulator can send them.
+    """
+    import threading
+
+    from spd_controller.qmass.acquisition import QmassAcquisition
+    from spd_controller.qmass.qmass import Qmass
+    from spd_controller.qmass.simulator import MicrovisionSimulator
+
+    with MicrovisionSimulator(baudrate=None, seed=0) as device:
+        q_mass = Qmass(port=device.port, mode=1, init=1, span=2, p_range=4)
+        q_mass.boot()
+        q_mass.fil_on(1)
+        q_mass.multiplier_on()
+        q_mass.set_mode()
+
+        times = []
+        for _ in range(repeat):
+            done = threading.Event()
+            acquisition = QmassAcquisition(q_mass)
+            acquisition.subscribe(
+                lambda _, acq=acquisition, ev=done: acq.n_scans >= n_scans and ev.set(),
+            )
+            start = time.perf_counter()
+            acquisition.start()
+            done.wait(60)
+            times.append(time.perf_counter() - start)
+            acquisition.stop()  # not timed (terminate_scan waits 1 s)
+        q_mass.exit()
+    return {
+        "first": times[0],
+        "min": min(times),
+        "median": statistics.median(times),
+        "n_points": n_scans * 50,
+        "per_point": min(times) / (n_scans * 50),
+    }
+
+
+PER_POINT: dict[str, Callable[[int], dict[str, Any]]] = {
+    "RemoteIn.scan": bench_remote_in_scan,
+    "Qmass.single_scan": bench_qmass_single_scan,
+    "QmassAcquisition (simulator)": bench_qmass_acquisition,
+    "GDS3502.acquire_memory": bench_gds3502_acquire_memory,
+}
+
+
+def bench_per_point(repeat: int) -> dict[str, dict[str, Any]]:
+    """Measure the per-point overhead of the acquisition loops."""
+    return {
+        name: _run_case(lambda func=func: func(repeat))
+        for name, func in PER_POINT.items()
+    }
+
+
+GROUPS: dict[str, Callable[[int], dict[str, dict[str, Any]]]] = {
+    "import": bench_import,
+    "first_command": bench_first_command,
+    "per_point": bench_per_point,
+}
+
+
+def git_revision() -> str:
+    """Return the current commit hash (empty string if unavailable)."""
+    proc = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=False,
+    )
+    return proc.stdout.strip()
+
+
+def append_history(entry: dict[str, Any], history: Path = HISTORY) -> None:
+    """Append the entry to the JSON history file."""
+    records: list[dict[str, Any]] = []
+    if history.exists():
+        records = json.loads(history.read_text())
+    records.append(entry)
+    history.write_text(json.dumps(records, indent=1))
+
+
+def main(argv: list[str] | None = None) -> dict[str, Any]:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--group",
+        choices=tuple(GROUPS),
+        action="append",
+        help="benchmark group to run (default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="repeat (default: 5)")
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=HISTORY,
+        help=f"JSON history file (default: {HISTORY.name})",
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        default=False,
+        help="if set, the result is not appended to the history",
+    )
+    args = parser.parse_args(argv)
+    sys.path.insert(0, str(ROOT))
+    logging.disable(logging.DEBUG)
+    entry: dict[str, Any] = {
+        "date": datetime.datetime.now(tz=datetime.UTC).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    for group in args.group or GROUPS:
+        entry[group] = GROUPS[group](args.repeat)
+    if not args.no_record:
+        append_history(entry, args.history)
+    print(json.dumps(entry, indent=1))
+    return entry
+
+
+if __name__ == "__main__":
+    main()
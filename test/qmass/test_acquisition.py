@@ -0,0 +1,134 @@
+"""Unit test for qmass.acquisition."""
+
+import threading
+import time
+
+import numpy as np
+
+import spd_controller.qmass.acquisition as acquisition
+from spd_controller.qmass.qmass import SCAN_START, Qmass
+
+
+class StreamingCom:
+    """Serial port which sends a scan stream for each scan start command."""
+
+    def __init__(self, stream: bytes):
+        self.stream = stream
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.timeout = None
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        with self.cond:
+            return len(self.rx)
+
+    def write(self, data):
+        with self.cond:
+            self.written.append(data)
+            if data == SCAN_START:
+                self.rx.extend(self.stream)
+                self.cond.notify_all()
+
+    def read(self, size=1):
+        with self.cond:
+            self.cond.wait_for(lambda: self.rx, self.timeout)
+            chunk = bytes(self.rx[:size])
+            del self.rx[:size]
+            return chunk
+
+    def reset_input_buffer(self):
+        with self.cond:
+            self.rx.clear()
+
+
+def make_qmass(com, mode=0):
+    q_mass = Qmass.__new__(Qmass)
+    q_mass.mode = mode
+    q_mass.pressure_range = 4
+    q_mass.accuracy = 5
+    q_mass.start_mass = 4
+    q_mass.mass_span = 2
+    q_mass.is_scanning = False
+    q_mass.com = com
+    q_mass.terminate_scan = lambda: None
+    return q_mass
+
+
+def test_ring_buffer_overflow():
+    ring = acquisition.RingBuffer(8)
+    ring.write(b"abcdef")
+    assert ring.read() == b"abcdef"
+    ring.write(b"0123456789")
+    assert ring.overflow == 2
+    assert ring.read() == b"23456789"
+    assert ring.read(timeout=0) == b""
+    assert ring.gap == 2
+    ring.write(b"ab")
+    assert ring.read() == b"ab"
+    assert ring.gap == 0
+
+
+def test_acquisition_publishes_scans():
+    stream = bytes([0, 1, 64] * 256 + [0, 0, 0xF4])
+    q_mass = make_qmass(StreamingCom(stream))
+    engine = acquisition.QmassAcquisition(q_mass, ring_size=4096)
+    fast, slow = [], []
+    engine.subscribe(fast.append)
+    release = threading.Event()
+    slow_subscriber = engine.subscribe(
+        lambda scan: (release.wait(), slow.append(scan)), maxsize=1
+    )
+    engine.start()
+    deadline = time.monotonic() + 5
+    while len(fast) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    engine.stop()
+    assert len(fast) >= 5
+    assert slow_subscriber.dropped > 0
+    scan = fast[0]
+    assert scan.mass.shape == scan.pressure.shape == (256,)
+    assert acquisition.format_scan(scan)[0].startswith("3.625\t")
+    assert q_mass.com.timeout is None
+
+
+def test_resync_after_overflow():
+    q_mass = make_qmass(StreamingCom(b""), mode=1)
+    engine = acquisition.QmassAcquisition(q_mass, ring_size=1024)
+    scans = []
+    engine.subscribe(scans.append)
+    engine.start()
+    try:
+        engine.ring.write(bytes([0, 1, 64] * 33) + b"\x00")  # the scan begins
+        deadline = time.monotonic() + 5
+        while len(engine.ring) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # the rest of the scan overflows, the next scan follows the marker
+        scan = bytes([0, 2, 64] * 256 + [0, 0, 0xF4])
+        engine.ring.write(bytes([1, 64, 0] * 400) + bytes([0, 0, 0xF4]) + scan)
+        while engine.n_scans < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        engine.stop()
+    assert engine.ring.overflow > 0
+    assert engine.n_scans == 1
+    np.testing.assert_allclose(scans[0].pressure, scans[0].pressure[0])
+    assert scans[0].pressure.size == 256
+    assert q_mass.com.written.count(SCAN_START) == 3  # first, resync, next
+
+
+def test_leak_check_scan_times():
+    scan = acquisition.Scan(
+        timestamp_ns=0,
+        duration_ns=1280,
+        mode=2,
+        pressure_range=4,
+        mass=np.full(128, 28.0),
+        pressure=np.zeros(128),
+    )
+    times = scan.times_ns()
+    assert times[0] == 10
+    assert times[-1] == 1280
+    assert len(acquisition.format_scan(scan)) == 128
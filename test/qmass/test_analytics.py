@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from spd_controller.qmass.acquisition import Scan
+from spd_controller.qmass.analytics import SpectrumStatistics
+
+
+def analog_scan(heights, timestamp_ns=0):
+    mass = 1 + np.arange(512) / 8
+    pressure = np.full(mass.size, 1e-12)
+    for peak, height in heights.items():
+        pressure += height * np.exp(-0.5 * ((mass - peak) / 0.15) ** 2)
+    return Scan(timestamp_ns, 10**9, 0, 4, mass, pressure)
+
+
+def test_statistics():
+    statistics = SpectrumStatistics(alpha=0.5)
+    values = [1e-9, 2e-9, 3e-9]
+    for i, h2o in enumerate(values):
+        statistics(analog_scan({2: 5e-10, 18: h2o}, timestamp_ns=i * 10**9))
+    summary = statistics.summary()
+    # mean: 1 -> 1.5 -> 2.25, variance: 0 -> 0.25 -> 0.6875 (x 1e-18)
+    assert summary["H2O"]["mean"] == pytest.approx(2.25e-9, rel=1e-3)
+    assert summary["H2O"]["std"] == pytest.approx(np.sqrt(0.6875) * 1e-9, rel=1e-3)
+    assert summary["H2O"]["max"] == pytest.approx(3e-9, rel=1e-3)
+    assert summary["H2"]["count"] == 3
+    assert statistics.trend("H2O") == pytest.approx(1e-9, rel=1e-3)
+    # no CO2 peak -> the background
+    assert summary["CO2"]["mean"] == pytest.approx(1e-12)
+
+
+def test_history_is_fixed_size():
+    statistics = SpectrumStatistics(masses={"H2": 2}, history=8)
+    for i in range(20):
+        statistics(analog_scan({2: (i + 1) * 1e-10}, timestamp_ns=i * 10**9))
+    times, peaks = statistics.history("H2")
+    assert times.size == 8
+    np.testing.assert_array_equal(times, np.arange(12, 20) * 10**9)
+    assert peaks.size == 8
+    assert peaks[-1] == pytest.approx(20e-10, rel=1e-3)
+    assert statistics.trend("H2", span=3) == pytest.approx(1e-10, rel=1e-3)
+
+
+def test_alarm():
+    statistics = SpectrumStatistics(masses={"H2O": 18})
+    fired = []
+    statistics.add_alarm("H2O", 1e-9, callback=lambda alarm, value: fired.append(value))
+    for h2o in (5e-10, 2e-9, 3e-9, 5e-10, 2e-9):
+        statistics(analog_scan({18: h2o}))
+    assert fired == pytest.approx([2e-9, 2e-9], rel=1e-3)
+    with pytest.raises(ValueError, match="not monitored"):
+        statistics.add_alarm("Ar", 1e-9)
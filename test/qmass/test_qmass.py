@@ -0,0 +1,189 @@
+"""Unit test for qmass."""
+
+import numpy as np
+import pytest
+
+import spd_controller.qmass.qmass as qmass
+
+
+class DummyCom:
+    """Serial port which returns the scan stream in chunks."""
+
+    def __init__(self, stream: bytes, chunk: int = 100):
+        self.chunks = [stream[i : i + chunk] for i in range(0, len(stream), chunk)]
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size):
+        return self.chunks.pop(0)
+
+    def write(self, data):
+        self.written.append(data)
+
+
+def make_qmass(mode=0, p_range=4, com=None):
+    q_mass = qmass.Qmass.__new__(qmass.Qmass)
+    q_mass.mode = mode
+    q_mass.pressure_range = p_range
+    q_mass.accuracy = 5
+    q_mass.start_mass = 4
+    q_mass.mass_span = 2
+    q_mass.f_save = None
+    q_mass.filament = None
+    q_mass.multiplier = False
+    q_mass.is_scanning = False
+    q_mass.com = com
+    return q_mass
+
+
+def make_stream(n_points, marker=0xF4):
+    rng = np.random.default_rng(0)
+    points = rng.integers(0, 64, size=(n_points, 3), dtype=np.uint8)
+    points[:, 2] += 64
+    return points.tobytes() + bytes((0, 0, marker))
+
+
+def test_find_marker():
+    stream = make_stream(10)
+    assert qmass.find_marker(stream) == (10, 0xF4)
+    assert qmass.find_marker(stream, offset=5) == (10, 0xF4)
+    # 途中まで (マーカー未着、端数バイトは無視)
+    assert qmass.find_marker(stream[:20]) == (6, -1)
+    assert qmass.find_marker(make_stream(3, marker=0xF2)) == (3, 0xF2)
+
+
+@pytest.mark.parametrize("p_range", range(7))
+def test_to_mbar_exhaustive(p_range):
+    # 全コード (byte0: 0-63 と 0x7F, byte1: 0-63, byte2: 0-127) で scalar 版と一致
+    q_mass = make_qmass(p_range=p_range)
+    b0, b1, b2 = np.meshgrid(
+        np.r_[np.arange(64), 0x7F], np.arange(64), np.arange(128), indexing="ij"
+    )
+    points = np.stack([b0.ravel(), b1.ravel(), b2.ravel()], axis=1).astype(np.uint8)
+    expected = np.array([q_mass.convert_mbar(p) for p in points.tolist()])
+    np.testing.assert_allclose(qmass.to_mbar(points, p_range), expected, rtol=1e-12)
+
+
+def test_convert_stream_mixed_range():
+    stream = make_stream(10)[:-3] + b"\x01"  # 端数バイトは無視
+    ranges = np.array([0] * 5 + [4] * 5)
+    pressure = qmass.convert_stream(stream, ranges)
+    assert pressure.shape == (10,)
+    np.testing.assert_allclose(pressure[:5], qmass.convert_stream(stream[:15], 0))
+    np.testing.assert_allclose(pressure[5:], qmass.convert_stream(stream[15:30], 4))
+    with pytest.raises(ValueError):
+        qmass.to_mbar(np.zeros((1, 3), dtype=np.uint8), 7)
+
+
+def test_single_scan_analog():
+    stream = make_stream(256)
+    q_mass = make_qmass(com=DummyCom(stream))
+    data = q_mass.single_scan()
+    assert q_mass.com.written == [qmass.SCAN_START]
+    assert len(data) == 256
+    assert q_mass.mass.shape == q_mass.pressure.shape == (256,)
+    np.testing.assert_allclose(np.diff(q_mass.mass), 32 / 256)
+    first = q_mass.convert_mbar(list(stream[:3]))
+    assert data[0] == "{:5.3f}\t{:.5e}\n".format(q_mass.mass[0], first)
+
+
+def test_single_scan_fails():
+    q_mass = make_qmass(com=DummyCom(make_stream(10, marker=0xF0)))
+    assert q_mass.single_scan() == []
+
+
+def test_single_scan_leak_check(capsys):
+    stream = make_stream(300)[:-3]
+    q_mass = make_qmass(mode=2, com=DummyCom(stream, chunk=90))
+    data = q_mass.single_scan()
+    assert len(data) == qmass.LEAK_CHECK_POINTS
+    assert np.all(q_mass.mass == 4)
+    assert "Pressure:" in capsys.readouterr().out
+
+
+class ScriptedCom:
+    """Serial port which answers the boot sequence."""
+
+    def __init__(self, replies, drop=()):
+        self.replies = replies
+        self.drop = list(drop)  # 最初の一回は応答しないコマンド
+        self.rx = bytearray()
+        self.timeout = None
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def write(self, data):
+        self.written.append(data)
+        if data in self.drop:
+            self.drop.remove(data)
+            return
+        self.rx.extend(self.replies.get(data, b""))
+
+    def read(self, size=1):
+        chunk = bytes(self.rx[:size])
+        del self.rx[:size]
+        return chunk
+
+    def read_until(self, expected):
+        index = self.rx.find(expected)
+        return self.read(len(self.rx) if index < 0 else index + 1)
+
+    def reset_input_buffer(self):
+        self.rx.clear()
+
+
+def boot_replies():
+    replies = {}
+    for step in qmass.BOOT_SEQUENCE:
+        if not step.reply:
+            continue
+        reply = step.expected + b"\x01" * max(step.length - len(step.expected), 1)
+        replies[step.command] = reply[: step.length or None] + step.terminator
+    return replies
+
+
+def test_boot(monkeypatch):
+    monkeypatch.setattr(qmass, "IDLE_GAP", 0)
+    sleeps = []
+    monkeypatch.setattr(qmass.time, "sleep", sleeps.append)
+    a6 = bytes.fromhex("a6")
+    com = ScriptedCom(boot_replies(), drop=[a6])
+    q_mass = make_qmass(com=com)
+    q_mass.boot()
+    # a6 は応答がなかったので再送
+    assert com.written.count(a6) == 2
+    assert com.written[-1] == bytes.fromhex("e6 80 00")
+    assert com.timeout is None
+    # ba 03 の後と最後は待つ
+    assert [t for t in sleeps if t] == [1.5, 1.0]
+
+
+def test_boot_fails():
+    replies = boot_replies()
+    replies[bytes.fromhex("a7")] = b""
+    q_mass = make_qmass(com=ScriptedCom(replies))
+    with pytest.raises(RuntimeError, match="a7"):
+        q_mass.boot()
+
+
+def test_monitor_masses():
+    point = bytes((1, 0, 64))  # 4096 * 1e-11 / 16
+    com = ScriptedCom({qmass.SCAN_START: point * 2, qmass.SCAN_STOP: point})
+    q_mass = make_qmass(mode=0, com=com)
+    channels = [qmass.MassChannel(2, accuracy=3, points=2), 28]
+    scans = list(q_mass.monitor_masses(channels, cycles=2))
+    assert len(scans) == 2
+    for scan in scans:
+        assert scan.mode == qmass.MULTIPLE_ION_MODE
+        np.testing.assert_array_equal(scan.mass, [2, 28])
+        np.testing.assert_allclose(scan.pressure, q_mass.convert_mbar(point))
+    assert com.written.count(qmass.SCAN_STOP) == 4
+    # 設定は元に戻る
+    assert (q_mass.mode, q_mass.start_mass, q_mass.accuracy) == (0, 4, 5)
+    assert com.timeout is None
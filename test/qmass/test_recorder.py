@@ -0,0 +1,113 @@
+"""Unit test for qmass.recorder."""
+
+import numpy as np
+import pytest
+
+from spd_controller.qmass.acquisition import Scan
+from spd_controller.qmass.recorder import QmassLog, QmassRecorder, index_path
+
+
+def make_scan(i, mode=0, n_points=256):
+    return Scan(
+        timestamp_ns=1_700_000_000_000_000_000 + i * 10**9,
+        duration_ns=5 * 10**8,
+        mode=mode,
+        pressure_range=4,
+        mass=np.linspace(3.625, 35.5, n_points),
+        pressure=np.full(n_points, (i + 1) * 1e-10),
+    )
+
+
+@pytest.fixture
+def settings():
+    return {"mode": 0, "pressure_range": 4, "accuracy": 5, "start_mass": 4}
+
+
+def test_round_trip(tmp_path, settings):
+    path = tmp_path / "rga.qmb"
+    with QmassRecorder(path, metadata=settings) as recorder:
+        for i in range(3):
+            recorder.append(make_scan(i))
+    # 追記
+    with QmassRecorder(path) as recorder:
+        recorder.append(make_scan(3))
+    log = QmassLog(path)
+    assert len(log) == 4
+    assert log.metadata["accuracy"] == 5
+    scan = log[3]
+    assert scan.timestamp_ns == make_scan(3).timestamp_ns
+    np.testing.assert_allclose(scan.pressure, 4e-10, rtol=1e-6)
+    np.testing.assert_allclose(scan.mass, make_scan(3).mass, rtol=1e-6)
+
+
+def test_index_rebuilt_after_crash(tmp_path, settings):
+    path = tmp_path / "rga.qmb"
+    with QmassRecorder(path, metadata=settings) as recorder:
+        for i in range(3):
+            recorder.append(make_scan(i))
+    index_path(path).unlink()
+    with path.open("ab") as f:
+        f.write(b"\x00" * 30)  # 書きかけのレコード
+    assert len(QmassLog(path)) == 3
+    assert index_path(path).stat().st_size == 3 * 8
+
+
+def test_append_after_truncated_record(tmp_path, settings):
+    path = tmp_path / "rga.qmb"
+    with QmassRecorder(path, metadata=settings) as recorder:
+        for i in range(3):
+            recorder.append(make_scan(i))
+    size = path.stat().st_size
+    with path.open("r+b") as f:
+        f.truncate(size - 100)  # the last record is cut off
+    with QmassRecorder(path) as recorder:
+        for i in range(3, 5):
+            recorder.append(make_scan(i))
+    assert index_path(path).stat().st_size == 4 * 8
+    index_path(path).unlink()  # rebuilt from the data file
+    log = QmassLog(path)
+    assert len(log) == 4
+    for scan, i in zip(log, [0, 1, 3, 4], strict=True):
+        assert scan.timestamp_ns == make_scan(i).timestamp_ns
+        np.testing.assert_allclose(scan.pressure, (i + 1) * 1e-10, rtol=1e-6)
+
+
+def test_cut_in_record_header(tmp_path, settings):
+    path = tmp_path / "rga.qmb"
+    with QmassRecorder(path, metadata=settings) as recorder:
+        for i in range(2):
+            recorder.append(make_scan(i))
+    last = int(np.fromfile(index_path(path), dtype="<i8")[-1])
+    with path.open("r+b") as f:
+        f.truncate(last + 4)  # the index still lists the cut record
+    log = QmassLog(path)
+    assert len(log) == 1
+    assert log.end == last
+
+
+def test_export(tmp_path, settings):
+    path = tmp_path / "rga.qmb"
+    with QmassRecorder(path, metadata=settings) as recorder:
+        for i in range(2):
+            recorder.append(make_scan(i))
+    log = QmassLog(path)
+    log.export_text(tmp_path / "rga.txt")
+    lines = (tmp_path / "rga.txt").read_text().splitlines()
+    assert lines[0].startswith("#Analog_mode. Date:")
+    assert lines[1] == "3.625\t1.00000e-10"
+    assert len(lines) == 1 + 2 * 257
+    log.export_itx(tmp_path / "rga.itx")
+    itx = (tmp_path / "rga.itx").read_text()
+    assert itx.startswith("IGOR")
+    assert "WAVES/S/N=(2,256) 'qmass_pressure'" in itx
+    assert path.stat().st_size < (tmp_path / "rga.txt").stat().st_size / 2
+
+
+def test_export_leak_check(tmp_path):
+    path = tmp_path / "leak.qmb"
+    with QmassRecorder(path, metadata={"mode": 2, "start_mass": 4}) as recorder:
+        recorder.append(make_scan(0, mode=2, n_points=128))
+    QmassLog(path).export_itx(tmp_path / "leak.itx")
+    lines = (tmp_path / "leak.itx").read_text().splitlines()
+    assert lines[2] == "WAVES/D 'qmass_time', 'qmass_pressure'"
+    assert len(lines) == 3 + 1 + 128 + 1
@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+import pytest
+
+from spd_controller.qmass import qmass
+from spd_controller.qmass.acquisition import QmassAcquisition
+
+simulator = pytest.importorskip("spd_controller.qmass.simulator")
+
+
+@pytest.fixture
+def device():
+    with simulator.MicrovisionSimulator(baudrate=None, seed=0) as device:
+        yield device
+
+
+def booted(device, **kwargs):
+    q_mass = qmass.Qmass(port=device.port, **kwargs)
+    q_mass.boot()
+    q_mass.fil_on(1)
+    q_mass.multiplier_on()
+    return q_mass
+
+
+def test_command_length():
+    assert simulator.command_length(b"$$") == 1
+    assert simulator.command_length(b"{000D,10:1FB") == 0
+    assert simulator.command_length(b"{000D,10:1FB6\xa6") == 13
+    assert simulator.command_length(bytes.fromhex("00 e4 00 00 02 04 02 04")) == 0
+    assert simulator.command_length(bytes.fromhex("20 02 00 b6")) == 3
+    assert simulator.command_length(bytes.fromhex("20 02 04 00")) == 4
+
+
+def test_encode_pressure():
+    for pressure_range in range(7):
+        unit = qmass.PRESSURE_UNIT[pressure_range]
+        pressure = np.arange(0, 64**3, 97) * unit
+        points = simulator.encode_pressure(pressure, pressure_range)
+        assert not np.isin(points, simulator.FLOW_CONTROL).any()
+        decoded = qmass.to_mbar(points, pressure_range)
+        np.testing.assert_allclose(decoded, pressure, atol=2048 * unit)
+
+
+def test_boot_and_digital_scan(device):
+    device.spectrum = {18: 1e-9, 28: 5e-10}
+    device.noise = device.count_noise = 0.0
+    device.background = 0.0
+    q_mass = booted(device, mode=1, init=1, span=2, p_range=4)
+    received = b"".join(device.received)
+    assert all(step.command in received for step in qmass.BOOT_SEQUENCE)
+    q_mass.set_mode()
+    assert q_mass.single_scan()
+    np.testing.assert_array_equal(q_mass.mass, np.arange(1, 51))
+    expected = np.zeros(50)
+    expected[[17, 27]] = [1e-9, 5e-10]
+    np.testing.assert_allclose(q_mass.pressure, expected, rtol=1e-3, atol=1e-13)
+    q_mass.exit()
+
+
+def test_analog_scan(device):
+    q_mass = booted(device, mode=0, init=16, span=2, p_range=4)
+    q_mass.set_mode()
+    assert q_mass.single_scan()
+    assert (device.mode, device.start_mass, device.pressure_range) == (0, 16, 4)
+    assert q_mass.mass.size == 256
+    assert q_mass.mass[np.argmax(q_mass.pressure)] == pytest.approx(18, abs=0.2)
+    q_mass.exit()
+
+
+def test_acquisition_leak_check(device):
+    q_mass = booted(device, mode=2, init=28, p_range=4)
+    q_mass.set_mode()
+    scans = []
+    acquisition = QmassAcquisition(q_mass)
+    acquisition.subscribe(scans.append)
+    acquisition.start()
+    deadline = time.monotonic() + 5
+    while len(scans) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    acquisition.stop()
+    assert len(scans) >= 4
+    pressure = np.concatenate([scan.pressure for scan in scans])
+    assert pressure.mean() == pytest.approx(6e-10, rel=0.05)
+    q_mass.exit()
+
+
+def test_failure_marker(device):
+    device.failure_rate = 1.0
+    q_mass = booted(device, mode=1, init=1, span=0, p_range=4)
+    q_mass.set_mode()
+    assert q_mass.single_scan() == []
+    q_mass.exit()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from spd_controller.qmass.acquisition import Scan
+
+webqmass = pytest.importorskip("spd_controller.qmass.webqmass")
+
+
+def test_downsampled_trace():
+    trace = webqmass.DownsampledTrace(capacity=64)
+    rng = np.random.default_rng(0)
+    pressure = rng.normal(1e-9, 1e-11, size=100000)
+    pressure[54321] = 5e-9  # leak
+    pressure[7] = 1e-12
+    times = np.arange(pressure.size) * 0.01
+    for start in range(0, pressure.size, 128):
+        trace.extend(times[start : start + 128], pressure[start : start + 128])
+    assert trace.size <= 64
+    assert trace.generation == np.log2(trace.width)
+    t, p = trace.points()
+    assert p.max() == 5e-9
+    assert t[p.argmax()] == times[54321]
+    assert p.min() == 1e-12
+    assert np.all(np.diff(t) >= 0)
+    assert trace.n_points == pressure.size
+
+
+def make_scan(mode, n_points, timestamp_ns=0):
+    return Scan(
+        timestamp_ns=timestamp_ns,
+        duration_ns=n_points * 10**7,
+        mode=mode,
+        pressure_range=4,
+        mass=np.arange(n_points, dtype=np.float64),
+        pressure=np.full(n_points, 1e-9),
+    )
+
+
+def test_graph_update_spectrum():
+    worker = webqmass.AcquisitionWorker()
+    assert worker.graph_update(None)[2] is webqmass.no_update
+    worker.add_scan(make_scan(1, 50))
+    figure, extend, cursor, _ = worker.graph_update(None)
+    assert len(figure["data"][0]["x"]) == 50
+    assert extend is webqmass.no_update
+    # nothing new
+    assert worker.graph_update(cursor)[2] is webqmass.no_update
+    # only the pressures of the next scan
+    worker.add_scan(make_scan(1, 50))
+    figure, _, cursor, title = worker.graph_update(cursor)
+    assert isinstance(figure, webqmass.Patch)
+    assert title.endswith("1.00e-09 mbar")
+    # a scan without points (cut short by a failure marker)
+    worker.add_scan(make_scan(1, 0))
+    figure, _, cursor, title = worker.graph_update(cursor)
+    assert title is webqmass.no_update
+
+
+def test_graph_update_leak_check():
+    worker = webqmass.AcquisitionWorker(trace_capacity=8)
+    worker.add_scan(make_scan(2, 4))
+    figure, _, cursor, _ = worker.graph_update(None)
+    assert len(figure["data"][0]["y"]) == 4
+    worker.add_scan(make_scan(2, 3, timestamp_ns=10**9))
+    figure, extend, cursor, _ = worker.graph_update(cursor)
+    assert figure is webqmass.no_update
+    assert len(extend[0]["y"][0]) == 3
+    assert extend[2] == 16
+    # downsampled: the whole (merged) trace is sent again
+    worker.add_scan(make_scan(2, 4, timestamp_ns=2 * 10**9))
+    figure, extend, cursor, _ = worker.graph_update(cursor)
+    assert extend is webqmass.no_update
+    assert cursor["generation"] == 1
+    assert len(figure["data"][0]["y"]) == 2 * worker.trace.size
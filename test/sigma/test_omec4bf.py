@@ -0,0 +1,78 @@
+import pytest
+
+from spd_controller.sigma import omec4bf
+
+
+class OMECComm:
+    """Port of OMEC-4BF (each move is reported busy once)."""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.busy = 0
+        self.y_travel = 0
+        self.rx = []
+        self.written = []
+
+    def write(self, data):
+        command = data.decode().strip()
+        self.written.append(command)
+        if command[1] == "A":
+            axis, position = command[2], command[4:]
+            if axis == "3":
+                x, y = (int(p) for p in position.split(","))
+            else:
+                x = int(position) if axis == "1" else self.x
+                y = int(position) if axis == "2" else self.y
+            self.y_travel += abs(y - self.y)
+            self.x, self.y, self.busy = x, y, 1
+        elif command[1] == "Q":
+            ready = "B" if self.busy else "N"
+            self.busy = 0
+            self.rx.append(f"{self.x},{self.y},N,N,{ready},NN\r\n")
+
+    def readline(self):
+        return self.rx.pop(0).encode()
+
+
+def make_omec():
+    omec = omec4bf.OMEC4BF.__new__(omec4bf.OMEC4BF)
+    omec4bf.Comm.__init__(omec, term="\r\n")
+    omec.comm = OMECComm()
+    return omec
+
+
+def edge(x):
+    return 50 + x // 10  # knife edge (blocked above)
+
+
+def raster(serpentine):
+    omec = make_omec()
+    points = []
+    lines = omec.raster_scan(
+        range(0, 50, 10),
+        range(0, 100, 2),
+        measure=lambda: 1.0 if omec.comm.y < edge(omec.comm.x) else 0.0,
+        stop=lambda value: value < 0.5,
+        serpentine=serpentine,
+        margin=1,
+        on_point=lambda x, y, value: points.append((x, y, value)),
+    )
+    return omec, lines, points
+
+
+@pytest.mark.parametrize("serpentine", [True, False])
+def test_raster_scan(serpentine):
+    omec, lines, points = raster(serpentine)
+    assert [line.x for line in lines] == [0, 10, 20, 30, 40]
+    for line in lines:
+        assert line.y == list(range(0, edge(line.x), 2))
+        assert line.values == [1.0] * len(line.y)
+    assert [line.reverse for line in lines] == [False, serpentine] * 2 + [False]
+    assert len(points) == len(omec.comm.written) - omec.comm.written.count("1Q")
+    assert ("1A3:10,52" in omec.comm.written) == serpentine  # next line, both axes
+
+
+def test_serpentine_travel():
+    serpentine = raster(True)[0].comm.y_travel
+    assert serpentine < 0.6 * raster(False)[0].comm.y_travel
@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+import pytest
+
+from spd_controller import flyscan
+from spd_controller.sigma import sc104
+
+
+class StageComm:
+    """Port of SC104 moving at the set speed (position in 0.1 micron)."""
+
+    def __init__(self):
+        self.position = 0
+        self.target = 0
+        self.speed = 1e4  # 1 mm/s
+        self.started = None
+        self.origin = 0
+        self.rx = []
+        self.written = []
+
+    def current(self):
+        if self.started is None:
+            return self.origin, True
+        travel = (time.monotonic() - self.started) * self.speed
+        distance = self.target - self.origin
+        if travel >= abs(distance):
+            return self.target, True
+        return self.origin + int(np.sign(distance) * travel), False
+
+    def write(self, data):
+        command = data.decode().strip()
+        self.written.append(command)
+        if command.startswith("A:1"):
+            self.origin, self.started = self.current()[0], None
+            self.target = int(command[3] + command[5:])
+        elif command.startswith("M:1"):
+            self.origin, self.started = self.current()[0], None
+            self.target = self.origin + int(command[3] + command[5:])
+        elif command == "G":
+            self.started = time.monotonic()
+        elif command.startswith("D:1F"):
+            self.speed = int(command[4:])
+        elif command == "Q:":
+            position, stopped = self.current()
+            self.rx.append(f"{position},K,K,{'K' if stopped else 'B'},K\r\n")
+        elif command == "P:1":
+            self.rx.append(f"{self.current()[0]}\r\n")
+
+    def readline(self):
+        return self.rx.pop(0).encode()
+
+
+def make_stage():
+    stage = sc104.SC104.__new__(sc104.SC104)
+    sc104.Comm.__init__(stage, term="\r\n")
+    stage.comm = StageComm()
+    return stage
+
+
+def test_bin_onto_grid():
+    grid = np.linspace(1.0, 0.0, 11)  # decreasing
+    positions = np.array([0.0, 0.01, 0.49, 0.52, 1.04, 1.2, -0.2])
+    values = np.array([1.0, 3.0, 5.0, 7.0, 9.0, 100.0, 100.0])
+    mean, std, counts = flyscan.bin_onto_grid(positions, values, grid)
+    assert counts.tolist() == [1, 0, 0, 0, 0, 2, 0, 0, 0, 0, 2]
+    np.testing.assert_allclose(mean[[0, 5, 10]], [9.0, 6.0, 2.0])
+    np.testing.assert_allclose(std[[0, 5, 10]], [0.0, 1.0, 1.0])
+    assert np.isnan(mean[1])
+    with pytest.raises(ValueError):
+        flyscan.bin_onto_grid(positions, values, [0.0])
+
+
+def test_sampling_period():
+    assert flyscan.sampling_period(lambda: 1.0, interval=0.01) == 0.01
+
+    def slow_detector():
+        time.sleep(0.03)
+        return 1.0
+
+    assert 0.03 <= flyscan.sampling_period(slow_detector, interval=0.01) < 0.1
+
+
+def test_fly_scan():
+    stage = make_stage()
+    start = time.monotonic()
+    result = stage.fly_scan(
+        0.0,
+        0.1,
+        detector=lambda: stage.position() * 10,
+        grid=np.linspace(0, 0.1, 11),
+        interval=0.01,
+    )
+    assert time.monotonic() - start < 2
+    assert "D:1F2500" in stage.comm.written  # 0.01 mm / (4 * 10 ms) = 0.25 mm/s
+    assert np.all(np.diff(result.timestamps) > 0)
+    assert np.all(np.diff(result.positions) >= 0)
+    assert result.counts.sum() == result.values.size
+    assert np.all(result.counts[1:-1] >= 2)
+    np.testing.assert_allclose(result.mean[1:-1], result.grid[1:-1] * 10, atol=0.02)
+
+
+def test_motion_future():
+    stage = make_stage()
+    stage.set_speed(1.0)
+    move = stage.move_abs(0.2, wait=False)
+    assert not move.done()
+    assert move.result(timeout=2) == pytest.approx(0.2)
+    assert move.done()
+    assert 0.2 <= move.elapsed < 0.5
+    # adaptive polling: a few queries, not a busy loop
+    assert stage.comm.written.count("Q:") < 20
+    move = stage.move_abs(0.0, wait=False)
+    with pytest.raises(TimeoutError):
+        move.result(timeout=0.05)
+    stage.wait_during_move()
+    assert stage.position() == 0
+
+
+def test_position_cache():
+    stage = make_stage()
+    stage.set_speed(2.0)
+    assert stage.position() == 0
+    assert stage.position() == 0
+    assert stage.comm.written.count("P:1") == 1  # answered from the cache
+    stage.move_abs(0.1)
+    queries = len(stage.comm.written)
+    assert stage.position() == pytest.approx(0.1)
+    assert len(stage.comm.written) == queries  # the final read of the move
+    move = stage.move_rel(0.1, wait=False)
+    assert move.target == pytest.approx(0.2)  # dead reckoning
+    assert 0.1 <= stage.position() < 0.2  # polled during the move
+    move.wait()
+    assert stage.position() == pytest.approx(0.2)
+    queries = len(stage.comm.written)
+    stage.position()
+    assert len(stage.comm.written) == queries
+    stage.position_cache.max_age = 0.0
+    stage.position()
+    assert stage.comm.written[-1] == "P:1"  # stale
+    stage.position(refresh=True)
+    assert stage.comm.written.count("P:1") == 5
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from spd_controller.texio import features
+from spd_controller.texio.waveform_stack import WaveformStack
+
+T = np.linspace(-5e-9, 5e-9, 10001)
+
+
+def gaussian(center: float, sigma: float, height: float) -> np.ndarray:
+    return height * np.exp(-((T - center) ** 2) / (2 * sigma**2))
+
+
+def test_waveform_features():
+    sigma = 0.5e-9
+    waveforms = np.array(
+        [
+            gaussian(0, sigma, 1.0) + 0.1,
+            -gaussian(1e-9, 2 * sigma, 0.5) + 0.1,
+            np.full(T.size, 0.1),
+        ],
+    )
+    result = features.waveform_features(T, waveforms[:2] * [[1], [-1]], baseline=100)
+    np.testing.assert_allclose(result["amplitude"], [1.0, 0.5], rtol=1e-6)
+    np.testing.assert_allclose(
+        result["area"],
+        [sigma * np.sqrt(2 * np.pi), 0.5 * 2 * sigma * np.sqrt(2 * np.pi)],
+        rtol=1e-4,
+    )
+    np.testing.assert_allclose(result["centroid"], [0, 1e-9], atol=1e-12)
+    fwhm = 2 * np.sqrt(2 * np.log(2)) * sigma
+    np.testing.assert_allclose(result["fwhm"], [fwhm, 2 * fwhm], rtol=1e-4)
+    negative = features.waveform_features(T, waveforms[1], baseline=100, polarity=-1)
+    assert negative["amplitude"][0] == pytest.approx(0.5)
+    flat = features.waveform_features(T, waveforms[2], baseline=100)
+    assert np.isnan(flat["fwhm"][0])
+
+
+def test_decimate():
+    waveform = np.arange(10.0)
+    np.testing.assert_array_equal(features.decimate(waveform, 3), [1, 4, 7])
+    assert features.decimate(np.ones((2, 10)), 5).shape == (2, 2)
+
+
+def test_extractor(tmp_path):
+    extractor = features.FeatureExtractor(T, decimate=10)
+    stack = WaveformStack.create(tmp_path / "scan.stack", 5, extractor.stored_timescale)
+    extractor.stack = stack
+    assert np.isnan(extractor.overlap())
+    heights = [0.2, 0.6, 1.0, 0.7]
+    for i, height in enumerate(heights):
+        row = extractor.add(gaussian(0, 0.5e-9, height), 0.1 * i, 1e3)
+        assert row["amplitude"] == pytest.approx(height)
+    assert len(extractor) == 4
+    assert extractor.overlap() == pytest.approx(0.2)
+    assert stack.memory_length == 1000
+    extractor.export_text(tmp_path / "features.txt")
+    table = np.loadtxt(tmp_path / "features.txt")
+    assert table.shape == (4, 6)
+
+    resumed = features.FeatureExtractor(T)
+    resumed.extend(stack, chunk=3)
+    np.testing.assert_allclose(resumed.features["position"], [0, 0.1, 0.2, 0.3])
+    np.testing.assert_allclose(resumed.features["amplitude"], heights, rtol=1e-3)
@@ -0,0 +1,206 @@
+import numpy as np
+import pytest
+
+from spd_controller.scpi import SettingsCache, normalize_header
+from spd_controller.texio import gds3502
+
+HEADER = (
+    "Format,1.0B;Memory Length,{};IntpDistance,0;Trigger Address,0;"
+    "Trigger Level,0.000E+00;Source,CH1;Vertical Units,V;"
+    "Vertical Units Div,0;Vertical Units Extend Div,16;Label,;"
+    "Probe Type,0;Probe Ratio,1.000e+00;Vertical Scale,2.000e-02;"
+    "Vertical Position,0.000e+00;Horizontal Units,S;Horizontal Scale,1.000E-08;"
+    "Horizontal Position,0.000E+00;Horizontal Mode,Main;SincET Mode,Real Time;"
+    "Sampling Period,2.000e-10;Horizontal Old Scale,1.000E-08;"
+    "Horizontal Old Position,0.000E+00;Firmware,V1.00;Mode,Fast;"
+)
+
+
+def memory_response(samples):
+    payload = np.asarray(samples, dtype=">i2").tobytes()
+    length = str(len(payload))
+    header = HEADER.format(len(samples)).encode()
+    return header + f"#{len(length)}{length}".encode() + payload + b"\n"
+
+
+class DummyComm:
+    """Port which returns the response in small chunks (like slow transfer)."""
+
+    def __init__(self, response, chunk=4096):
+        self.response = response
+        self.chunk = chunk
+        self.rx = bytearray()
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+        self.rx.extend(self.response)
+
+    def read(self, size=1):
+        data = bytes(self.rx[: min(size, self.chunk)])
+        del self.rx[: len(data)]
+        return data
+
+    def read_until(self, expected=b"\n"):
+        index = self.rx.find(expected)
+        size = len(self.rx) if index < 0 else index + len(expected)
+        return self.read(size)
+
+
+def make_scope(response, chunk=4096):
+    scope = gds3502.GDS3502.__new__(gds3502.GDS3502)
+    gds3502.SCPIInstrument.__init__(scope, term="\n")
+    scope.comm = DummyComm(response, chunk)
+    return scope
+
+
+def test_read_block():
+    scope = make_scope(b"head;#3010abcdefghij\n*IDN\n", chunk=3)
+    scope.sendtext("*IDN?")
+    assert scope.read_block() == (b"head;", b"abcdefghij")
+    assert scope.read_until() == b"*IDN\n"  # the stream is still in sync
+    scope.comm.response = b"#3010abc"
+    scope.sendtext("*IDN?")
+    with pytest.raises(TimeoutError, match="3 / 10"):
+        scope.read_block()
+
+
+def test_acquire_memory():
+    # includes "\n" (0x0a) and "#" bytes in the samples and full-scale negatives
+    samples = np.array([0, 1, -1, 10, 0x0A0A, 35, -32768, 32767, -200, 2560])
+    scope = make_scope(memory_response(samples), chunk=7)
+    memory = scope.acquire_memory(1)
+    assert scope.comm.written == [b":ACQuire1:MEMory?\n"]
+    np.testing.assert_allclose(memory, samples * 0.02 / 25)
+    np.testing.assert_allclose(scope.timescale, np.arange(samples.size) * 2e-10)
+    assert scope.header_dict["Memory Length"] == samples.size
+    assert scope.header_dict["Mode"] == "Fast"
+    assert scope.header_dict["Label"] == ""
+    # header parsing and timescale are cached
+    timescale = scope.timescale
+    scope.comm.response = memory_response(samples[::-1])
+    np.testing.assert_allclose(scope.acquire_memory(2), samples[::-1] * 0.02 / 25)
+    assert scope.timescale is timescale
+    assert not scope.comm.rx
+
+
+def test_lrn():
+    scope = make_scope(b":ACQuire:MODe SAMPle;:ACQuire:AVERage 2;\n", chunk=5)
+    assert scope.lrn() == ":ACQuire:MODe SAMPle;:ACQuire:AVERage 2;\n"
+
+
+def test_acquire_both_channels():
+    ch1, ch2 = np.arange(-50, 50), np.arange(100)[::-1]
+    response = memory_response(ch1) + memory_response(ch2) + b"2.5E+00\n1.000E+03\n"
+    scope = make_scope(response, chunk=64)
+    record = scope.acquire((1, 2), measurements=[("PK2pk", 2)])
+    assert len(scope.comm.written) == 1  # one pipelined write
+    assert scope.comm.written[0].decode().splitlines() == [
+        ":ACQuire1:MEMory?",
+        ":ACQuire2:MEMory?",
+        ":MEASure:SOURce CH2",
+        ":MEASure:PK2pk?",
+        ":TRIG:FREQ?",
+    ]
+    np.testing.assert_allclose(record.memory[1], ch1 * 0.02 / 25)
+    np.testing.assert_allclose(record.memory[2], ch2 * 0.02 / 25)
+    assert record.timescale.size == 100
+    assert record.measurements == {"CH2:PK2pk": 2.5}
+    assert record.trigger_frequency == 1000.0
+    assert not scope.comm.rx
+
+
+class ScriptedComm(DummyComm):
+    """Port which answers each query from a list of replies."""
+
+    def __init__(self, replies):
+        super().__init__(b"")
+        self.replies = replies
+
+    def write(self, data):
+        self.written.append(data)
+        for line in data.decode().splitlines():
+            if line in self.replies:
+                self.rx.extend(self.replies[line].pop(0))
+
+    def readline(self):
+        return self.read_until(b"\n")
+
+
+def test_wait_acquisition():
+    scope = make_scope(b"")
+    scope.comm = ScriptedComm(
+        {
+            "*OPC?": [b"1\n"],
+            ":TRIG:FREQ?": [b"1.000E+03\n"],
+            ":ACQuire1:STATe?": [b"0\n", b"0\n", b"1\n"],
+        },
+    )
+    assert scope.set_average_mode(64) == 15
+    elapsed = scope.wait_acquisition(1)
+    assert 0.064 <= elapsed < 1
+    assert scope.comm.written[0] == b":ACQuire:MODe AVERage\n:ACQuire:AVERage 64\n"
+    assert scope.comm.written[1] == b":ACQuire:AVERage 64\n"  # re-armed
+    assert scope.comm.written.count(b":ACQuire1:STATe?\n") == 3
+    # never completes
+    scope.comm.replies = {
+        "*OPC?": [b"1\n"],
+        ":TRIG:FREQ?": [b"1.000E+03\n"],
+        ":ACQuire1:STATe?": [b"0\n"] * 100,
+    }
+    with pytest.raises(TimeoutError):
+        scope.wait_acquisition(1, timeout=0.2)
+
+
+LRN = (
+    ":DISPlay:WAVEform VECTor;:CHANnel1:IMPedance 5.000E+01;"
+    ":CHANnel2:IMPedance 1.000E+06;:ACQuire:MODe SAMPle;:ACQuire:AVERage 2;"
+    ":ACQuire:INTERpolation SINC;:TIMebase:SCALe 1.000E-08;*OPC\n"
+)
+
+
+def test_settings_cache():
+    scope = make_scope(b"")
+    scope.comm = ScriptedComm({"*LRN?": [LRN.encode()] * 2})
+    scope.refresh()
+    assert scope.settings.get(":ACQ:MOD") == "SAMP"
+    assert ":TIMebase:SCALe" in scope.settings
+    scope.comm.written.clear()
+    scope.set_sample_mode()
+    scope.set_realtime_sampling()
+    scope.set_impedance(1, 50)
+    assert scope.comm.written == []  # already in effect
+    scope.set_interpolation_et()
+    scope.set_average_mode(16)
+    scope.set_average_mode(16)
+    assert scope.comm.written == [
+        b":ACQuire:INTERpolation ET\n",
+        b":ACQuire:MODe AVERage\n:ACQuire:AVERage 16\n",
+    ]
+    profile = {":ACQuire:MODe": "SAMP", ":ACQuire:INTERpolation": "ET"}
+    assert scope.apply(profile) == [":ACQuire:MODe SAMP"]
+    assert scope.apply(profile) == []
+    assert scope.configure(":ACQuire:MODe", "SAMP", force=True)
+
+    # CH1 is switched to 1 MOhm on the front panel (the cache says 50 Ohm)
+    scope.comm.replies[":CHANnel1:IMPedance?"] = [b"1.000E+06\n"]
+    scope.comm.replies[":CHANnel2:IMPedance?"] = [b"1.000E+06\n"]
+    scope.comm.written.clear()
+    scope.reset()
+    assert scope.comm.written == [
+        b":CHANnel1:IMPedance?\n:CHANnel2:IMPedance?\n",
+        b"*RST\n",
+        b":CHANnel1:IMPedance 1.000E+06\n:CHANnel2:IMPedance 1.000E+06\n",
+        b":AUTOSet\n",
+    ]
+    assert len(scope.settings) == 0
+
+
+def test_normalize_header():
+    assert normalize_header(":CHANnel1:IMPedance?") == "CHAN1:IMP"
+    assert normalize_header(":SENSe:VOLTage:NPLCycles") == "VOLT:NPLC"
+    assert normalize_header(":SENS:VOLT:RANG") == normalize_header(":VOLT:RANG")
+    cache = SettingsCache()
+    cache.load(":VOLT:RANG 1.000E+01;:SENS:VOLT:AVER ON")
+    assert cache.is_current(":SENS:VOLT:RANG", 10)
+    assert cache.is_current(":VOLT:AVER", "ON")
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from spd_controller.texio.waveform_stack import WaveformStack
+
+
+def test_append_resume_and_slice(tmp_path):
+    timescale = np.linspace(-1e-9, 1e-9, 100)
+    path = tmp_path / "scan.stack"
+    stack = WaveformStack.create(path, 3, timescale, metadata={"step": 10.0})
+    assert stack.capacity == 3
+    assert stack.memory_length == 100
+    assert len(stack) == 0
+    stack.append(np.full(100, 1.5), position=1.0, frequency=1e3, timestamp=10.0)
+    stack.close()  # interrupted
+
+    stack = WaveformStack.open(path)
+    assert len(stack) == 1
+    assert stack.metadata["step"] == 10.0
+    assert stack.append(np.arange(100.0), position=1.01, frequency=1e3) == 1
+    stack.append(np.zeros(100), position=1.02)
+    with pytest.raises(IndexError):
+        stack.append(np.zeros(100), position=1.03)
+    stack.close()
+
+    with WaveformStack.open(path, mode="r") as stack:
+        np.testing.assert_allclose(stack.timescale, timescale)
+        np.testing.assert_allclose(stack.positions, [1.0, 1.01, 1.02])
+        assert stack.timestamps[0] == 10.0
+        assert np.isnan(stack.frequency[2])
+        assert isinstance(stack.waveforms, np.memmap)
+        assert stack.waveforms.dtype == np.float32
+        np.testing.assert_array_equal(stack[1, 10:13], [10, 11, 12])
+        np.testing.assert_array_equal(stack[:, 0], [1.5, 0, 0])
+
+
+def test_export_text(tmp_path):
+    stack = WaveformStack.create(tmp_path / "scan.stack", 4, np.arange(5.0))
+    stack.append(np.ones(5), position=0.5, frequency=1000.0)
+    stack.append(2 * np.ones(5), position=0.51, frequency=1000.0)
+    stack.export_text(tmp_path / "scan.txt")
+    text = (tmp_path / "scan.txt").read_text().splitlines()
+    assert text[0] == "# timescale\tposition_0.500@1000.0\tposition_0.510@1000.0"
+    np.testing.assert_allclose(
+        np.loadtxt(tmp_path / "scan.txt"),
+        np.column_stack([np.arange(5.0), np.ones(5), 2 * np.ones(5)]),
+    )
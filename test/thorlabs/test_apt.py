@@ -0,0 +1,317 @@
+import struct
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from spd_controller.thorlabs import apt, k10cr1
+from spd_controller.thorlabs.k10cr1 import K10CR1, VELOCITY_SCALE
+from spd_controller.thorlabs.mff101 import MFF101
+
+
+class APTSerial:
+    """Port of an APT device, delivering the replies in small chunks.
+
+    A reply is bytes, or a function of the written command returning bytes.
+    """
+
+    def __init__(self, replies, chunk=5, timeout=0.01):
+        self.replies = replies
+        self.chunk = chunk
+        self.timeout = timeout
+        self.rx = bytearray()
+        self.written = []
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        reply = self.replies.get(bytes(data[:2]), b"")
+        if callable(reply):
+            reply = reply(bytes(data))
+        with self.cond:
+            self.written.append(bytes(data))
+        self.inject(reply)
+        return len(data)
+
+    def inject(self, data):
+        with self.cond:
+            self.rx.extend(data)
+            self.cond.notify_all()
+
+    def read(self, size=1):
+        with self.cond:
+            self.cond.wait_for(lambda: self.rx, self.timeout)
+            size = min(size, self.chunk)
+            data = bytes(self.rx[:size])
+            del self.rx[:size]
+        return data
+
+
+def status_update(msg_id, position, status_bits=0):
+    data = struct.pack("<HiiI", 1, position, position, status_bits)
+    return apt.AptMessage(msg_id, dest=apt.HOST, source=apt.GENERIC_USB, data=data)
+
+
+def test_framer_splits_stream():
+    stream = (
+        apt.AptMessage(apt.MOT_MOVE_HOMED, 1, dest=apt.HOST).encode()
+        + status_update(apt.MOT_GET_STATUSUPDATE, 100, 0x10).encode()
+        + status_update(apt.MOT_MOVE_COMPLETED, 200).encode()
+        + apt.AptMessage(0x0006, 1, 2).encode()
+    )
+    framer = apt.AptFramer()
+    records = []
+    for i in range(0, len(stream), 7):
+        records.extend(framer.feed(stream[i : i + 7]))
+    assert len(framer) == 0
+    assert records[0] == apt.MoveHomed(1)
+    assert records[1] == apt.StatusUpdate(1, 100, 100, 0x10)
+    assert records[1].moving
+    assert type(records[2]) is apt.MoveCompleted
+    assert records[2].position == 200
+    assert records[3] == apt.AptMessage(0x0006, 1, 2)
+
+
+def test_encode_long_message():
+    message = apt.AptMessage(apt.MOT_MOVE_ABSOLUTE, data=struct.pack("<Hi", 1, -1))
+    assert message.encode().hex() == "53040600d001" + "0100" + "ffffffff"
+
+
+def make_device(cls, replies):
+    device = cls.__new__(cls)
+    device.serial_num = "0"
+    device.ready = True
+    device.ser = APTSerial(replies)
+    return device
+
+
+def test_getpos_skips_other_messages():
+    poscounter = apt.AptMessage(
+        apt.MOT_GET_POSCOUNTER,
+        dest=apt.HOST,
+        source=apt.GENERIC_USB,
+        data=struct.pack("<Hi", 1, 24576000 // 2),
+    )
+    reply = status_update(apt.MOT_GET_STATUSUPDATE, 5).encode() + poscounter.encode()
+    stage = make_device(K10CR1, {b"\x11\x04": reply})
+    updates = []
+    stage.subscribe(apt.MOT_GET_STATUSUPDATE, updates.append)
+    assert stage.getpos() == 90.0
+    assert stage.ser.written == [bytes.fromhex("110401005001")]
+    assert updates == [apt.StatusUpdate(1, 5, 5, 0)]
+    assert stage.read_message(timeout=0) is None
+
+
+def test_mff101_position():
+    reply = apt.AptMessage(
+        apt.MOT_GET_STATUSBITS,
+        dest=apt.HOST,
+        source=apt.GENERIC_USB,
+        data=struct.pack("<HI", 1, 0x80000002),
+    ).encode()
+    flipper = make_device(MFF101, {b"\x29\x04": reply})
+    assert flipper.position() == 2
+    with pytest.raises(TimeoutError):
+        flipper.wait_for(apt.StatusBits, timeout=0.01)
+
+
+def test_move_completed_by_reader():
+    def move(command):
+        target = struct.unpack_from("<i", command, 8)[0]
+        return (
+            status_update(apt.MOT_GET_STATUSUPDATE, target // 2, 0x10).encode()
+            + status_update(apt.MOT_MOVE_COMPLETED, target).encode()
+        )
+
+    def poscounter(command):
+        return apt.AptMessage(
+            apt.MOT_GET_POSCOUNTER,
+            dest=apt.HOST,
+            source=apt.GENERIC_USB,
+            data=struct.pack("<Hi", 1, 24576000 // 4),
+        ).encode()
+
+    stage = make_device(K10CR1, {b"\x53\x04": move, b"\x11\x04": poscounter})
+    updates = []
+    try:
+        future = stage.move_abs(90, wait=False)
+        assert stage.reading
+        start_updates = apt.AptMessage(apt.HW_START_UPDATEMSGS).encode()
+        assert stage.ser.written[0] == start_updates
+        assert future.result(timeout=1) == pytest.approx(90)
+        assert future.last_position == pytest.approx(45)
+        started = time.monotonic()
+        assert stage.move_abs(30).done()
+        assert time.monotonic() - started < 0.1
+        assert stage.getpos() == 45.0  # reply taken from the reader thread
+        stage.subscribe(apt.MOT_GET_STATUSUPDATE, updates.append)
+        assert stage.move_abs(10).done()
+    finally:
+        stage.stop_reader()
+    assert not stage.reading
+    assert stage.ser.written[-1] == apt.AptMessage(apt.HW_STOP_UPDATEMSGS).encode()
+    assert len(updates) == 1
+
+
+def test_one_pending_move():
+    stage = make_device(K10CR1, {})  # MOVE_COMPLETED is injected later
+    stage.move_timeout = 0.05
+    completed = status_update(apt.MOT_MOVE_COMPLETED, 24576000 // 2).encode()
+    try:
+        first = stage.move_abs(90, wait=False)
+        with pytest.raises(RuntimeError):
+            stage.move_abs(30, wait=False)
+        stage.ser.inject(completed)
+        assert first.result(timeout=1) == pytest.approx(90)
+        with pytest.raises(TimeoutError):
+            stage.move_abs(30)  # MOVE_COMPLETED is lost
+        stage.ser.inject(completed)  # late, ignored
+        second = stage.move_abs(30, wait=False)
+        time.sleep(0.05)
+        assert not second.done()  # not completed by the late MOVE_COMPLETED
+        stage.ser.inject(completed)
+        assert second.result(timeout=1) == pytest.approx(90)
+        with pytest.raises(TimeoutError):
+            stage.move_abs(30)  # MOVE_COMPLETED is lost
+        stage.ser.inject(status_update(apt.MOT_GET_STATUSUPDATE, 0).encode())  # idle
+        time.sleep(0.05)
+        third = stage.move_abs(30, wait=False)
+        stage.ser.inject(completed)
+        assert third.result(timeout=1) == pytest.approx(90)
+    finally:
+        stage.stop_reader()
+
+
+def test_mff101_flip_waits():
+    position = [1]
+
+    def jog(command):
+        position[0] = command[3]
+        return status_update(apt.MOT_MOVE_COMPLETED, 0, position[0]).encode()
+
+    def statusbits(command):
+        return apt.AptMessage(
+            apt.MOT_GET_STATUSBITS,
+            dest=apt.HOST,
+            source=apt.GENERIC_USB,
+            data=struct.pack("<HI", 1, position[0]),
+        ).encode()
+
+    flipper = make_device(MFF101, {b"\x6a\x04": jog, b"\x29\x04": statusbits})
+    try:
+        assert flipper.flip().result(timeout=1) == 2
+        assert flipper.position() == 2
+        assert flipper.flip().result(timeout=1) == 1
+    finally:
+        flipper.stop_reader()
+
+
+class RotationStage:
+    """K10CR1 rotating at the maximum velocity (no acceleration)."""
+
+    def __init__(self):
+        self.angle = 0.0
+        self.speed = 0.0
+        self.started = 0.0
+        self.span = 0.0
+        self.params = apt.VelParams(1, 0, 1502 * 10, VELOCITY_SCALE * 10)
+
+    def now(self):
+        elapsed = min(time.monotonic() - self.started, self.span / self.speed)
+        return self.angle + self.speed * elapsed
+
+    def replies(self, port):
+        def reply(msg_id, data):
+            return apt.AptMessage(
+                msg_id, dest=apt.HOST, source=apt.GENERIC_USB, data=data
+            ).encode()
+
+        def move_abs(command):
+            self.angle = struct.unpack_from("<i", command, 8)[0] * 180 / 24576000
+            du = int(self.angle * 24576000 / 180)
+            return status_update(apt.MOT_MOVE_COMPLETED, du).encode()
+
+        def move_rel(command):
+            self.span = struct.unpack_from("<i", command, 8)[0] * 180 / 24576000
+            self.speed = self.params.max_velocity / VELOCITY_SCALE
+            self.started = time.monotonic()
+            end = int((self.angle + self.span) * 24576000 / 180)
+            completed = status_update(apt.MOT_MOVE_COMPLETED, end).encode()
+            timer = threading.Timer(self.span / self.speed, port.inject, [completed])
+            timer.start()
+            return b""
+
+        def set_velparams(command):
+            self.params = apt.VelParams(*struct.unpack_from("<Hiii", command, 6))
+            return b""
+
+        def velparams(command):
+            return reply(apt.MOT_GET_VELPARAMS, self.params.to_message().data)
+
+        def poscounter(command):
+            du = int(self.now() * 24576000 / 180)
+            return reply(apt.MOT_GET_POSCOUNTER, struct.pack("<Hi", 1, du))
+
+        return {
+            b"\x53\x04": move_abs,
+            b"\x48\x04": move_rel,
+            b"\x13\x04": set_velparams,
+            b"\x14\x04": velparams,
+            b"\x11\x04": poscounter,
+        }
+
+
+def test_fly_scan():
+    rotation = RotationStage()
+    stage = make_device(K10CR1, {})
+    stage.ser.replies = rotation.replies(stage.ser)
+    grid = np.arange(30, 121, 5.0)
+    try:
+        result = stage.fly_scan(
+            lambda: np.cos(np.deg2rad(rotation.now())) ** 2,
+            start=30,
+            span=90,
+            grid=grid,
+            speed=180,
+            interval=0.005,
+        )
+    finally:
+        stage.stop_reader()
+    assert rotation.params == apt.VelParams(1, 0, 1502 * 10, VELOCITY_SCALE * 10)
+    assert result.counts[1:-1].min() > 0
+    expected = np.cos(np.deg2rad(grid)) ** 2
+    filled = result.counts > 0
+    np.testing.assert_allclose(result.mean[filled], expected[filled], atol=0.05)
+
+
+def test_fly_scan_speed_from_detector_time():
+    rotation = RotationStage()
+    stage = make_device(K10CR1, {})
+    stage.ser.replies = rotation.replies(stage.ser)
+
+    def detector():
+        time.sleep(0.02)
+        return 1.0
+
+    try:
+        result = stage.fly_scan(
+            detector, span=30, grid=np.arange(0, 31, 5.0), interval=0.005
+        )
+    finally:
+        stage.stop_reader()
+    assert 40 < rotation.speed <= 5 / (0.02 * 4)  # not 5 / (0.005 * 4)
+    assert result.counts[1:-1].min() > 0
+
+
+def test_fly_scan_lost_poscounter(monkeypatch):
+    monkeypatch.setattr(k10cr1, "REPLY_TIMEOUT", 0.05)
+    rotation = RotationStage()
+    stage = make_device(K10CR1, {})
+    stage.ser.replies = rotation.replies(stage.ser)
+    stage.ser.replies[b"\x11\x04"] = b""  # GET_POSCOUNTER is lost
+    try:
+        with pytest.raises(TimeoutError):
+            stage.fly_scan(lambda: 1.0, span=1, speed=20, interval=0.005)
+    finally:
+        stage.stop_reader()
+    assert rotation.params == apt.VelParams(1, 0, 1502 * 10, VELOCITY_SCALE * 10)